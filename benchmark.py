@@ -0,0 +1,194 @@
+from module.benchmark import CASES
+from prettytable import PrettyTable
+import subprocess
+import tempfile
+import platform
+import argparse
+import json
+import sys
+import os
+
+parser = argparse.ArgumentParser(
+    description="Benchmark the hot paths of the reports against the local fake API and compare with a baseline"
+)
+parser.add_argument("-c", "--cases", type=str, default=','.join(CASES),
+                    help=f"Comma separated cases to run (Default all: {', '.join(CASES)})")
+parser.add_argument("-s", "--sizes", type=str, default='10000,100000,1000000',
+                    help=f"Comma separated numbers of entries (folders and files) of every case "
+                         f"(Default 10000,100000,1000000)")
+parser.add_argument("-r", "--repeat", type=int, default=1,
+                    help=f"Timed runs of every case, the fastest one is kept (Default 1)")
+parser.add_argument("-t", "--timeout", type=int, default=None,
+                    help=f"Seconds before a run (setup included) is stopped and recorded as timed out "
+                         f"(Default per case, 600)")
+parser.add_argument("-b", "--baseline", type=str, default='benchmark.json',
+                    help=f"Baseline to compare with (Default benchmark.json)")
+parser.add_argument("--save", action='store_true',
+                    help=f"Store the results in the baseline instead of comparing with it")
+parser.add_argument("--tolerance", type=float, default=0.25,
+                    help=f"Allowed slowdown and memory growth over the baseline (Default 0.25 = 25%%)")
+# Internal: run a single measurement in this process and print it as JSON
+parser.add_argument("--measure", type=str, default=None, help=argparse.SUPPRESS)
+parser.add_argument("--entries", type=int, default=None, help=argparse.SUPPRESS)
+parser.add_argument("--memory", action='store_true', help=argparse.SUPPRESS)
+
+args = parser.parse_args()
+
+
+def run_measure(case, entries, timeout, memory=False):
+    # Every measurement gets a fresh interpreter and working directory
+    with tempfile.TemporaryDirectory() as cwd:
+        for directory in ['output', 'session', 'tmp']:
+            os.makedirs(os.path.join(cwd, directory))
+        command = [sys.executable, os.path.abspath(__file__), '--measure', case, '--entries', str(entries)]
+        if memory:
+            command.append('--memory')
+        try:
+            process = subprocess.run(command, cwd=cwd, capture_output=True, text=True, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            return {'timeout': timeout}
+    if process.returncode:
+        return {'error': process.stderr.strip().splitlines()[-1] if process.stderr.strip() else 'failed'}
+    return json.loads(process.stdout)
+
+
+def benchmark(case, entries):
+    timeout = args.timeout or CASES[case].timeout
+    result = None
+    for _ in range(args.repeat):
+        run = run_measure(case, entries, timeout=timeout)
+        if 'seconds' not in run:
+            return run
+        if not result or run['seconds'] < result['seconds']:
+            result = run
+    # Peak memory is traced in a run of its own, tracing would slow the timed runs down
+    memory = run_measure(case, entries, timeout=timeout, memory=True)
+    if 'peak_bytes' in memory:
+        result['peak_bytes'] = memory['peak_bytes']
+    return result
+
+
+def compare(result, base):
+    # Returns the regressions of a result over its baseline and the notes on what couldn't be compared
+    if not base:
+        return [], []
+    if 'seconds' not in result:
+        status = 'timed out' if 'timeout' in result else 'failed'
+        if 'seconds' not in base:
+            return [], [f"{status}, baseline {'timed out' if 'timeout' in base else 'failed'} too"]
+        return [status], []
+    if 'seconds' not in base:
+        return [], [f"baseline {'timed out' if 'timeout' in base else 'failed'} -> now {result['seconds']:,.1f}s"]
+    regressions = list()
+    # Differences under 0.1 s are timing noise on the sub-second cases
+    if result['seconds'] > base['seconds'] * (1 + args.tolerance) and result['seconds'] - base['seconds'] > 0.1:
+        regressions.append(f"time {result['seconds'] / base['seconds']:.2f}x")
+    if result['calls'] > base['calls']:
+        regressions.append(f"calls +{result['calls'] - base['calls']:,}")
+    if 'peak_bytes' in result and 'peak_bytes' in base \
+            and result['peak_bytes'] > base['peak_bytes'] * (1 + args.tolerance) \
+            and result['peak_bytes'] - base['peak_bytes'] > 1024 * 1024:
+        regressions.append(f"memory {result['peak_bytes'] / base['peak_bytes']:.2f}x")
+    # The traced run is several times slower than the timed one and may time out
+    return regressions, [] if 'peak_bytes' in result else ['memory not measured']
+
+
+def stale_commits(baseline):
+    # Commits changing module/ since the baseline was saved that didn't save it again, empty outside of git
+    if 'commit' not in baseline:
+        return []
+    root = os.path.dirname(os.path.abspath(__file__))
+    try:
+        log = subprocess.run(['git', 'log', '--format=%h %s', f"{baseline['commit']}..HEAD", '--', 'module'],
+                             cwd=root, capture_output=True, text=True, timeout=30)
+        saved = subprocess.run(['git', 'log', '--format=%h', f"{baseline['commit']}..HEAD", '--',
+                                os.path.basename(args.baseline)], cwd=root, capture_output=True, text=True, timeout=30)
+    except (OSError, subprocess.TimeoutExpired):
+        return []
+    if log.returncode or saved.returncode:
+        return []
+    saved = set(saved.stdout.split())
+    return [line for line in log.stdout.splitlines() if line.split(' ', 1)[0] not in saved]
+
+
+def head_commit():
+    try:
+        process = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                 capture_output=True, text=True, timeout=30)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    return process.stdout.strip() if not process.returncode else None
+
+
+def format_result(result):
+    if 'timeout' in result:
+        return [f"timeout ({result['timeout']}s)", '', '']
+    if 'error' in result:
+        return [result['error'][:40], '', '']
+    peak = f"{result['peak_bytes'] / 1024 / 1024:,.1f}" if 'peak_bytes' in result else ''
+    return [f"{result['seconds']:,.3f}", f"{result['calls']:,}", peak]
+
+
+if __name__ == "__main__":
+    if args.measure:
+        from module.benchmark import measure
+        print(json.dumps(measure(args.measure, args.entries, memory=args.memory)))
+        sys.exit(0)
+
+    baseline = {'results': dict()}
+    if os.path.exists(args.baseline):
+        baseline = json.load(open(args.baseline))
+    if not args.save:
+        stale = stale_commits(baseline)
+        if stale:
+            print(f'{args.baseline} was not saved again since {len(stale)} commit(s) changing module/:')
+            print("\n".join(f'  {line}' for line in stale))
+
+    display = PrettyTable()
+    display.field_names = [
+        'Case           ',
+        '   Size',
+        '  Entries',
+        '  Time (s)',
+        ' API calls',
+        'Peak (MiB)',
+        'Baseline (s)',
+        'Result                        ',
+    ]
+    display.align[display.field_names[0]] = 'l'
+    for field in display.field_names[1:-1]:
+        display.align[field] = 'r'
+    display.align[display.field_names[-1]] = 'l'
+    print(display, flush=True)
+
+    failed = False
+    for case in args.cases.split(','):
+        sizes = args.sizes.split(',') if CASES[case].sized else args.sizes.split(',')[:1]
+        for size in sizes:
+            result = benchmark(case, int(size))
+            base = baseline['results'].get(case, dict()).get(size)
+            regressions, notes = compare(result, base)
+            failed = failed or bool(regressions)
+            if args.save:
+                baseline['results'].setdefault(case, dict())[size] = result
+            if regressions:
+                status = 'REGRESSION: ' + ', '.join(regressions)
+            else:
+                status = ', '.join(notes) if notes else ('ok' if base else 'new')
+            base_time = f"{base['seconds']:,.3f}" if base and 'seconds' in base else ''
+            display.add_row([case, size, f"{result['entries']:,}" if 'entries' in result else '']
+                            + format_result(result) + [base_time, status])
+            print("\n".join(display.get_string().splitlines()[-2:]), flush=True)
+
+    if args.save:
+        baseline['python'] = platform.python_version()
+        baseline['platform'] = platform.platform()
+        commit = head_commit()
+        if commit:
+            baseline['commit'] = commit
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f'Baseline saved to {args.baseline}')
+    elif failed:
+        print('Performance regressions against the baseline')
+        sys.exit(1)
@@ -0,0 +1,67 @@
+from module.app import DropBoxApp
+from module.crawl import CRAWL_OUTPUTS
+from module.profiling import Profiler
+from module.arguments import add_common_arguments
+import os
+import configparser
+import argparse
+from datetime import datetime
+
+parser = argparse.ArgumentParser()
+parser.add_argument("-n", "--output_name", type=str, default=f'report_{datetime.now():%Y-%m-%d %H-%M-%S}',
+                    help=(f"The output will be generated with this config name in the '/output' folder. "
+                          "If unset, default value is 'report_YYYY-MM-DD HH-MM-SS'"))
+parser.add_argument("-o", "--outputs", type=str, default='folders,owners,members,files',
+                    help=f"Comma separated outputs of the crawl, each written to "
+                         f"'/output/<output_name>_<output>.<format>': folders (main.py), owners (owner.py), "
+                         f"members (member.py), files (file.py) and documents (file.py -c 1) "
+                         f"(Default folders,owners,members,files)")
+parser.add_argument("-l", "--max_level", type=int, default=1,
+                    help=f"The sub-folder levels to be export to output file. "
+                         f"If unset, all sub-levels will be export to output")
+parser.add_argument("-full_download", "--full_download", action='store_true',
+                    help=f"Download every document whole (Default a docx or xlsx of 1 MiB or more is read in ranges: "
+                         f"its zip directory, then only the parts holding its text and links)")
+add_common_arguments(parser)
+
+args = parser.parse_args()
+outputs = [output.strip() for output in args.outputs.split(',') if output.strip()]
+for output in outputs:
+    if output not in CRAWL_OUTPUTS:
+        parser.error(f"unknown output '{output}', choose from {', '.join(CRAWL_OUTPUTS)}")
+
+if __name__ == "__main__":
+    try:
+
+        config = configparser.ConfigParser()
+        config.read("config.ini")
+
+        app = DropBoxApp(
+            team_access=True,
+            app_key=config.get('DROPBOX', 'app_key'),
+            app_secret=config.get('DROPBOX', 'app_secret'),
+            output_format=args.output_format,
+            database=args.database,
+            metrics_format=args.metrics_format,
+            trace_format=args.trace,
+            progress_mode=args.progress,
+            progress_interval=args.progress_interval,
+            quiet=args.quiet,
+            directory_ttl=args.directory_ttl,
+            record=args.record,
+            replay=args.replay,
+            replay_speed=args.replay_speed
+        )
+
+        with Profiler(args.output_name, mode=args.profile, interval=args.profile_interval,
+                      memory_interval=args.memory_interval, top=args.top):
+            app.crawl(output_name=args.output_name, outputs=outputs, max_level=args.max_level,
+                      full_download=args.full_download)
+
+
+
+
+    except KeyboardInterrupt:
+        app.writer.close()
+        app.dump_metrics()
+        os._exit(0)
@@ -0,0 +1,40 @@
+from module.output import OUTPUT_FORMATS, DIFF_SCHEMA
+from module.snapshot import Snapshot, SnapshotDiff
+import os
+import time
+import argparse
+from datetime import datetime
+
+parser = argparse.ArgumentParser(
+    description="Compare two snapshots of a report (e.g. output/report_*.csv of last week and of this week)"
+)
+parser.add_argument("old", type=str, help=f"The older snapshot (csv, xlsx, parquet or arrow)")
+parser.add_argument("new", type=str, help=f"The newer snapshot (csv, xlsx, parquet or arrow)")
+parser.add_argument("-n", "--output_name", type=str, default=f'diff_{datetime.now():%Y-%m-%d %H-%M-%S}',
+                    help=(f"The output will be generated with this config name in the '/output' folder. "
+                          "If unset, default value is 'diff_YYYY-MM-DD HH-MM-SS'"))
+parser.add_argument("-f", "--output_format", type=str, default='csv', choices=list(OUTPUT_FORMATS),
+                    help=f"The format of the output file (Default csv)")
+parser.add_argument("-unchanged", "--unchanged", action='store_true',
+                    help=f"Also write the folders found in both snapshots with the same values (Default only the "
+                         f"added, removed and changed ones)")
+parser.add_argument("-buffer", "--buffer_rows", type=int, default=100000,
+                    help=f"Rows of a snapshot sorted in memory before being spilled to a sorted run in the '/tmp' "
+                         f"folder (Default 100000)")
+
+args = parser.parse_args()
+
+if __name__ == "__main__":
+    for directory in ['output', 'tmp']:
+        os.makedirs(directory, exist_ok=True)
+
+    tic = time.time()
+    old = Snapshot(args.old, buffer_rows=args.buffer_rows)
+    new = Snapshot(args.new, buffer_rows=args.buffer_rows)
+    diff = SnapshotDiff(old, new)
+    output_path = f'output/{args.output_name}.{args.output_format}'
+    sink = OUTPUT_FORMATS[args.output_format](path=output_path, schema=DIFF_SCHEMA)
+    for row in diff.changes(unchanged=args.unchanged):
+        sink.write(row)
+    sink.close()
+    print(f"{diff.summary()}, written to {output_path} in {time.time() - tic:.1f}s")
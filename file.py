@@ -1,4 +1,6 @@
 from module.app import DropBoxApp
+from module.profiling import Profiler
+from module.arguments import add_common_arguments
 import os
 import configparser
 import argparse
@@ -17,7 +19,18 @@ parser.add_argument("-m", "--member", type=str, default='',
 parser.add_argument("-t", "--team_folder", type=str, default='',
                     help=f"The identification of selected team folder (name).")
 parser.add_argument("-thread", "--thread", type=int, default=1,
-                    help=f"Maximum number of threads running in parallel (Default 1)")
+                    help=f"Threads downloading the documents (Default 1)")
+parser.add_argument("-enrich_thread", "--enrich_thread", type=int, default=4,
+                    help=f"Threads of the file report reading the revisions and the members of the files (Default 4)")
+parser.add_argument("-parse_thread", "--parse_thread", type=int, default=1,
+                    help=f"Threads of the file report parsing the downloaded documents (Default 1)")
+parser.add_argument("-queue", "--queue_size", type=int, default=100,
+                    help=f"Files waiting in front of each stage of the file report, a full queue holds the stage "
+                         f"before it back (Default 100)")
+parser.add_argument("-full_download", "--full_download", action='store_true',
+                    help=f"Download every document whole (Default a docx or xlsx of 1 MiB or more is read in ranges: "
+                         f"its zip directory, then only the parts holding its text and links)")
+add_common_arguments(parser)
 
 args = parser.parse_args()
 
@@ -30,16 +43,32 @@ if __name__ == "__main__":
         app = DropBoxApp(
             team_access=True,
             app_key=config.get('DROPBOX', 'app_key'),
-            app_secret=config.get('DROPBOX', 'app_secret')
+            app_secret=config.get('DROPBOX', 'app_secret'),
+            output_format=args.output_format,
+            database=args.database,
+            metrics_format=args.metrics_format,
+            trace_format=args.trace,
+            progress_mode=args.progress,
+            progress_interval=args.progress_interval,
+            quiet=args.quiet,
+            directory_ttl=args.directory_ttl,
+            record=args.record,
+            replay=args.replay,
+            replay_speed=args.replay_speed
         )
 
-        app.file_report(
-            output_name=args.output_name, member_indentify=args.member,
-            team_indentify=args.team_folder, path=args.path, max_thread=args.thread
-        )
+        with Profiler(args.output_name, mode=args.profile, interval=args.profile_interval,
+                      memory_interval=args.memory_interval, top=args.top):
+            app.file_report(
+                output_name=args.output_name, member_indentify=args.member,
+                team_indentify=args.team_folder, path=args.path, max_thread=args.thread,
+                enrich_thread=args.enrich_thread, parse_thread=args.parse_thread, queue_size=args.queue_size,
+                full_download=args.full_download
+            )
 
 
 
     except KeyboardInterrupt:
-        app.output_file.close()
+        app.writer.close()
+        app.dump_metrics()
         os._exit(0)
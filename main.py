@@ -1,4 +1,6 @@
 from module.app import DropBoxApp
+from module.profiling import Profiler
+from module.arguments import add_common_arguments, check_common_arguments
 import os
 import configparser
 import sys
@@ -15,8 +17,16 @@ parser.add_argument("-n", "--output_name", type=str, default=f'report_{datetime.
 parser.add_argument("-l", "--max_level", type=int, default=1,
                     help=f"The sub-folder levels to be export to output file. "
                          f"If unset, all sub-levels will be export to output")
+parser.add_argument("-aggregate", "--aggregate", action='store_true',
+                    help=f"Only count the folders below max_level in the deepest folder written above them, without "
+                         f"keeping them in memory nor in the session backup (same totals, faster shallow reports)")
+parser.add_argument("-changes", "--changes", action='store_true',
+                    help=f"Only traverse the spaces with file or sharing events in the team audit log since the last "
+                         f"run with -changes, the others reuse the rows of that run (kept in session/changes_*.json)")
+add_common_arguments(parser)
 
 args = parser.parse_args()
+check_common_arguments(parser, args)
 
 if __name__ == "__main__":
     try:
@@ -27,16 +37,31 @@ if __name__ == "__main__":
         app = DropBoxApp(
             team_access=True,
             app_key=config.get('DROPBOX', 'app_key'),
-            app_secret=config.get('DROPBOX', 'app_secret')
+            app_secret=config.get('DROPBOX', 'app_secret'),
+            output_format=args.output_format,
+            database=args.database,
+            metrics_format=args.metrics_format,
+            trace_format=args.trace,
+            progress_mode=args.progress,
+            progress_interval=args.progress_interval,
+            quiet=args.quiet,
+            directory_ttl=args.directory_ttl,
+            record=args.record,
+            replay=args.replay,
+            replay_speed=args.replay_speed
         )
 
         # app.report_path(output_name=args.output_name, path=args.path, max_level=args.max_level)
 
-        app.report(output_name=args.output_name, max_level=args.max_level)
+        with Profiler(args.output_name, mode=args.profile, interval=args.profile_interval,
+                      memory_interval=args.memory_interval, top=args.top):
+            app.report(output_name=args.output_name, max_level=args.max_level, aggregate=args.aggregate,
+                       changes=args.changes)
 
 
 
 
     except KeyboardInterrupt:
-        app.output_file.close()
+        app.writer.close()
+        app.dump_metrics()
         os._exit(0)
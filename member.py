@@ -1,4 +1,6 @@
 from module.app import DropBoxApp
+from module.profiling import Profiler
+from module.arguments import add_common_arguments
 import os
 import configparser
 import argparse
@@ -21,6 +23,14 @@ parser.add_argument("-r", "--skip_not_root", type=int, default=0,
                     help=f"Fetch all sub-folders, sub-files or just root?"
                          f"If set to 1, just get content of root (folder level 0). "
                          f"If unset or set to 0, get all sub-files and sub folders")
+parser.add_argument("-thread", "--thread", type=int, default=1,
+                    help=f"(Only supported for the report of every member) "
+                         f"Maximum number of members counted in parallel (Default 1)")
+parser.add_argument("-sort", "--sort", action='store_true',
+                    help=f"(Only supported for the report of every member) "
+                         f"Sort the output by member name once every member is done. "
+                         f"If unset, rows are written as the members are done")
+add_common_arguments(parser)
 
 args = parser.parse_args()
 
@@ -33,16 +43,30 @@ if __name__ == "__main__":
         app = DropBoxApp(
             team_access=True,
             app_key=config.get('DROPBOX', 'app_key'),
-            app_secret=config.get('DROPBOX', 'app_secret')
+            app_secret=config.get('DROPBOX', 'app_secret'),
+            output_format=args.output_format,
+            database=args.database,
+            metrics_format=args.metrics_format,
+            trace_format=args.trace,
+            progress_mode=args.progress,
+            progress_interval=args.progress_interval,
+            quiet=args.quiet,
+            directory_ttl=args.directory_ttl,
+            record=args.record,
+            replay=args.replay,
+            replay_speed=args.replay_speed
         )
-        if args.member:
-            app.member_report(output_name=args.output_name, member_indentify=args.member, max_level=args.max_level,
-                              skip_not_root=args.skip_not_root)
-        else:
-            app.all_member_report(output_name=args.output_name)
+        with Profiler(args.output_name, mode=args.profile, interval=args.profile_interval,
+                      memory_interval=args.memory_interval, top=args.top):
+            if args.member:
+                app.member_report(output_name=args.output_name, member_indentify=args.member, max_level=args.max_level,
+                                  skip_not_root=args.skip_not_root)
+            else:
+                app.all_member_report(output_name=args.output_name, max_thread=args.thread, sort=args.sort)
 
 
 
     except KeyboardInterrupt:
-        app.output_file.close()
+        app.writer.close()
+        app.dump_metrics()
         os._exit(0)
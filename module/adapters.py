@@ -0,0 +1,29 @@
+from requests.adapters import BaseAdapter
+
+# Transport adapters of the session shared by the SDK clients, each one wrapping the adapter mounted before it. From
+# the outside in: the token (tokens.py), the rate limit (ratelimit.py), the metrics (metrics.py) and the cassette
+# (cassette.py) adapters over the transport of requests.
+
+
+class WrappingAdapter(BaseAdapter):
+    # Forwards every request to the adapter it wraps, send() is overridden with the keyword arguments of
+    # requests (stream, timeout, verify, cert, proxies) passed on untouched
+    def __init__(self, adapter):
+        BaseAdapter.__init__(self)
+        self.adapter = adapter
+
+    def send(self, request, **kwargs):
+        return self.adapter.send(request, **kwargs)
+
+    def close(self):
+        self.adapter.close()
+
+
+def install(session, factory):
+    # Mounts factory(adapter) in place of the adapter of every prefix of the session, a factory returning the
+    # adapter itself (already installed) leaves it mounted
+    for prefix, adapter in list(session.adapters.items()):
+        wrapped = factory(adapter)
+        if wrapped is not adapter:
+            session.mount(prefix, wrapped)
+    return session
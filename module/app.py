@@ -1,32 +1,47 @@
-from dropbox import Dropbox, DropboxTeam, DropboxOAuth2FlowNoRedirect
+from dropbox import Dropbox, DropboxTeam, DropboxOAuth2FlowNoRedirect, create_session
 from dropbox.files import FolderMetadata, FileMetadata, ListFolderResult, DeletedMetadata
 from dropbox.team import TeamNamespacesListResult, NamespaceMetadata, NamespaceType
-from dropbox.team import GroupsMembersListResult, MembersListResult, GroupMemberInfo, MemberProfile
-from dropbox.team import TeamFolderListResult, TeamFolderMetadata, TeamFolderStatus
-from dropbox.sharing import GroupMembershipInfo, SharedFolderMembers, GroupInfo, UserMembershipInfo, UserInfo, \
-    AccessLevel, SharedFileMembers, SharedLinkMetadata, FileLinkMetadata, FolderLinkMetadata
+from dropbox.team import MemberProfile, TeamMemberProfile
+from dropbox.team import TeamFolderMetadata, TeamFolderStatus
+from dropbox.sharing import GroupMembershipInfo, SharedFolderMembers, GroupInfo, SharedFileMembers, \
+    SharedLinkMetadata, FileLinkMetadata, FolderLinkMetadata
 from dropbox.exceptions import AuthError
+from dropbox.common import PathRoot
 from zipfile import ZipFile
 from dropbox.users import FullAccount
-from threading import Thread
+from threading import Thread, Lock
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from rich.live import Live
 from rich.table import Table
-from rich.console import Console
+from rich.console import Console, Group
 from datetime import datetime
+from collections import deque
 import webbrowser
+import atexit
 import configparser
 import time
 import json
 import os
-import csv
 import re
-from prettytable import PrettyTable
-from openpyxl import load_workbook
-from docx import Document
-from docx.opc.constants import RELATIONSHIP_TYPE
-import fitz
+from module.output import OrderedRowWriter, StreamRowWriter, QueuedWriter, TableSink, ConsoleTable, OUTPUT_FORMATS, \
+    FOLDER_SCHEMA, OWNER_SCHEMA, MEMBER_SCHEMA, ALL_MEMBER_SCHEMA, FILE_SCHEMA
+from module.database import ReportDatabase, folder_records, file_records
+from module.metrics import ApiMetrics
+from module.tracing import Tracer, NullTracer, traced_folder
+from module.progress import Progress
+from module.tokens import TokenManager
+from module.directory import TeamDirectory, DIRECTORY_TTL
+from module.namespaces import NamespaceRegistry
+from module.ratelimit import RateLimiter
+from module.changes import ChangeTracker
+from module.cassette import Cassette
+from module.pipeline import Pipeline
+from module.files import atomic_write
+from module.remotezip import OfficeDocument, RemoteZipError, read_office_document, RANGE_MIN_SIZE
 
 console = Console()
+# Files whose content is read by the file report (embedded files and Dropbox links)
+DOCUMENT_TYPES = ['docx', 'xlsx', 'pdf']
 
 
 class LiveProcess(Thread):
@@ -35,20 +50,32 @@ class LiveProcess(Thread):
         self.app = app
 
     def run(self):
-        with Live(self.app.render_result(), refresh_per_second=1, screen=True) as live:
+        if self.app.progress_mode == 'json':
+            next_record = time.time()
             while self.app.status == "PROCESSING":
+                if time.time() >= next_record:
+                    self.app.progress.emit(self.app.progress_record())
+                    next_record = time.time() + self.app.progress_interval
                 time.sleep(0.5)
-                table = self.app.render_result()
-                live.update(table)
+            self.app.progress.emit(self.app.progress_record())
+            return
+        with Live(self.render(), auto_refresh=False, screen=True) as live:
+            while self.app.status == "PROCESSING":
+                time.sleep(1)
+                live.update(self.render(), refresh=True)
         console.print(
             '[green]'
             f'Files: {self.app.root.total_file:,} | '
             f'Folders: {self.app.root.total_folder:,} | '
             f'Total Size: {self.app.sizeof_fmt(self.app.root.size)} | '
+            f'API Calls: {self.app.metrics.total_calls:,} | '
             f'Running Time: {self.app.sec_to_hours(int(time.time() - self.app.root.tic))}'
             '[/green]'
         )
 
+    def render(self):
+        return Group(self.app.render_result(), self.app.render_metrics())
+
 
 class File:
     def __init__(self, obj: FileMetadata, last_modified=None, created_at=None):
@@ -67,6 +94,22 @@ class File:
         self.is_duplicate_in_root = False
         self.embedded = list()
         self.linked = list()
+        self.order = tuple()
+
+
+class FileTask:
+    # A file on its way through the stages of the file report (see DropBoxApp.run_file_pipeline)
+    def __init__(self, file: File, folder, level, client, span=None):
+        self.file = file
+        self.folder = folder
+        self.level = level
+        self.client = client
+        # Span of the folder listing the file, parent of the spans of its stages
+        self.span = span
+        self.path = file.path_display
+        self.document = False
+        # Downloaded document, its path in the tmp folder or the parts read in ranges
+        self.content = None
 
 
 class Folder:
@@ -96,7 +139,10 @@ class Folder:
         self.sub_folder_non_recursive = 0
         self.sub_folder_recursive = 0
         self.status = "PROCESSING"
-        self.files_content_hash = list()
+        self.files_content_hash = set()
+        # Pre-order position in the report, rows are sorted by it when the output is written
+        self.order = tuple()
+        self.child_count = 0
 
         # For member report
         self.private_count = 0
@@ -112,10 +158,16 @@ class Folder:
 
         self.id = folder_id
         self.parent_id = backup['parent_id']
+        self.type = backup['type']
+        self.level = backup['level']
+        self.namespace = backup.get('namespace', '')
+        self.owner = backup.get('owner', '')
+        self.order = tuple(backup.get('order', []))
         self.name = backup['name']
         self.path_display = backup['path_display']
         self.path_lower = backup['path_lower']
         self.members = backup['members']
+        self.groups = backup['groups']
         self.total_file = backup['total_file']
         self.total_folder = backup['total_folder']
         self.size = backup['size']
@@ -134,11 +186,19 @@ class Folder:
         if id_:
             self.id = id_
         if parent:
-            self.parent_id = parent.id
-            self.parent = parent
+            self.set_parent(parent)
         if type_:
             self.type = type_
 
+    def set_parent(self, parent):
+        self.parent_id = parent.id
+        self.parent = parent
+        self.order = parent.next_order()
+
+    def next_order(self):
+        self.child_count += 1
+        return self.order + (self.child_count,)
+
     def done(self):
         self.status = "DONE"
         self.toc = time.time()
@@ -166,17 +226,56 @@ class Folder:
         if self.parent:
             self.parent.add_folder(folder, direct_parent=False)
 
+    def add_totals(self, folder):
+        # Totals of a folder not traversed in this run (rollup of the last run, see module/changes.py)
+        self.total_file += folder.total_file
+        self.total_folder += folder.total_folder
+        self.sub_folder_recursive += folder.sub_folder_recursive
+        self.size += folder.size
+        if folder.last_modified:
+            if not self.last_modified or folder.last_modified > self.last_modified:
+                self.last_modified = folder.last_modified
+        if folder.created_at:
+            if not self.created_at or folder.created_at < self.created_at:
+                self.created_at = folder.created_at
+        if self.parent:
+            self.parent.add_totals(folder)
+
+    def count_folder(self, direct_parent=True):
+        # A sub-folder counted without a Folder of its own (see DropBoxApp.aggregate_folder)
+        self.total_folder += 1
+        if direct_parent:
+            self.sub_folder_non_recursive += 1
+        self.sub_folder_recursive += 1
+        if self.parent:
+            self.parent.count_folder(direct_parent=False)
+
 
 class DropBoxApp:
     def __init__(self, team_access=True, app_key=None, app_secret=None, remember_access_token=True,
-                 auto_refresh_access_token=True):
+                 auto_refresh_access_token=True, output_format='csv', database=None, session=None,
+                 access_token=None, refresh_token=None, metrics_format='json', trace_format=None,
+                 progress_mode='live', progress_interval=10, quiet=False, directory_ttl=DIRECTORY_TTL, record=None,
+                 replay=None, replay_speed=1.0):
         self.is_report_owner = False
-        self.team_members_email = list()
+        self.output_format = output_format
+        self.database = database
+        # Emails of the team members, owners of the owner report are classified against it
+        self.team_members_email = set()
+        # Owners found not to be team members
+        self.non_members_email = set()
         self.app_key = app_key
         self.app_secret = app_secret
         self.team_access = team_access
-        self.current_thread = 0
         self.max_thread = 1
+        # Stages of the file report, workers per stage and room in front of each
+        self.pipeline = None
+        self.file_workers = {'enrich': 4, 'download': 1, 'parse': 1}
+        self.queue_size = 100
+        # Documents read in ranges or downloaded whole, with the bytes read and the size of the documents
+        self.full_download = False
+        self.documents = {'ranged': 0, 'downloaded': 0, 'bytes': 0, 'size': 0}
+        self.documents_lock = Lock()
         self.dropbox = None
         self.dropbox_team = None
         self.dropbox_team_as_admin = None
@@ -192,33 +291,86 @@ class DropBoxApp:
         self.team_namespaces: list[NamespaceMetadata] = list()
         self.team_members: list[MemberProfile] = list()
         self.team_folders: list[TeamFolderMetadata] = list()
+        # A cassette holds every request of its run: the directory is listed rather than read from the cache
+        self.directory = TeamDirectory(ttl=0 if record or replay else directory_ttl)
+        self.namespaces = NamespaceRegistry()
         self.remember_access_token = remember_access_token
         self.auto_refresh_access_token = auto_refresh_access_token
+        # requests session shared by every client (e.g. the fake API of module/fake_server.py), instrumented so
+        # that every API call of the report is measured per endpoint
+        self.metrics = ApiMetrics()
+        self.metrics_format = metrics_format
+        # Spans of the run, written once the output name is known (see prepare_output_file)
+        self.trace_format = trace_format
+        self.tracer = NullTracer()
+        # Every request recorded to a cassette or served from one, with no network nor tokens (module/cassette.py)
+        self.cassette = None
+        session = session if session is not None else create_session()
+        if record or replay:
+            self.cassette = Cassette(record or replay, mode='record' if record else 'replay', speed=replay_speed)
+            self.cassette.install(session)
+            atexit.register(self.cassette.close)
+        if replay:
+            access_token = access_token or 'replay'
+            refresh_token = refresh_token or 'replay'
+            self.remember_access_token = False
+        self.session = self.metrics.instrument(session)
+        # One pause for every thread when the API answers 429
+        self.rate_limiter = RateLimiter()
+        self.rate_limiter.install(self.session)
         self.config = configparser.ConfigParser()
         self.config.read('session.ini')
-        self.access_token = self.config.get("SESSION", "ACCESS_TOKEN")
-        self.refresh_token = self.config.get("SESSION", "REFRESH_TOKEN")
+        self.session_lock = Lock()
+        self.tokens = None
+        self.access_token = access_token if access_token is not None else self.config.get("SESSION", "ACCESS_TOKEN")
+        self.refresh_token = refresh_token if refresh_token is not None \
+            else self.config.get("SESSION", "REFRESH_TOKEN")
+        # UTC, as the SDK keeps it
+        expiration = self.config.get("SESSION", "ACCESS_TOKEN_EXPIRATION", fallback='') \
+            if access_token is None else ''
+        self.access_token_expiration = datetime.strptime(expiration, '%Y-%m-%dT%H:%M:%S') if expiration else None
         self.output_name = None
         self.render_relative_path = None
         self.max_level = 9999
+        # Folders below max_level are only counted in the deepest folder written above them
+        self.aggregate = False
+        # Rollups of the spaces untouched since the last run (-changes)
+        self.changes = None
         self.root = Folder()
         self.backup = dict()
-        self.result = list()
+        # Last folders of the live table, the totals come from the counters of the root and of self.progress
+        self.result = deque(maxlen=10)
         self.total_folder = 0
         self.status = "PROCESSING"
+        self.progress = Progress()
+        self.progress_mode = progress_mode
+        self.progress_interval = progress_interval
+        self.quiet = quiet
         self.live_process = LiveProcess(app=self)
         self.folders = dict()
-        self.wb = self.ws = self.output_file = self.output_writer = None
+        self.writer = self.output_writer = self.display_writer = self.database_writer = None
         self.auth()
 
     def update_backup(self, folder: Folder, write=True):
+        self.backup[folder.id] = self.folder_backup(folder)
+        if folder.parent:
+            self.update_backup(folder.parent, write=False)
+        if write:
+            with open(f'session/{self.output_name}.json', 'w') as f:
+                json.dump(self.backup, f)
+
+    @staticmethod
+    def folder_backup(folder: Folder):
         parent_id = folder.parent.id if folder.parent else None
         last_modified = f'{folder.last_modified:%m/%d/%y %H:%M:%S}' if folder.last_modified else None,
         created_at = f'{folder.created_at:%m/%d/%y %H:%M:%S}' if folder.created_at else None,
-        self.backup[folder.id] = {
+        return {
             'parent_id': parent_id,
             'type': folder.type,
             'level': folder.level,
+            'namespace': folder.namespace,
+            'owner': folder.owner,
+            'order': list(folder.order),
             'name': folder.name,
             'path_display': folder.path_display,
             'path_lower': folder.path_lower,
@@ -235,38 +387,56 @@ class DropBoxApp:
             'tic': folder.tic,
             'toc': time.time()
         }
-        if folder.parent:
-            self.update_backup(folder.parent, write=False)
-        if write:
-            with open(f'session/{self.output_name}.json', 'w') as f:
-                json.dump(self.backup, f)
 
     def prepare_client(self):
-        self.dropbox = Dropbox(
-            oauth2_access_token=self.access_token,
-            oauth2_refresh_token=self.refresh_token,
-            app_key=self.app_key
-        )
+        # Every client (and the as_user/as_admin clients derived from them) gets its token from the token manager
+        # through the session, the token of session.ini is only refreshed when it is about to expire
+        if self.tokens:
+            self.tokens.stop()
+        self.tokens = TokenManager(self.access_token, self.refresh_token, expiration=self.access_token_expiration,
+                                   app_key=self.app_key, session=self.session, on_refresh=self.token_refreshed)
+        self.tokens.install(self.session)
+        self.tokens.start()
+        self.dropbox = Dropbox(oauth2_access_token=self.access_token, session=self.session)
         self.client = self.dropbox
         if self.team_access:
-            self.dropbox_team = DropboxTeam(
-                oauth2_access_token=self.access_token,
-                oauth2_refresh_token=self.refresh_token,
-                app_key=self.app_key
-            )
-            self.admin = self.dropbox_team.team_token_get_authenticated_admin().admin_profile
+            self.dropbox_team = DropboxTeam(oauth2_access_token=self.access_token, session=self.session)
+            self.admin = self.cached_admin()
+            if not self.admin:
+                self.admin = self.dropbox_team.team_token_get_authenticated_admin().admin_profile
+                if self.remember_access_token:
+                    self.update_session()
             self.dropbox_team_as_admin = self.dropbox_team.as_admin(self.admin.team_member_id)
             self.client = self.dropbox_team_as_admin
+            self.directory.open(self.dropbox_team, owner=self.admin.team_member_id)
+
+    def token_refreshed(self, access_token, expiration):
+        self.access_token = access_token
+        self.access_token_expiration = expiration
+        if self.remember_access_token:
+            self.update_session()
+
+    def cached_admin(self):
+        # Admin of the tokens of session.ini, saved with them so that a start doesn't have to ask for it again
+        if not self.remember_access_token or self.cassette or not self.config.has_section('ADMIN'):
+            return None
+        admin = self.config['ADMIN']
+        if not admin.get('TEAM_MEMBER_ID'):
+            return None
+        return TeamMemberProfile(team_member_id=admin['TEAM_MEMBER_ID'], email=admin.get('EMAIL', ''),
+                                 account_id=admin.get('ACCOUNT_ID', ''))
 
     def auth(self, retry=False):
 
         if self.access_token and self.refresh_token:
-            self.prepare_client()
             try:
-                self.dropbox.check_and_refresh_access_token()
+                self.prepare_client()
             except AuthError:
                 self.access_token = ''
                 self.refresh_token = ''
+                self.access_token_expiration = None
+                self.admin = None
+                self.config.remove_section('ADMIN')
                 self.update_session()
                 self.auth(retry=True)
 
@@ -288,34 +458,47 @@ class DropBoxApp:
 
             self.access_token = oauth_result.access_token
             self.refresh_token = oauth_result.refresh_token
+            self.access_token_expiration = oauth_result.expires_at
+            self.config.remove_section('ADMIN')
 
             self.prepare_client()
 
             if self.remember_access_token:
                 self.update_session()
 
-        current_account = self.client.users_get_current_account()
+        email = self.admin.email if self.admin else self.client.users_get_current_account().email
 
         if not retry:
             console.print(
                 "[green]"
                 "Successfully set up client with account "
-                f"[bold italic]{current_account.email}[/bold italic]"
+                f"[bold italic]{email}[/bold italic]"
                 "[/green]"
             )
 
     def update_session(self):
-        self.config.set('SESSION', 'ACCESS_TOKEN', self.access_token)
-        self.config.set('SESSION', 'REFRESH_TOKEN', self.refresh_token)
-
-        with open(f'session.ini', 'w') as configfile:
-            self.config.write(configfile)
+        # Called by the token manager's thread as well: one writer of the config at a time, and a crash never
+        # leaves a truncated session.ini behind
+        with self.session_lock:
+            if not self.config.has_section('SESSION'):
+                self.config.add_section('SESSION')
+            self.config.set('SESSION', 'ACCESS_TOKEN', self.access_token)
+            self.config.set('SESSION', 'REFRESH_TOKEN', self.refresh_token)
+            expiration = f'{self.access_token_expiration:%Y-%m-%dT%H:%M:%S}' if self.access_token_expiration else ''
+            self.config.set('SESSION', 'ACCESS_TOKEN_EXPIRATION', expiration)
+            if self.admin:
+                self.config['ADMIN'] = {
+                    'TEAM_MEMBER_ID': self.admin.team_member_id,
+                    'EMAIL': self.admin.email,
+                    'ACCOUNT_ID': self.admin.account_id or '',
+                }
+            atomic_write('session.ini', self.config.write)
 
     def update_live_result(self, folder=None):
         self.total_folder += 1
         last_modified = f'{folder.last_modified:%m/%d/%Y}' if folder.last_modified else ""
         created_at = f'{folder.created_at:%m/%d/%Y}' if folder.created_at else ""
-        if self.is_report_owner:
+        if not self.is_report_owner:
             self.result.append((
                 folder.type,
                 folder.namespace,
@@ -345,18 +528,65 @@ class DropBoxApp:
                 f'{folder.total_file:,}',
                 str(len(folder.members)),
                 str(len(folder.groups)),
-                'Team member' if folder.owner in self.team_members_email else "Non team member",
+                'Team member' if self.is_team_member(folder.owner) else "Non team member",
                 folder.owner,
                 f'{folder.exec_time:.1f}'
             ))
 
+    def progress_record(self):
+        return self.progress.record(self.status, self.root.tic, self.root.total_file, self.root.total_folder,
+                                    self.root.size, self.metrics.total_calls)
+
+    def start_progress(self, live=True):
+        # The member and file reports print their own table, they only run the JSON progress
+        if (live and not self.quiet) or self.progress_mode == 'json':
+            self.live_process.start()
+
+    def stop_progress(self):
+        self.status = 'DONE'
+        if self.live_process.is_alive():
+            self.live_process.join()
+
+    def render_metrics(self):
+        elapsed = max(time.time() - self.metrics.tic, 1)
+        table = Table(title=f'API Calls: {self.metrics.total_calls:,} ({self.metrics.total_calls / elapsed:,.1f}/s)')
+        for column in ['Endpoint', 'Calls', 'Errors', 'Retries', 'Received', 'Avg (ms)', 'p95 (ms)', 'Max (ms)']:
+            if column == 'Endpoint':
+                table.add_column(column, no_wrap=True, min_width=32)
+            else:
+                table.add_column(column, justify='right')
+        endpoints = sorted(self.metrics.snapshot().items(), key=lambda item: item[1]['seconds'], reverse=True)
+        for endpoint, metrics in endpoints:
+            table.add_row(
+                endpoint,
+                f'{metrics["calls"]:,}',
+                f'{sum(metrics["errors"].values()):,}',
+                f'{metrics["retries"]:,}',
+                self.sizeof_fmt(metrics['response_bytes']),
+                f'{1000 * metrics["seconds"] / metrics["calls"]:,.0f}',
+                f'{1000 * metrics["p95_seconds"]:,.0f}',
+                f'{1000 * metrics["max_seconds"]:,.0f}'
+            )
+        return table
+
+    def dump_metrics(self):
+        if not self.output_name:
+            return
+        extension = 'prom' if self.metrics_format == 'prometheus' else 'json'
+        self.metrics.dump(f'output/{self.output_name}.metrics.{extension}', format_=self.metrics_format)
+        self.tracer.close()
+
     def render_result(self):
+        progress = self.progress_record()
         title = [
-            f'Files: {self.root.total_file:,}',
-            f'Folders: {self.root.total_folder:,}',
-            f'Total Size: {self.sizeof_fmt(self.root.size)}',
-            f'Running Time: {self.sec_to_hours(int(time.time() - self.root.tic))}',
+            f'Files: {progress["files"]:,} ({progress["files_per_second"]:,.0f}/s)',
+            f'Folders: {progress["folders"]:,}',
+            f'Total Size: {self.sizeof_fmt(progress["bytes"])}',
+            f'Running Time: {self.sec_to_hours(int(progress["elapsed"]))}',
         ]
+        if progress['eta'] is not None:
+            title.append(f'Spaces: {progress["spaces_done"]:,}/{progress["spaces"]:,}')
+            title.append(f'ETA: {self.sec_to_hours(progress["eta"])}')
         table = Table(title=' | '.join(title))
         table.add_column("Type")
         table.add_column('Name Space')
@@ -374,14 +604,9 @@ class DropBoxApp:
             table.add_column("Owned by")
             table.add_column("Owner")
         table.add_column("Exec Time (s)")
-        rows = list()
-        for index, row in enumerate(reversed(self.result)):
-            if index < 10:
-                rows.append(row)
-            else:
-                table.add_row('...', '...', '...', '...', '...', '...', '...', '...')
-                break
-        for row in reversed(rows):
+        if self.total_folder > len(self.result):
+            table.add_row('...', '...', '...', '...', '...', '...', '...', '...')
+        for row in self.result:
             if not self.is_report_owner:
                 (type_, name_space, level, path, size, sub_folder_r, sub_folder_non_r,
                  created_at, last_modified, files, members, groups, exec_time) = row
@@ -396,36 +621,45 @@ class DropBoxApp:
                               created_at, last_modified, files, members, groups, owned_by, owner, exec_time)
         return table
 
-    def report_path(self, output_name, path='', max_level=9999):
+    def report_path(self, output_name, path='', max_level=9999, aggregate=False):
         path = '' if path == '/' else path
         self.render_relative_path = path if path else None
         self.max_level = max_level
+        self.aggregate = aggregate
         self.output_name = output_name
         self.root.update(path)
         self.check_backup()
-        self.live_process.start()
+        self.progress.add_spaces(1)
+        self.start_progress()
         self.get_path(folder=self.root)
-        self.status = 'DONE'
-        self.output_file.close()
-        self.reverse_output()
+        self.progress.space_done()
+        self.stop_progress()
+        self.writer.close()
+        self.dump_metrics()
 
-    def report_owner(self, output_name, max_level=9999, running_space=None):
+    def report_owner(self, output_name, max_level=9999, running_space=None, aggregate=False, changes=False):
         path = ''
         self.is_report_owner = True
         self.max_level = max_level
+        self.aggregate = aggregate
         self.output_name = output_name
         self.root.update(path)
         self.root.namespace = self.root.type = 'root'
-        self.check_backup()
-        self.live_process.start()
 
         self.team_members = self.get_team_member()
-        for team_member in self.team_members:
-            self.team_members_email.append(team_member.email)
+        self.team_members_email = set(self.directory.by_email)
+
+        resumed = self.check_backup()
+        if changes:
+            self.open_changes(scope='owner_' + '_'.join(sorted(running_space)), resumed=resumed)
+        if 'member' in running_space:
+            self.progress.add_spaces(len(self.team_members))
+        self.start_progress()
 
         if 'team' in running_space:
             # 1. Get team folder meta data for mapping in namespace
             self.team_folders = self.get_team_folders()
+            self.progress.add_spaces(len(self.team_folders))
 
             for team_folder in self.team_folders:
                 team_folder_root = Folder(level=1, namespace=team_folder.name)
@@ -433,25 +667,31 @@ class DropBoxApp:
                 type_ = "Team Folder"
                 if status.is_archived() or status.is_archive_in_progress():
                     # TODO Check if can get content of archived team folder
+                    self.progress.space_done()
                     continue
                     type_ = "Archived Team Folder"
                 team_folder_root.update(path=f'/{team_folder.name}', id_=f'ns:{team_folder.team_folder_id}',
                                         parent=self.root, type_=type_)
+                self.namespaces.claim(team_folder.team_folder_id, by=team_folder.name)
                 client = self.dropbox_team_as_admin
                 # print(team_folder)
-                self.get_path(folder=team_folder_root, client=client, current_level=2)
+                self.report_space(team_folder_root, client, namespace_id=team_folder.team_folder_id)
+                self.progress.space_done()
 
         if 'other' in running_space:
             # 2. Get namespace from root and run report
             namespaces = self.get_namespaces(types=['app_folder', 'other'])
+            self.progress.add_spaces(len(namespaces))
             for namespace in namespaces:
-                namespace_root = Folder(namespace=namespace.name.display_name, level=1)
+                namespace_root = Folder(namespace=namespace.name, level=1)
                 type_ = self.verify_namespace_tag(namespace)
                 # print(namespace)
                 namespace_root.update(path='', id_=f'ns:{namespace.namespace_id}', parent=self.root, type_=type_)
-                client = self.dropbox_team.as_user(namespace.team_member_id)
+                client = self.namespace_client(namespace)
                 account = client.users_get_current_account()
-                self.get_path(folder=namespace_root, client=client, verify_id=account.account_id, current_level=2)
+                self.report_space(namespace_root, client, namespace_id=namespace.namespace_id,
+                                  verify_id=account.account_id)
+                self.progress.space_done()
 
         if 'member' in running_space:
             # 3. Get Team Member's Personal Space (Private Folder)
@@ -463,52 +703,65 @@ class DropBoxApp:
                 team_member_root.update(path='', id_=f'tm:{team_member.team_member_id}', parent=self.root, type_=type_)
                 client = self.dropbox_team.as_user(team_member.team_member_id)
                 # TODO: Check if only report content that owned by this user (avoid duplicate)
-                self.get_path(folder=team_member_root, client=client, verify_id=team_member.account_id, current_level=2)
+                self.report_space(team_member_root, client, namespace_id=team_member.member_folder_id,
+                                  verify_id=team_member.account_id)
+                self.progress.space_done()
 
         self.record(self.root)
-        self.status = 'DONE'
-        self.output_file.close()
-        self.reverse_output()
+        self.stop_progress()
+        self.writer.close()
+        self.close_changes()
+        self.dump_metrics()
 
-    def report(self, output_name, max_level=9999):
+    def report(self, output_name, max_level=9999, aggregate=False, changes=False):
         path = ''
         self.max_level = max_level
+        self.aggregate = aggregate
         self.output_name = output_name
         self.root.update(path)
         self.root.namespace = self.root.type = 'root'
-        self.check_backup()
-        self.live_process.start()
+        resumed = self.check_backup()
+        if changes:
+            self.open_changes(scope='report', resumed=resumed)
 
-        # 1. Get team folder meta data for mapping in namespace
+        # Every space is listed first, their count gives the ETA of the report
         self.team_folders = self.get_team_folders()
+        namespaces = self.get_namespaces(types=['app_folder', 'other'])
+        self.team_members = self.get_team_member()
+        self.progress.add_spaces(len(self.team_folders) + len(namespaces) + len(self.team_members))
+        self.start_progress()
 
+        # 1. Get team folder meta data for mapping in namespace
         for team_folder in self.team_folders:
             team_folder_root = Folder(level=1, namespace=team_folder.name)
             status: TeamFolderStatus = team_folder.status
             type_ = "Team Folder"
             if status.is_archived() or status.is_archive_in_progress():
                 # TODO Check if can get content of archived team folder
+                self.progress.space_done()
                 continue
                 type_ = "Archived Team Folder"
             team_folder_root.update(path=f'/{team_folder.name}', id_=f'ns:{team_folder.team_folder_id}',
                                     parent=self.root, type_=type_)
+            self.namespaces.claim(team_folder.team_folder_id, by=team_folder.name)
             client = self.dropbox_team_as_admin
             # print(team_folder)
-            self.get_path(folder=team_folder_root, client=client, current_level=2)
+            self.report_space(team_folder_root, client, namespace_id=team_folder.team_folder_id)
+            self.progress.space_done()
 
         # 2. Get namespace from root and run report
-        namespaces = self.get_namespaces(types=['app_folder', 'other'])
         for namespace in namespaces:
-            namespace_root = Folder(namespace=namespace.name.display_name, level=1)
+            namespace_root = Folder(namespace=namespace.name, level=1)
             type_ = self.verify_namespace_tag(namespace)
             # print(namespace)
             namespace_root.update(path='', id_=f'ns:{namespace.namespace_id}', parent=self.root, type_=type_)
-            client = self.dropbox_team.as_user(namespace.team_member_id)
+            client = self.namespace_client(namespace)
             account = client.users_get_current_account()
-            self.get_path(folder=namespace_root, client=client, verify_id=account.account_id, current_level=2)
+            self.report_space(namespace_root, client, namespace_id=namespace.namespace_id,
+                              verify_id=account.account_id)
+            self.progress.space_done()
 
         # 3. Get Team Member's Personal Space (Private Folder)
-        self.team_members = self.get_team_member()
         for team_member in self.team_members:
             # print(team_member)
             team_member_root = Folder(namespace=team_member.name.display_name)
@@ -517,24 +770,127 @@ class DropBoxApp:
             team_member_root.update(path='', id_=f'tm:{team_member.team_member_id}', parent=self.root, type_=type_)
             client = self.dropbox_team.as_user(team_member.team_member_id)
             # TODO: Check if only report content that owned by this user (avoid duplicate)
-            self.get_path(folder=team_member_root, client=client, verify_id=team_member.account_id, current_level=2)
+            self.report_space(team_member_root, client, namespace_id=team_member.member_folder_id,
+                              verify_id=team_member.account_id)
+            self.progress.space_done()
 
         self.record(self.root)
-        self.status = 'DONE'
-        self.output_file.close()
-        self.reverse_output()
+        self.stop_progress()
+        self.writer.close()
+        self.close_changes()
+        self.dump_metrics()
+
+    def crawl(self, output_name, outputs, max_level=9999, full_download=False):
+        # Every requested output from a single crawl of the spaces of report() (see module/crawl.py)
+        from module.crawl import Crawler, CRAWL_OUTPUTS
+        self.max_level = max_level
+        self.full_download = full_download
+        self.output_name = output_name
+        self.root.update('')
+        self.root.namespace = self.root.type = 'root'
+
+        self.team_folders = self.get_team_folders()
+        namespaces = self.get_namespaces(types=['app_folder', 'other'])
+        self.team_members = self.get_team_member()
+        self.team_members_email = set(self.directory.by_email)
+        self.progress.add_spaces(len(self.team_folders) + len(namespaces) + len(self.team_members))
+
+        sinks = [CRAWL_OUTPUTS[output](app=self, max_level=max_level) for output in outputs]
+        self.writer = QueuedWriter()
+        for sink in sinks:
+            # Folders and files go once to the database, with the owners and the documents when asked for
+            if sink.name == 'folders' and 'owners' in outputs or sink.name == 'files' and 'documents' in outputs:
+                sink.database = False
+            sink.open(self.writer, output_name, self.output_format)
+        self.prepare_side_outputs()
+        self.writer.start()
+        self.start_progress()
+        crawler = Crawler(self, sinks)
+
+        for team_folder in self.team_folders:
+            status: TeamFolderStatus = team_folder.status
+            if status.is_archived() or status.is_archive_in_progress():
+                self.progress.space_done()
+                continue
+            team_folder_root = Folder(level=1, namespace=team_folder.name)
+            team_folder_root.update(path=f'/{team_folder.name}', id_=f'ns:{team_folder.team_folder_id}',
+                                    parent=self.root, type_="Team Folder")
+            self.namespaces.claim(team_folder.team_folder_id, by=team_folder.name)
+            crawler.space(team_folder_root, self.dropbox_team_as_admin, level=2)
+            self.progress.space_done()
+
+        for namespace in namespaces:
+            namespace_root = Folder(namespace=namespace.name, level=1)
+            namespace_root.update(path='', id_=f'ns:{namespace.namespace_id}', parent=self.root,
+                                  type_=self.verify_namespace_tag(namespace))
+            client = self.namespace_client(namespace)
+            account = client.users_get_current_account()
+            crawler.space(namespace_root, client, level=2, verify_id=account.account_id)
+            self.progress.space_done()
+
+        for team_member in self.team_members:
+            team_member_root = Folder(namespace=team_member.name.display_name)
+            team_member_root.update(path='', id_=f'tm:{team_member.team_member_id}', parent=self.root,
+                                    type_="Private Folder")
+            client = self.dropbox_team.as_user(team_member.team_member_id)
+            crawler.space(team_member_root, client, level=2, verify_id=team_member.account_id,
+                          team_member=team_member)
+            self.progress.space_done()
+
+        crawler.done(self.root)
+        self.stop_progress()
+        self.writer.close()
+        self.dump_metrics()
+
+    def open_changes(self, scope, resumed=False):
+        # Spaces without audit log events since the last run reuse its rows (see module/changes.py), a resumed
+        # report traverses everything and keeps nothing
+        if resumed:
+            return
+        self.changes = ChangeTracker(scope=scope, max_level=self.max_level)
+        self.changes.open(self.dropbox_team, owner=self.admin.team_member_id)
+
+    def close_changes(self):
+        if self.changes:
+            self.changes.save()
+            self.print_status(self.changes.summary())
+
+    def report_space(self, folder, client, namespace_id, verify_id=None):
+        space = self.changes.unchanged(folder.id) if self.changes else None
+        if space:
+            self.reuse_space(folder, space)
+            return
+        if self.changes:
+            self.changes.start_space(folder, namespace_id, self.namespaces.claims)
+        self.get_path(folder=folder, client=client, verify_id=verify_id, current_level=2)
+        if self.changes:
+            self.changes.end_space(self.namespaces.claims)
+
+    def reuse_space(self, folder, space):
+        # Rows and totals of the last run, the shared folders it traversed are claimed as if it ran again
+        for namespace_id in space['claims']:
+            self.namespaces.claim(namespace_id, by=folder.id)
+        for folder_id, backup in space['folders']:
+            stored = Folder()
+            stored.load_backup(backup, folder_id)
+            stored.order = folder.order + stored.order
+            self.update_output(stored)
+            self.update_live_result(stored)
+            if folder_id == folder.id:
+                folder.parent.add_totals(stored)
 
     def verify_namespace_tag(self, namespace: NamespaceMetadata):
         return self.type_mapping[namespace.namespace_type._tag]
 
+    def namespace_client(self, namespace: NamespaceMetadata):
+        # Rooted in the namespace itself: without path root its member's client lists the member's own space, which
+        # is traversed (and its shared folders claimed) with the member
+        client = self.dropbox_team.as_user(namespace.team_member_id)
+        return client.with_path_root(PathRoot.namespace_id(namespace.namespace_id))
+
     def get_team_folders(self) -> list[TeamFolderMetadata]:
-        result = list()
-        r: TeamFolderListResult = self.dropbox_team.team_team_folder_list()
-        result.extend(r.team_folders)
-        while r.has_more:
-            r: TeamFolderListResult = self.dropbox_team.team_team_folder_list_continue(cursor=r.cursor)
-            result.extend(r.team_folders)
-        return result
+        # Every team folder of the tenant, listed by this run
+        return self.directory.team_folders(fresh=True)
 
     def get_namespaces(self, types=None) -> list[NamespaceMetadata]:
         result = list()
@@ -556,42 +912,43 @@ class DropBoxApp:
         return result
 
     def update_output(self, folder):
-        created_at = f"{folder.created_at:%Y-%m-%d}" if folder.created_at else ''
-        last_modified = f"{folder.last_modified:%Y-%m-%d}" if folder.last_modified else ''
         if folder.level <= self.max_level:
-            if not self.is_report_owner:
-                self.output_writer.writerow([
-                    folder.type,
-                    folder.namespace,
-                    folder.level,
-                    folder.path_display,
-                    folder.size,
-                    folder.sub_folder_non_recursive,
-                    folder.sub_folder_recursive,
-                    created_at,
-                    last_modified,
-                    folder.total_file,
-                    ', '.join(folder.members),
-                    ', '.join(folder.groups)
-                ])
-            else:
-                self.output_writer.writerow([
-                    folder.type,
-                    folder.namespace,
-                    folder.level,
-                    folder.path_display,
-                    folder.size,
-                    folder.sub_folder_non_recursive,
-                    folder.sub_folder_recursive,
-                    created_at,
-                    last_modified,
-                    folder.total_file,
-                    ', '.join(folder.members),
-                    ', '.join(folder.groups),
-                    'Team member' if folder.owner in self.team_members_email else 'Non team member',
-                    folder.owner
-                ])
+            self.output_writer.write(folder.order, self.folder_row(folder, owner=self.is_report_owner))
+            self.update_database(folder_records(folder, owned_by_team=self.owned_by_team(folder)))
 
+    def folder_row(self, folder, owner=False):
+        row = [
+            folder.type,
+            folder.namespace,
+            folder.level,
+            folder.path_display,
+            folder.size,
+            folder.sub_folder_non_recursive,
+            folder.sub_folder_recursive,
+            folder.created_at,
+            folder.last_modified,
+            folder.total_file,
+            folder.members,
+            folder.groups
+        ]
+        if owner:
+            row += ['Team member' if self.is_team_member(folder.owner) else 'Non team member', folder.owner]
+        return row
+
+    def owned_by_team(self, folder):
+        return int(self.is_team_member(folder.owner)) if folder.owner and self.team_members_email else None
+
+    def is_team_member(self, email):
+        if not email or not self.team_members_email or email in self.non_members_email:
+            return False
+        if email in self.team_members_email:
+            return True
+        # Joined after the members were listed at the start of the report
+        if self.directory.fetch_member(email):
+            self.team_members_email.add(email)
+            return True
+        self.non_members_email.add(email)
+        return False
 
     def record(self, folder: Folder, write_log=True):
         folder.done()
@@ -599,12 +956,15 @@ class DropBoxApp:
             self.update_output(folder)
             self.update_live_result(folder)
             self.update_backup(folder)
+            if self.changes:
+                self.changes.add_folder(folder.id, self.folder_backup(folder))
 
     def check_backup(self):
 
         backup_file = os.path.exists(f'session/{self.output_name}.json')
-        result_file = os.path.exists(f'output/{self.output_name}.csv')
-        if backup_file and result_file:
+        result_file = os.path.exists(self.output_path)
+        schema = OWNER_SCHEMA if self.is_report_owner else FOLDER_SCHEMA
+        if backup_file:
             backup = json.load(open(f'session/{self.output_name}.json'))
             resume = input("Backup file found "
                            f"({backup['root']['total_file']:,} files, {backup['root']['total_folder']:,} folders)"
@@ -624,30 +984,58 @@ class DropBoxApp:
                 for folder_id in self.folders:
                     if self.folders[folder_id].parent_id:
                         self.folders[folder_id].parent = self.folders[self.folders[folder_id].parent_id]
+                self.prepare_output_file(schema=schema)
                 for folder_id in self.folders:
                     self.update_backup(self.folders[folder_id], write=False)
                     if self.folders[folder_id].status == "DONE":
+                        # The output is only written when the report is finished, rebuild the rows of done folders
+                        self.update_output(self.folders[folder_id])
                         self.update_live_result(self.folders[folder_id])
                 self.update_backup(self.root, write=False)
-                self.prepare_output_file()
                 return True
 
         if backup_file:
             os.remove(f'session/{self.output_name}.json')
         if result_file:
-            os.remove(f'output/{self.output_name}.csv')
-
-        self.prepare_output_file()
-
-        self.output_writer.writerow([
-            'Type', 'Name Space', 'Level', 'Path', 'Size (byte)',
-            'subFolder (Non-Recursive)', 'subFolder (Recursive)',
-            'Created Date', 'Last Modified', 'Files', 'Members', 'Groups'
-        ])
-
-    def prepare_output_file(self, mode='a+'):
-        self.output_file = open(f'output/{self.output_name}.csv', mode=mode, encoding='utf-8', newline='')
-        self.output_writer = csv.writer(self.output_file)
+            os.remove(self.output_path)
+
+        self.prepare_output_file(schema=schema)
+
+    @property
+    def output_path(self):
+        return f'output/{self.output_name}.{self.output_format}'
+
+    def prepare_output_file(self, schema, display=None, ordered=True):
+        self.writer = QueuedWriter()
+        sink = OUTPUT_FORMATS[self.output_format](path=self.output_path, schema=schema)
+        self.output_writer = self.writer.add_sink(OrderedRowWriter(sink=sink) if ordered else StreamRowWriter(sink))
+        if display and not self.quiet:
+            self.display_writer = self.writer.add_sink(TableSink(display))
+        self.prepare_side_outputs()
+        self.writer.start()
+
+    def prepare_side_outputs(self):
+        # Database and trace of the run, next to the output(s) of self.writer
+        if self.database:
+            self.database_writer = self.writer.add_sink(ReportDatabase(path=self.database, run=self.output_name))
+        if self.trace_format and not self.tracer.enabled:
+            extension = 'jsonl' if self.trace_format == 'jsonl' else 'json'
+            self.tracer = self.metrics.tracer = Tracer(f'output/{self.output_name}.trace.{extension}',
+                                                       format_=self.trace_format)
+
+    def update_display(self, row):
+        if self.display_writer:
+            self.display_writer.write(row)
+
+    def print_status(self, *values, end='\n'):
+        # Console table header and transient lines (Processing..., Downloading...), nothing in quiet mode
+        if not self.quiet:
+            print(*values, end=end)
+
+    def update_database(self, records):
+        if self.database_writer:
+            for table, values in records:
+                self.database_writer.write(table, values)
 
     @staticmethod
     def sec_to_hours(seconds):
@@ -704,38 +1092,11 @@ class DropBoxApp:
                 exit()
 
     def get_team_member(self) -> list[MemberProfile]:
-        result = list()
-        contents: MembersListResult = self.dropbox_team.team_members_list()
-        member: GroupMemberInfo
-        for member in contents.members:
-            profile: MemberProfile = member.profile
-            result.append(profile)
-        while contents.has_more:
-            contents: MembersListResult = self.client.team_members_list_continue(cursor=contents.cursor)
-            member: GroupMemberInfo
-            for member in contents.members:
-                profile: MemberProfile = member.profile
-                result.append(profile)
-        return result
+        # Every member of the tenant, listed by this run
+        return self.directory.members(fresh=True)
 
     def get_group_members(self, group_id) -> [MemberProfile.email]:
-
-        result: [MemberProfile.email] = list()
-        from dropbox.team import GroupSelector
-        contents: GroupsMembersListResult = self.dropbox_team.team_groups_members_list(
-            group=GroupSelector.group_id(group_id))
-        member: GroupMemberInfo
-        for member in contents.members:
-            profile: MemberProfile = member.profile
-            result.append(profile.email)
-        while contents.has_more:
-            contents: GroupsMembersListResult = self.dropbox_team.team_groups_members_list_continue(
-                cursor=contents.cursor)
-            for member in contents.members:
-                profile: MemberProfile = member.profile
-                result.append(profile.email)
-
-        return result
+        return self.directory.group_members(group_id)
 
     @staticmethod
     def file_get_folder_by_client(client):
@@ -760,11 +1121,11 @@ class DropBoxApp:
         content: FullAccount = client.users_get_current_account()
         print(content.root_info)
 
+    @traced_folder('folder')
     def get_path(self, folder=None, current_level=1, client=None, cursor=None, verify_id=None):
         if folder.id in self.folders:
             if self.folders[folder.id].status == "DONE":
                 return self.folders[folder.id], True
-        self.dropbox.check_and_refresh_access_token()
         if not client:
             client = self.client
         if not cursor:
@@ -774,14 +1135,16 @@ class DropBoxApp:
             contents: ListFolderResult = client.files_list_folder_continue(cursor=cursor)
 
         for content in contents.entries:
-            if isinstance(content, FolderMetadata):
+            if isinstance(content, FolderMetadata) and self.aggregate and current_level > self.max_level:
+                self.aggregate_folder(folder, content, client, verify_id)
+            elif isinstance(content, FolderMetadata):
                 # print(content)
                 # TODO: The line below is condition verify to run test in small-scale, remove to run in recursive mode
                 # if current_level <= self.max_level:
                 content: FolderMetadata
                 # Child folder will be inherited folder type from the parent
                 new_folder = Folder(obj=content, namespace=folder.namespace, level=current_level, type_=folder.type)
-                new_folder.parent = folder
+                new_folder.set_parent(folder)
                 self.update_backup(new_folder)
 
                 # If have id need to verify, is_owner will be set to False by default
@@ -795,20 +1158,10 @@ class DropBoxApp:
                     # But if the parent is Member's Personal Space, may child folder is shared folder, verify it now!
                     if current_level == 1 and folder.type == 'Private Folder':
                         new_folder.type = "Shared Folder"
-                    r: SharedFolderMembers = client.sharing_list_folder_members(
-                        shared_folder_id=content.shared_folder_id)
-
-                    # Verify if this user is the folder's owner
-                    if verify_id:
-                        member: UserMembershipInfo
-                        for member in r.users:
-                            member_info: UserInfo = member.user
-                            member_access: AccessLevel = member.access_type
-                            if member_info.account_id == verify_id and member_access.is_owner():
-                                is_owner = True
-                                break
+                    is_owner = self.claim_shared(client, content.shared_folder_id, verify_id)
 
                     if is_owner:
+                        r: SharedFolderMembers = self.namespaces.members(client, content.shared_folder_id)
                         for member in r.users:
                             new_folder.members.append(f'({member.access_type._tag[0].upper()}) {member.user.email}')
                             if member.access_type._tag[0].upper() == "O":
@@ -828,7 +1181,6 @@ class DropBoxApp:
                     if not is_backup:
                         folder.add_folder(new_folder)
             if isinstance(content, FileMetadata):
-                print(content)
                 content: FileMetadata
                 revisions = client.files_list_revisions(path=content.path_lower).entries
                 client: Dropbox
@@ -843,18 +1195,33 @@ class DropBoxApp:
             self.record(folder)
         return folder, False
 
-    def reverse_output(self):
-        read_file = open(f'output/{self.output_name}.csv', mode='r', encoding='utf-8')
-        data = list(csv.reader(read_file, delimiter=","))
-        if data:
-            reversed_data = list()
-            reversed_data.append(data[0])
-            reversed_data.extend(reversed(data[1:]))
-            write_file = open(f'output/{self.output_name}.csv', mode='w', encoding='utf-8', newline='')
-            writer = csv.writer(write_file)
-            writer.writerows(reversed_data)
-            write_file.close()
-        read_file.close()
+    def claim_shared(self, client, shared_folder_id, verify_id=None):
+        # Mounts of a namespace already traversed (team folder, space of its owner) are skipped
+        if self.namespaces.claimed(shared_folder_id):
+            return False
+        # Verify if this user is the folder's owner
+        is_owner = self.namespaces.is_owner(client, shared_folder_id, verify_id) if verify_id else True
+        return is_owner and self.namespaces.claim(shared_folder_id, by=verify_id)
+
+    def aggregate_folder(self, folder, content: FolderMetadata, client, verify_id=None, direct_parent=True):
+        # Sub-folder below max_level (aggregate mode): its files and folders are added straight to the counters of
+        # `folder`, the deepest folder written, without a Folder, a backup entry nor a row of the live table.
+        # Shared folders are claimed as get_path does, their members are not asked for since no row shows them.
+        if content.shared_folder_id and not self.claim_shared(client, content.shared_folder_id, verify_id):
+            return
+        contents: ListFolderResult = client.files_list_folder(path=content.path_lower)
+        while True:
+            for entry in contents.entries:
+                if isinstance(entry, FolderMetadata):
+                    self.aggregate_folder(folder, entry, client, verify_id, direct_parent=False)
+                elif isinstance(entry, FileMetadata):
+                    revisions = client.files_list_revisions(path=entry.path_lower).entries
+                    folder.add_file(File(entry, last_modified=revisions[0].server_modified,
+                                         created_at=revisions[-1].server_modified))
+            if not contents.has_more:
+                break
+            contents = client.files_list_folder_continue(cursor=contents.cursor)
+        folder.count_folder(direct_parent)
 
     def test(self):
         self.client: DropboxTeam
@@ -866,8 +1233,8 @@ class DropBoxApp:
         r = self.client.files_list_revisions(path='/abc/2010.png')
         print(r)
 
-    def all_member_report(self, output_name, path=''):
-        display = PrettyTable()
+    def all_member_report(self, output_name, path='', max_thread=1, sort=False):
+        display = ConsoleTable()
         display.field_names = [
             'Member                             ',
             'Email                              ',
@@ -879,44 +1246,60 @@ class DropBoxApp:
         display.align[display.field_names[2]] = 'r'
         display.align[display.field_names[3]] = 'r'
         display.hrules = 1
-        print(display)
+        self.print_status(display)
 
         self.output_name = output_name
-        self.prepare_output_file(mode='w')
-        self.output_writer.writerow(['Member', 'Email', 'Private Folder', 'Shared Folder'])
+        # Rows are streamed as the members are done, or sorted by name once all of them are
+        self.prepare_output_file(schema=ALL_MEMBER_SCHEMA, display=display, ordered=sort)
 
         self.root.update(path)
         self.team_members = self.get_team_member()
+        self.progress.add_spaces(len(self.team_members))
+        self.start_progress(live=False)
 
-        for team_member in self.team_members:
-            team_member_root = Folder(namespace=team_member.name.display_name)
-            type_ = "Private Folder"
-            team_member_root.update(path='', id_=f'tm:{team_member.team_member_id}', parent=self.root, type_=type_)
+        def count(team_member, team_member_root):
             client = self.dropbox_team.as_user(team_member.team_member_id)
-            team_member_root = self.count_private_shared(
-                folder=team_member_root, client=client, verify_id=team_member.account_id
-            )
-            row = [team_member.name.display_name, team_member.email, team_member_root.private_count,
-                   team_member_root.shared_count]
-            self.output_writer.writerow(row)
-            row = [
-                self.shorten_text(team_member.name.display_name, 35),
-                self.shorten_text(team_member.email, 35),
-                team_member_root.private_count,
-                team_member_root.shared_count
-            ]
-            display.add_row(row)
-            print("\n".join(display.get_string().splitlines()[-2:]))
+            return self.count_private_shared(folder=team_member_root, client=client, verify_id=team_member.account_id)
 
-        self.output_file.close()
+        # Members are independent, up to `max_thread` of them are counted at once
+        with ThreadPoolExecutor(max_workers=max(max_thread, 1)) as pool:
+            futures = dict()
+            for team_member in self.team_members:
+                team_member_root = Folder(namespace=team_member.name.display_name)
+                type_ = "Private Folder"
+                team_member_root.update(path='', id_=f'tm:{team_member.team_member_id}', parent=self.root,
+                                        type_=type_)
+                futures[pool.submit(count, team_member, team_member_root)] = team_member
+            for future in as_completed(futures):
+                self.all_member_row(futures[future], future.result())
+
+        self.stop_progress()
+        self.writer.close()
+        self.dump_metrics()
         data = [
             f'Files: {self.root.total_file:,}',
             f'Folders: {self.root.total_folder:,}',
             f'Total Size: {self.sizeof_fmt(self.root.size)}',
+            f'API Calls: {self.metrics.total_calls:,}',
             f'Running Time: {self.sec_to_hours(int(time.time() - self.root.tic))}',
         ]
         print(' | '.join(data))
 
+    def all_member_row(self, team_member, team_member_root):
+        row = [team_member.name.display_name, team_member.email, team_member_root.private_count,
+               team_member_root.shared_count]
+        self.output_writer.write((team_member.name.display_name.lower(), team_member.email), row)
+        self.update_database([('members', row)])
+        row = [
+            self.shorten_text(team_member.name.display_name, 35),
+            self.shorten_text(team_member.email, 35),
+            team_member_root.private_count,
+            team_member_root.shared_count
+        ]
+        self.update_display(row)
+        self.progress.space_done()
+
+    @traced_folder('folder')
     def count_private_shared(self, folder, client: Dropbox, verify_id, cursor=None) -> Folder:
 
         if not cursor:
@@ -929,15 +1312,8 @@ class DropBoxApp:
                 content: FolderMetadata
                 if content.shared_folder_id:
                     # Check if user is owner
-                    r: SharedFolderMembers = client.sharing_list_folder_members(
-                        shared_folder_id=content.shared_folder_id)
-                    member: UserMembershipInfo
-                    for member in r.users:
-                        member_info: UserInfo = member.user
-                        member_access: AccessLevel = member.access_type
-                        if member_info.account_id == verify_id and member_access.is_owner():
-                            folder.shared_count += 1
-                            break
+                    if self.namespaces.is_owner(client, content.shared_folder_id, verify_id):
+                        folder.shared_count += 1
                 else:
                     folder.private_count += 1
 
@@ -948,7 +1324,7 @@ class DropBoxApp:
 
     def member_report(self, output_name, member_indentify, max_level=999, path='', skip_not_root=0):
 
-        display = PrettyTable()
+        display = ConsoleTable()
         display.field_names = [
             'Type           ',
             'Path                                                                            ',
@@ -960,44 +1336,48 @@ class DropBoxApp:
         display.align[display.field_names[2]] = 'r'
         display.align[display.field_names[3]] = 'r'
         display.hrules = 1
-        print(display)
+        self.print_status(display)
 
         self.output_name = output_name
-        self.prepare_output_file(mode='w')
-        self.output_writer.writerow(['Type', 'Path', 'Size', 'Level'])
+        self.prepare_output_file(schema=MEMBER_SCHEMA, display=display)
 
         self.root.update(path=path, type_="Private Folder")
         self.max_level = max_level
-        self.team_members = self.get_team_member()
+        team_member = self.directory.member(member_indentify)
+        self.progress.add_spaces(1)
+        self.start_progress(live=False)
 
-        for team_member in self.team_members:
-            if team_member.name.display_name == member_indentify or team_member.email == member_indentify:
-                team_member_root = Folder(namespace=team_member.name.display_name)
-                type_ = "Private Folder"
-                team_member_root.update(path='', id_=f'tm:{team_member.team_member_id}', parent=self.root, type_=type_)
-                client = self.dropbox_team.as_user(team_member.team_member_id)
-                team_member_root = self.get_private_shared(
-                    display, folder=team_member_root, client=client, verify_id=team_member.account_id, current_level=1,
-                    skip_not_root=skip_not_root
-                )
+        if team_member:
+            team_member_root = Folder(namespace=team_member.name.display_name)
+            type_ = "Private Folder"
+            team_member_root.update(path='', id_=f'tm:{team_member.team_member_id}', parent=self.root, type_=type_)
+            client = self.dropbox_team.as_user(team_member.team_member_id)
+            team_member_root = self.get_private_shared(
+                folder=team_member_root, client=client, verify_id=team_member.account_id, current_level=1,
+                skip_not_root=skip_not_root
+            )
+            self.progress.space_done()
+        else:
+            print(f"Member ({member_indentify}) not found.")
 
-        self.output_file.close()
-        self.reverse_output()
+        self.stop_progress()
+        self.writer.close()
+        self.dump_metrics()
 
         data = [
             f'Files: {self.root.total_file:,}',
             f'Folders: {self.root.total_folder:,}',
             f'Total Size: {self.sizeof_fmt(self.root.size)}',
+            f'API Calls: {self.metrics.total_calls:,}',
             f'Running Time: {self.sec_to_hours(int(time.time() - self.root.tic))}',
         ]
 
         print(' | '.join(data))
 
-    def get_private_shared(self, display, folder=None, current_level=1, client=None, cursor=None, verify_id=None,
+    @traced_folder('folder')
+    def get_private_shared(self, folder=None, current_level=1, client=None, cursor=None, verify_id=None,
                            skip_not_root=0):
 
-        self.dropbox.check_and_refresh_access_token()
-
         if not client:
             client = self.client
         if not cursor:
@@ -1005,16 +1385,16 @@ class DropBoxApp:
         else:
             contents: ListFolderResult = client.files_list_folder_continue(cursor=cursor)
         for content in contents.entries:
-            print(f'Processing {self.shorten_text(content.name, 40, True)}', end='')
+            self.print_status(f'Processing {self.shorten_text(content.name, 40, True)}', end='')
             if isinstance(content, FolderMetadata):
                 content: FolderMetadata
                 # Child folder will be inherited folder type from the parent
                 new_folder = Folder(obj=content, namespace=folder.namespace, level=current_level, type_=folder.type)
-                new_folder.parent = folder
+                new_folder.set_parent(folder)
 
                 # If have id need to verify, is_owner will be set to False by default
                 is_owner = False if verify_id else True
-                print('\r', end='')
+                self.print_status('\r', end='')
                 # In case folder didn't sharing info, this folder is owned by this user
                 if not content.shared_folder_id:
                     is_owner = True
@@ -1023,24 +1403,16 @@ class DropBoxApp:
                     # But if the parent is Member's Personal Space, may child folder is shared folder, verify it now!
                     if current_level == 1 and folder.type == 'Private Folder':
                         new_folder.type = "Shared Folder"
-                    r: SharedFolderMembers = client.sharing_list_folder_members(
-                        shared_folder_id=content.shared_folder_id)
 
                     # Verify if this user is the folder's owner
-                    if verify_id:
-                        member: UserMembershipInfo
-                        for member in r.users:
-                            member_info: UserInfo = member.user
-                            member_access: AccessLevel = member.access_type
-                            if member_info.account_id == verify_id and member_access.is_owner():
-                                is_owner = True
-                                new_folder.shared_count += 1
-                                break
+                    if verify_id and self.namespaces.is_owner(client, content.shared_folder_id, verify_id):
+                        is_owner = True
+                        new_folder.shared_count += 1
 
                 # Only get report if this user is the folder's owner
                 if is_owner:
                     if skip_not_root and current_level <= 1:
-                        new_folder = self.get_private_shared(display=display, folder=new_folder,
+                        new_folder = self.get_private_shared(folder=new_folder,
                                                              current_level=current_level + 1,
                                                              client=client, verify_id=verify_id,
                                                              skip_not_root=skip_not_root)
@@ -1051,25 +1423,25 @@ class DropBoxApp:
                 content: FileMetadata
                 new_file = File(content)
                 folder.add_file(new_file)
-                print('\r', end='')
+                self.print_status('\r', end='')
         if contents.has_more:
-            return self.get_private_shared(display=display, folder=folder, current_level=current_level,
+            return self.get_private_shared(folder=folder, current_level=current_level,
                                            client=client, cursor=contents.cursor, verify_id=verify_id)
         else:
             if folder.level <= self.max_level:
                 row = [folder.type, folder.path_display, folder.size, folder.level]
-                self.output_writer.writerow(row)
+                self.output_writer.write(folder.order, row)
+                self.update_database(folder_records(folder))
                 row = [folder.type, self.shorten_path(folder.path_display, 80), self.sizeof_fmt(folder.size),
                        folder.level]
-                display.add_row(row)
-                print("\n".join(display.get_string().splitlines()[-2:]))
+                self.update_display(row)
 
         return folder
 
     def file_report(self, output_name, member_indentify=None, team_indentify=None, max_level=999, path='', max_thread=1,
-                    check_content=1):
+                    check_content=1, enrich_thread=4, parse_thread=1, queue_size=100, full_download=False):
 
-        display = PrettyTable()
+        display = ConsoleTable()
         display.field_names = [
             'Name                ',
             'Type  ',
@@ -1092,75 +1464,121 @@ class DropBoxApp:
         display.align[display.field_names[10]] = 'r'
         display.align[display.field_names[11]] = 'r'
         display.hrules = 1
-        print(display)
+        self.print_status(display)
 
         self.output_name = output_name
-        self.prepare_output_file(mode='w')
-        self.output_writer.writerow(
-            ['Name', 'Type', 'Size', 'Path', 'Path Level', 'Members', 'Groups', 'Created Date', 'Last Modified',
-             'Duplicate', 'Embedded Files', 'Linked URL', 'Linked Type', 'Linked Name', 'Linked Size'])
+        self.prepare_output_file(schema=FILE_SCHEMA, display=display)
         self.root.update(path='' if path == '/' else path)
         self.max_level = max_level
         self.max_thread = max_thread
+        # -thread sizes the downloads, the other stages have their own pools
+        self.file_workers = {'enrich': enrich_thread, 'download': max_thread, 'parse': parse_thread}
+        self.queue_size = queue_size
+        self.full_download = full_download
 
         client = report_root = None
 
         if member_indentify:
-            self.team_members = self.get_team_member()
-
-            for team_member in self.team_members:
-                if team_member.name.display_name == member_indentify or team_member.email == member_indentify:
-                    report_root = Folder(namespace=team_member.name.display_name)
-                    report_root.update(path=path, id_=f'tm:{team_member.team_member_id}', parent=self.root,
-                                       type_="Private Folder")
-                    client = self.dropbox_team.as_user(team_member.team_member_id)
-                    break
-            if not client:
+            team_member = self.directory.member(member_indentify)
+            if team_member:
+                report_root = Folder(namespace=team_member.name.display_name)
+                report_root.update(path=path, id_=f'tm:{team_member.team_member_id}', parent=self.root,
+                                   type_="Private Folder")
+                client = self.dropbox_team.as_user(team_member.team_member_id)
+            else:
                 print(f"Member ({member_indentify}) not found.")
         else:
-            self.team_folders = self.get_team_folders()
-            for team_folder in self.team_folders:
-                if team_folder.name == team_indentify or team_folder.name.lower() == team_indentify:
-                    client = self.dropbox_team_as_admin
-                    report_root = Folder(namespace=team_indentify)
-                    report_root.update(path=path, id_=f'tf:{team_indentify}', parent=self.root)
-                    break
-                if not client:
-                    print(f"Team Folder ({team_indentify}) not found.")
-
-        self.get_file_report(display=display, client=client, folder=self.root, check_content=check_content)
-
-        self.output_file.close()
-        self.reverse_output()
+            if self.directory.team_folder(team_indentify):
+                client = self.dropbox_team_as_admin
+                report_root = Folder(namespace=team_indentify)
+                report_root.update(path=path, id_=f'tf:{team_indentify}', parent=self.root)
+            else:
+                print(f"Team Folder ({team_indentify}) not found.")
+
+        self.progress.add_spaces(1)
+        self.start_progress(live=False)
+        self.run_file_pipeline(client=client, folder=self.root, check_content=check_content)
+        self.progress.space_done()
+
+        self.stop_progress()
+        self.writer.close()
+        self.dump_metrics()
+        if not self.quiet:
+            print('\n'.join(self.pipeline.summary()))
+            if self.documents['ranged'] or self.documents['downloaded']:
+                print(f"Documents: {self.documents['ranged']:,} read in ranges, {self.documents['downloaded']:,} "
+                      f"downloaded, {self.sizeof_fmt(self.documents['bytes'])} read of "
+                      f"{self.sizeof_fmt(self.documents['size'])}")
 
         data = [
             f'Files: {self.root.total_file:,}',
             f'Folders: {self.root.total_folder:,}',
             f'Total Size: {self.sizeof_fmt(self.root.size)}',
+            f'API Calls: {self.metrics.total_calls:,}',
             f'Running Time: {self.sec_to_hours(int(time.time() - self.root.tic))}',
         ]
 
         print(' | '.join(data))
 
-    def get_file_report(self, display, client, folder=None, current_level=1, cursor=None, verify_id=None,
+    def run_file_pipeline(self, client, folder, check_content=1):
+        # The folders are listed by this thread (orders and duplicates in the listing order), the files go through
+        # the enrich (revisions and members), download and parse (documents only) stages and are written by a
+        # single thread, the folder totals are not locked
+        self.pipeline = Pipeline(tracer=self.tracer)
+        self.pipeline.add_stage('list')
+        self.pipeline.add_stage('enrich', self.enrich_file, workers=self.file_workers['enrich'],
+                                queue_size=self.queue_size)
+        self.pipeline.add_stage('download', self.download_file, workers=self.file_workers['download'],
+                                queue_size=self.queue_size)
+        self.pipeline.add_stage('parse', self.parse_file, workers=self.file_workers['parse'],
+                                queue_size=self.queue_size)
+        self.pipeline.add_stage('write', self.write_file, workers=1, queue_size=self.queue_size)
+        self.pipeline.start()
+        try:
+            self.get_file_report(client=client, folder=folder, check_content=check_content)
+        finally:
+            self.pipeline.close()
+            self.metrics.stages = self.pipeline.snapshot()
+
+    def enrich_file(self, task: FileTask):
+        file = task.file
+        revisions = task.client.files_list_revisions(path=file.path_lower).entries
+        file.last_modified = revisions[0].server_modified
+        file.created_at = revisions[-1].server_modified
+        self.get_file_members(task.client, file)
+        return 'download' if task.document else 'write'
+
+    def download_file(self, task: FileTask):
+        task.content = self.download_document(task.file, task.client)
+        return 'parse'
+
+    def parse_file(self, task: FileTask):
+        self.parse_document(task.file, task.client, task.content)
+        # The parts read in ranges are not kept while the file waits to be written
+        task.content = None
+        return 'write'
+
+    def write_file(self, task: FileTask):
+        self.log_file_report(task.folder, task.file, task.level)
+
+    @traced_folder('folder')
+    def get_file_report(self, client, folder=None, current_level=1, cursor=None, verify_id=None,
                         check_content=1):
-        self.dropbox.check_and_refresh_access_token()
-
         if not cursor:
             contents: ListFolderResult = client.files_list_folder(path=folder.path_lower)
         else:
             contents: ListFolderResult = client.files_list_folder_continue(cursor=cursor)
 
         for content in contents.entries:
-            print(f'Processing {self.shorten_text(content.name, 40, True)}', end='')
+            self.print_status(f'Processing {self.shorten_text(content.name, 40, True)}', end='')
             if isinstance(content, FolderMetadata):
                 content: FolderMetadata
                 new_folder = Folder(obj=content, namespace=folder.namespace, level=current_level)
-                new_folder.parent = folder
+                new_folder.set_parent(folder)
 
                 # If have id need to verify, is_owner will be set to False by default
                 is_owner = False if verify_id else True
-                print('\r', end='')
+                self.print_status('\r', end='')
                 # In case folder didn't sharing info, this folder is owned by this user
                 if not content.shared_folder_id:
                     is_owner = True
@@ -1168,134 +1586,96 @@ class DropBoxApp:
                     # But if the parent is Member's Personal Space, may child folder is shared folder, verify it now!
                     if current_level == 1 and folder.type == 'Private Folder':
                         new_folder.type = "Shared Folder"
-                    r: SharedFolderMembers = client.sharing_list_folder_members(
-                        shared_folder_id=content.shared_folder_id)
 
                     # Verify if this user is the folder's owner
-                    if verify_id:
-                        member: UserMembershipInfo
-                        for member in r.users:
-                            member_info: UserInfo = member.user
-                            member_access: AccessLevel = member.access_type
-                            if member_info.account_id == verify_id and member_access.is_owner():
-                                is_owner = True
-                                new_folder.shared_count += 1
-                                break
+                    if verify_id and self.namespaces.is_owner(client, content.shared_folder_id, verify_id):
+                        is_owner = True
+                        new_folder.shared_count += 1
 
                 # Only get report if this user is the folder's owner
                 if is_owner:
                     new_folder = self.get_file_report(
-                        display=display, client=client, folder=new_folder,
+                        client=client, folder=new_folder,
                         current_level=current_level + 1, verify_id=verify_id, check_content=check_content
                     )
                     folder.add_folder(new_folder)
             if isinstance(content, FileMetadata):
-                # print(content)
                 content: FileMetadata
-                revisions = client.files_list_revisions(path=content.path_lower).entries
-                new_file = File(
-                    content, last_modified=revisions[0].server_modified, created_at=revisions[-1].server_modified
-                )
-                r: SharedFileMembers = client.sharing_list_file_members(file=content.id)
-
-                for member in r.users:
-                    new_file.members.append(f'({member.access_type._tag[0].upper()}) {member.user.email}')
-                group: GroupMembershipInfo
-                for group in r.groups:
-                    group_info: GroupInfo = group.group
-                    try:
-                        group_members = self.get_group_members(group_id=group_info.group_id)
-                        group_output = (f'({group.access_type._tag[0].upper()}) '
-                                        f'{group_info.group_name}({", ".join(group_members)})')
-                        new_file.groups.append(group_output)
-                    except:
-                        print(f"Can't access group {group_info.group_name}.")
-                        pass
-
+                new_file = File(content)
+                # Position and duplicate flag are given in the listing order, the row is written by the write stage
+                new_file.order = folder.next_order()
                 if new_file.content_hash in self.root.files_content_hash:
                     new_file.is_duplicate_in_root = True
-                self.root.files_content_hash.append(new_file.content_hash)
-                client: Dropbox
-                print('\r', end='')
+                self.root.files_content_hash.add(new_file.content_hash)
+                self.print_status('\r', end='')
                 new_file.type = new_file.name.split('/')[-1].split('.')[-1]
-                if check_content and new_file.type in ['docx', 'xlsx', 'pdf']:
-                    if self.max_thread > 1:
-                        is_wait = False
-                        while self.current_thread >= self.max_thread:
-                            if not is_wait:
-                                print(f'Waiting free thread ({self.current_thread}/{self.max_thread})', end='')
-                            time.sleep(.5)
-                            is_wait = True
-                        if is_wait:
-                            print('\r', end='')
-                        Thread(
-                            target=self.file_get_embedded_linked,
-                            args=(folder, new_file, client, current_level, display)
-                        ).start()
-                    else:
-                        self.file_get_embedded_linked(folder, new_file, client, current_level, display)
-                else:
-                    self.log_file_report(folder, new_file, display, current_level)
+                task = FileTask(new_file, folder, current_level, client, span=self.tracer.current())
+                task.document = bool(check_content) and new_file.type in DOCUMENT_TYPES
+                self.pipeline.feed('enrich', task, source='list')
 
         if contents.has_more:
-            return self.get_file_report(display=display, client=client, folder=folder, current_level=current_level,
+            return self.get_file_report(client=client, folder=folder, current_level=current_level,
                                         cursor=contents.cursor, verify_id=verify_id, check_content=check_content)
         return folder
 
-    def file_get_embedded_linked(self, folder, file, client, current_level, display):
-        self.current_thread += 1
-        file_local_path = f"tmp/{int(time.time())}-{file.name}"
-
-        if file.type in ['docx', 'xlsx', 'pdf']:
-            print(f'(Thread {self.current_thread}) Downloading {file.name}', end='')
-            client.files_download_to_file(
-                download_path=file_local_path, path=file.path_lower
-            )
-
-        # Get Embedded
-        if file.type in ['docx', 'xlsx']:
-            with ZipFile(file_local_path, "r") as zip:
-                for entry in zip.infolist():
-                    if entry.filename.startswith("word/embeddings/") or entry.filename.startswith(
-                            "xl/embeddings/"):
-                        file.embedded.append(entry.filename.split('/')[-1])
-
-        file_contents = list()
-        # Detect hyperlink or link string in Excel
-        if file.type == 'xlsx':
-            wb = load_workbook(file_local_path, data_only=True)
-            for sheet in wb.worksheets:
-                for row in sheet.iter_rows():
-                    for cell in row:
-                        if cell.value:
-                            value = str(cell.value)
-                            if cell.hyperlink:
-                                if 'dropbox.com/scl' in cell.hyperlink.target:
-                                    value = f'{value}\n{cell.hyperlink.target}'
-                            file_contents.append(value)
-
-        if file.type == 'docx':
-            document = Document(file_local_path)
-            for para in document.paragraphs:
-                file_contents.append(para.text)
-            for table in document.tables:
-                for row in table.rows:
-                    for cell in row.cells:
-                        for paragraph in cell.paragraphs:
-                            file_contents.append(paragraph.text)
-            rels = document.part.rels
-            for rel in rels:
-                if rels[rel].reltype == RELATIONSHIP_TYPE.HYPERLINK:
-                    file_contents.append(rels[rel]._target)
+    def get_file_members(self, client, file: File):
+        r: SharedFileMembers = client.sharing_list_file_members(file=file.id)
 
-        if file.type == 'pdf':
-            doc = fitz.open(file_local_path)
-            for page_num in range(doc.page_count):
-                page = doc.load_page(page_num)
-                page_links = page.get_links()
-                for link in page_links:
-                    file_contents.append(link['uri'])
-                file_contents.append(page.get_text().replace('\n', ''))
+        for member in r.users:
+            file.members.append(f'({member.access_type._tag[0].upper()}) {member.user.email}')
+        group: GroupMembershipInfo
+        for group in r.groups:
+            group_info: GroupInfo = group.group
+            try:
+                group_members = self.get_group_members(group_id=group_info.group_id)
+                group_output = (f'({group.access_type._tag[0].upper()}) '
+                                f'{group_info.group_name}({", ".join(group_members)})')
+                file.groups.append(group_output)
+            except:
+                print(f"Can't access group {group_info.group_name}.")
+                pass
+
+    def analyse_document(self, file, client):
+        # Embedded files and Dropbox links of a docx, xlsx or pdf, kept in file.embedded and file.linked
+        with self.tracer.span('download'):
+            document = self.download_document(file, client)
+        with self.tracer.span('parse', type=file.type):
+            self.parse_document(file, client, document)
+
+    def download_document(self, file, client):
+        # The parts of a large docx or xlsx holding its text and links (see module/remotezip.py), else the path of
+        # the whole document downloaded in the tmp folder
+        if not self.full_download and file.type in ['docx', 'xlsx'] and file.size >= RANGE_MIN_SIZE:
+            self.print_status(f'Reading {file.name}', end='')
+            try:
+                document = read_office_document(client, file.path_lower, file.size, file.type, rev=file.obj.rev)
+                self.count_document('ranged', document.bytes, document.size)
+                return document
+            except RemoteZipError as e:
+                self.print_status(f'\rDownloading {file.name} ({e})', end='')
+        # The id keeps apart two files of the same name downloaded in the same second by two threads
+        file_local_path = f"tmp/{int(time.time())}-{file.id.replace(':', '')}-{file.name}"
+        self.print_status(f'Downloading {file.name}', end='')
+        client.files_download_to_file(download_path=file_local_path, path=file.path_lower)
+        size = os.path.getsize(file_local_path)
+        self.count_document('downloaded', size, size)
+        return file_local_path
+
+    def count_document(self, kind, bytes_, size):
+        with self.documents_lock:
+            self.documents[kind] += 1
+            self.documents['bytes'] += bytes_
+            self.documents['size'] += size
+
+    def parse_document(self, file, client, document):
+        if isinstance(document, OfficeDocument):
+            file.embedded.extend(document.embedded)
+            file_contents = document.contents()
+        else:
+            try:
+                file_contents = self.document_contents(file, document)
+            finally:
+                os.remove(document)
 
         urls = re.findall(
             r'[h]{0,1}t{0,2}p{0,1}[s]{0,1}[:]{0,1}[/]{0,2}[.w]{0,4}dropbox.com/scl[a-z0-9/?=&]+',
@@ -1341,37 +1721,109 @@ class DropBoxApp:
                 }
                 file.linked.append(link_info)
 
-        os.remove(file_local_path)
-        self.log_file_report(folder, file, display, current_level)
-        self.current_thread -= 1
+    @staticmethod
+    def document_contents(file, file_local_path):
+        # Get Embedded
+        if file.type in ['docx', 'xlsx']:
+            with ZipFile(file_local_path, "r") as zip:
+                for entry in zip.infolist():
+                    if entry.filename.startswith("word/embeddings/") or entry.filename.startswith(
+                            "xl/embeddings/"):
+                        file.embedded.append(entry.filename.split('/')[-1])
 
-    def log_file_report(self, folder, file, display, current_level):
+        # The parsers are imported on first use, most reports never open a document
+        file_contents = list()
+        # Detect hyperlink or link string in Excel
+        if file.type == 'xlsx':
+            from openpyxl import load_workbook
+            wb = load_workbook(file_local_path, data_only=True)
+            for sheet in wb.worksheets:
+                for row in sheet.iter_rows():
+                    for cell in row:
+                        if cell.value:
+                            value = str(cell.value)
+                            if cell.hyperlink:
+                                if 'dropbox.com/scl' in cell.hyperlink.target:
+                                    value = f'{value}\n{cell.hyperlink.target}'
+                            file_contents.append(value)
+
+        if file.type == 'docx':
+            from docx import Document
+            from docx.opc.constants import RELATIONSHIP_TYPE
+            document = Document(file_local_path)
+            for para in document.paragraphs:
+                file_contents.append(para.text)
+            for table in document.tables:
+                for row in table.rows:
+                    for cell in row.cells:
+                        for paragraph in cell.paragraphs:
+                            file_contents.append(paragraph.text)
+            rels = document.part.rels
+            for rel in rels:
+                if rels[rel].reltype == RELATIONSHIP_TYPE.HYPERLINK:
+                    file_contents.append(rels[rel]._target)
+
+        if file.type == 'pdf':
+            import fitz
+            doc = fitz.open(file_local_path)
+            for page_num in range(doc.page_count):
+                page = doc.load_page(page_num)
+                page_links = page.get_links()
+                for link in page_links:
+                    file_contents.append(link['uri'])
+                file_contents.append(page.get_text().replace('\n', ''))
+        return file_contents
+
+    def log_file_report(self, folder, file, current_level):
         folder.add_file(file)
-        print('\r', end='')
 
         last_modified = f'{file.last_modified:%m/%d/%Y}' if file.last_modified else ""
         created_at = f'{file.created_at:%m/%d/%Y}' if file.created_at else ""
 
+        for key, row in self.file_rows(file, current_level):
+            self.output_writer.write(key, row)
+        self.update_database(file_records(file, folder, current_level))
+
+        row = [
+            self.shorten_text(file.name, 20),
+            file.name.split('/')[-1].split('.')[-1],
+            self.sizeof_fmt(file.size),
+            self.shorten_text(file.path_lower, 20),
+            current_level,
+            len(file.members),
+            len(file.groups),
+            created_at,
+            last_modified,
+            'Duplicate' if file.is_duplicate_in_root else '',
+            len(file.embedded),
+            len(file.linked)
+        ]
+        self.update_display(row)
+
+    @staticmethod
+    def file_rows(file, current_level):
+        # One row per linked file or folder
+        rows = list()
         if file.linked:
-            for file_linked in file.linked:
+            for index, file_linked in enumerate(file.linked):
                 row = [
                     file.name,
                     file.name.split('/')[-1].split('.')[-1],
                     file.size,
                     file.path_lower,
                     current_level,
-                    ', '.join(file.members),
-                    ', '.join(file.groups),
-                    created_at,
-                    last_modified,
+                    file.members,
+                    file.groups,
+                    file.created_at,
+                    file.last_modified,
                     'Duplicate' if file.is_duplicate_in_root else '',
-                    ', '.join(file.embedded),
+                    file.embedded,
                     file_linked['url'],
                     file_linked['type'],
                     file_linked['name'],
                     file_linked['size'],
                 ]
-                self.output_writer.writerow(row)
+                rows.append((file.order + (index,), row))
         else:
             row = [
                 file.name,
@@ -1379,31 +1831,15 @@ class DropBoxApp:
                 file.size,
                 file.path_lower,
                 current_level,
-                ', '.join(file.members),
-                ', '.join(file.groups),
-                created_at,
-                last_modified,
+                file.members,
+                file.groups,
+                file.created_at,
+                file.last_modified,
                 'Duplicate' if file.is_duplicate_in_root else '',
-                ', '.join(file.embedded)
+                file.embedded
             ]
-            self.output_writer.writerow(row)
-
-        row = [
-            self.shorten_text(file.name, 20),
-            file.name.split('/')[-1].split('.')[-1],
-            self.sizeof_fmt(file.size),
-            self.shorten_text(file.path_lower, 20),
-            current_level,
-            len(file.members),
-            len(file.groups),
-            created_at,
-            last_modified,
-            'Duplicate' if file.is_duplicate_in_root else '',
-            len(file.embedded),
-            len(file.linked)
-        ]
-        display.add_row(row)
-        print("\n".join(display.get_string().splitlines()[-2:]))
+            rows.append((file.order, row))
+        return rows
 
     def get_folder_size(self, client, folder_identification, cursor=None):
         size = 0
@@ -0,0 +1,67 @@
+from module.directory import DIRECTORY_TTL
+from module.output import OUTPUT_FORMATS
+from module.profiling import PROFILE_MODES
+from module.progress import PROGRESS_MODES
+from module.tracing import TRACE_FORMATS
+
+# Options shared by the reports (main.py, owner.py, member.py, file.py, crawl.py and offline.py): output format and
+# database, metrics, tracing, profiling, progress, directory cache and cassette. Each script adds its own options
+# before them.
+
+
+def add_common_arguments(parser, database=True, replay=True, directory_ttl=DIRECTORY_TTL):
+    # offline.py serves the fake API itself: no -replay, and the directory is listed on every run by default
+    parser.add_argument("-f", "--output_format", type=str, default='csv', choices=list(OUTPUT_FORMATS),
+                        help=f"The format of the output file, parquet and arrow are written with typed columns "
+                             f"and need pyarrow installed, xlsx starts a new sheet every 1,048,576 rows (Default csv)")
+    if database:
+        parser.add_argument("-db", "--database", type=str, default=None,
+                            help=f"Path of a SQLite database to also write the report into "
+                                 f"(tables folders, files, acl, links and members, rows are tagged with the output "
+                                 f"name)")
+    parser.add_argument("-metrics", "--metrics_format", type=str, default='json', choices=['json', 'prometheus'],
+                        help=f"Format of the API metrics (calls, errors, retries, bytes and latency per endpoint) "
+                             f"written next to the output as <output_name>.metrics.json or .prom (Default json)")
+    parser.add_argument("-trace", "--trace", type=str, default=None, choices=TRACE_FORMATS,
+                        help=f"Trace the run: a span per folder, API request, download and parse written next to the "
+                             f"output as <output_name>.trace.json (chrome, for chrome://tracing or Perfetto) "
+                             f"or .trace.jsonl (jsonl). If unset, nothing is traced")
+    parser.add_argument("-profile", "--profile", type=str, default=None, choices=PROFILE_MODES,
+                        help=f"Profile the run: cprofile (main thread, <output_name>.profile.txt and .prof) or sample "
+                             f"(every thread, <output_name>.samples.txt and .stacks.txt for flamegraph.pl), "
+                             f"written in the '/output' folder. If unset, nothing is profiled")
+    parser.add_argument("-profile_interval", "--profile_interval", type=float, default=0.01,
+                        help=f"Seconds between two samples of the sample profiler (Default 0.01)")
+    parser.add_argument("-memory", "--memory_interval", type=float, default=0,
+                        help=f"Seconds between two tracemalloc snapshots written to <output_name>.memory.txt "
+                             f"(top allocations and growth since the previous one), slows the report down several "
+                             f"times. If unset, memory is not tracked")
+    parser.add_argument("-top", "--top", type=int, default=30,
+                        help=f"Functions and allocations listed in the profiling reports (Default 30)")
+    parser.add_argument("-q", "--quiet", action='store_true',
+                        help=f"No console table nor progress lines, only the output files (and the JSON progress "
+                             f"with -progress json)")
+    parser.add_argument("-progress", "--progress", type=str, default='live', choices=PROGRESS_MODES,
+                        help=f"How the progress is shown: live (full-screen table) or json (a single-line JSON record "
+                             f"on stderr every -progress_interval seconds, for cron and containers) (Default live)")
+    parser.add_argument("-progress_interval", "--progress_interval", type=float, default=10,
+                        help=f"Seconds between two JSON progress records (Default 10)")
+    parser.add_argument("-directory_ttl", "--directory_ttl", type=int, default=directory_ttl,
+                        help=f"Seconds the team members and team folders saved in session/directory.json are reused, "
+                             f"0 lists them on every run (Default {directory_ttl})")
+    parser.add_argument("-record", "--record", type=str, default=None,
+                        help=f"Record every Dropbox request and response of the run (downloads included) to this "
+                             f"cassette file, replayed with -replay")
+    if replay:
+        parser.add_argument("-replay", "--replay", type=str, default=None,
+                            help=f"Serve every Dropbox request from this cassette file (recorded with -record) "
+                                 f"instead of the network, no tokens are needed nor written")
+        parser.add_argument("-replay_speed", "--replay_speed", type=float, default=1.0,
+                            help=f"Speed of the replay against the latency of the recording, 2 halves it, 0 answers "
+                                 f"at once (Default 1)")
+
+
+def check_common_arguments(parser, args):
+    # -changes reads the audit log from the wall clock time of the last run, a request no cassette holds
+    if getattr(args, 'changes', False) and (args.record or getattr(args, 'replay', None)):
+        parser.error("-changes can't be recorded nor replayed, the audit log is read from the time of the last run")
@@ -0,0 +1,372 @@
+import builtins
+import gc
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+from abc import ABC, abstractmethod
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from module.fake_server import FakeTenant, FakeDropbox
+from module.output import OrderedRowWriter, CsvSink, TableSink, ConsoleTable, FOLDER_SCHEMA, FILE_SCHEMA
+
+# Benchmarks of the hot paths of the reports, asv style: a case builds its state in `setup(entries)` (not
+# measured), then `run()` is timed and the API calls it made are counted on the fake API. benchmark.py runs
+# every measurement in a fresh process (working directory with output/, session/ and tmp/), so peak memory and
+# module state don't leak between cases and a case still running after its timeout can be killed.
+#
+# benchmark.json is the baseline of the current tree: a change to a measured path re-saves the cases it affects in
+# the same commit (benchmark.py -c <cases> --save), benchmark.py warns about the commits changing module/ since.
+
+FILES = 4
+DEPTH = 3
+
+
+def tree_entries(width, depth=DEPTH, files=FILES):
+    folders = sum(width ** level for level in range(1, depth + 1))
+    return folders + files * (folders + 1)
+
+
+def tree_width(entries, depth=DEPTH, files=FILES):
+    # Width of a tree of `depth` levels with `files` files per folder holding about `entries` folders and files
+    width = 1
+    while tree_entries(width + 1, depth, files) <= entries:
+        width += 1
+    if entries - tree_entries(width, depth, files) > tree_entries(width + 1, depth, files) - entries:
+        width += 1
+    return width
+
+
+def fake_app(fake: FakeDropbox):
+    from module.app import DropBoxApp
+    return DropBoxApp(team_access=True, app_key='fake', remember_access_token=False, session=fake.session(),
+                      access_token='fake', refresh_token='fake')
+
+
+def empty_fake():
+    # Tenant without any file, only there to authenticate a DropBoxApp
+    return FakeDropbox(FakeTenant(members=1, groups=0, team_folders=0, other_namespaces=0, depth=0, files=0))
+
+
+class Case(ABC):
+    name = None
+    timeout = 600
+    # Cases that don't depend on the number of entries only run at the first size
+    sized = True
+
+    def __init__(self):
+        self.fake = None
+        self.entries = 0
+
+    @abstractmethod
+    def setup(self, entries):
+        pass
+
+    @abstractmethod
+    def run(self):
+        pass
+
+    def calls(self):
+        return sum(self.fake.calls.values()) if self.fake else 0
+
+
+class ImportApp(Case):
+    # Import of module/app.py in a fresh interpreter, what every entry point pays before parsing its arguments
+    name = 'import_app'
+    sized = False
+
+    def setup(self, entries):
+        self.env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    def run(self):
+        subprocess.run([sys.executable, '-c', 'import module.app'], env=self.env, check=True)
+
+
+class Startup(Case):
+    # DropBoxApp set up from the session.ini of a previous run (tokens, their expiration and the admin)
+    name = 'startup'
+    sized = False
+
+    def setup(self, entries):
+        self.fake = empty_fake()
+        with open('session.ini', 'w') as f:
+            f.write('[SESSION]\naccess_token = fake\nrefresh_token = fake\n')
+        self.app()
+        self.fake.calls.clear()
+
+    def app(self):
+        from module.app import DropBoxApp
+        return DropBoxApp(team_access=True, app_key='fake', remember_access_token=True, session=self.fake.session())
+
+    def run(self):
+        self.app()
+
+
+class Tree(Case):
+    # In-memory Folder/File tree shaped like the fake tenant, for the cases that don't call the API
+    def setup(self, entries):
+        from module.app import Folder
+        self.width = tree_width(entries)
+        self.count = 0
+        self.root = Folder(namespace='root', type_='root')
+        self.root.update('')
+        self.tree = self.build(self.root, level=1)
+        self.entries = self.count
+
+    def build(self, folder, level):
+        from module.app import Folder, File
+        files = list()
+        for index in range(FILES):
+            self.count += 1
+            path = f'{folder.path_lower}/file {index}.txt'
+            obj = SimpleNamespace(id=f'id:{self.count:022x}', name=f'File {index}.txt', path_lower=path,
+                                  path_display=path, size=1024 * (index + 1), content_hash=f'{self.count:064x}')
+            modified = datetime(2020, 1, 1) + timedelta(minutes=self.count)
+            file = File(obj, last_modified=modified, created_at=modified)
+            file.order = folder.next_order()
+            files.append(file)
+        children = list()
+        if level <= DEPTH:
+            for index in range(self.width):
+                self.count += 1
+                path = f'{folder.path_lower}/folder {level}-{index}'
+                obj = SimpleNamespace(id=f'id:{self.count:022x}', name=f'Folder {level}-{index}', path_lower=path,
+                                      path_display=path)
+                child = Folder(obj=obj, namespace='Benchmark', level=level, type_='Private Folder')
+                child.set_parent(folder)
+                children.append(self.build(child, level + 1))
+        return folder, files, children
+
+    def rollup(self, node):
+        # Same order as get_path: a sub-folder is added once finished, files as they are listed
+        folder, files, children = node
+        for child in children:
+            self.rollup(child)
+            folder.add_folder(child[0])
+        for file in files:
+            folder.add_file(file)
+        folder.done()
+
+
+class Rollup(Tree):
+    name = 'rollup'
+
+    def run(self):
+        self.rollup(self.tree)
+
+
+class UpdateBackup(Tree):
+    name = 'update_backup'
+
+    def setup(self, entries):
+        Tree.setup(self, entries)
+        self.fake = empty_fake()
+        self.app = fake_app(self.fake)
+        self.app.output_name = 'benchmark'
+        self.fake.calls.clear()
+
+    def walk(self, node):
+        # Same calls as get_path: when the folder is found and when it is recorded
+        folder, files, children = node
+        self.app.update_backup(folder)
+        for child in children:
+            self.walk(child)
+        folder.done()
+        self.app.update_backup(folder)
+
+    def run(self):
+        self.walk(self.tree)
+
+
+class CheckBackup(Tree):
+    name = 'check_backup'
+
+    def setup(self, entries):
+        Tree.setup(self, entries)
+        self.rollup(self.tree)
+        self.fake = empty_fake()
+        app = fake_app(self.fake)
+        app.output_name = 'benchmark'
+        self.backup(app, self.tree)
+        with open(f'session/{app.output_name}.json', 'w') as f:
+            json.dump(app.backup, f)
+        self.app = fake_app(self.fake)
+        self.app.output_name = 'benchmark'
+        builtins.input = lambda prompt='': 'Y'
+        self.fake.calls.clear()
+
+    def backup(self, app, node):
+        folder, files, children = node
+        app.update_backup(folder, write=False)
+        for child in children:
+            self.backup(app, child)
+
+    def run(self):
+        self.app.check_backup()
+        self.app.writer.close()
+
+
+class OrderedOutput(Tree):
+    # Rows come in post-order (a folder once finished) and are written in pre-order, as reverse_output used to
+    name = 'ordered_output'
+
+    def setup(self, entries):
+        Tree.setup(self, entries)
+        self.rows = list()
+        self.post_order(self.tree)
+
+    def post_order(self, node):
+        folder, files, children = node
+        for child in children:
+            self.post_order(child)
+        for file in files:
+            self.rows.append((file.order, ['File', folder.namespace, folder.level + 1, file.path_display, file.size,
+                                           0, 0, file.created_at, file.last_modified, 1, [], []]))
+        self.rows.append((folder.order, [folder.type, folder.namespace, folder.level, folder.path_display,
+                                         folder.size, folder.sub_folder_non_recursive, folder.sub_folder_recursive,
+                                         folder.created_at, folder.last_modified, folder.total_file, [], []]))
+
+    def run(self):
+        writer = OrderedRowWriter(sink=CsvSink(path='output/benchmark.csv', schema=FOLDER_SCHEMA))
+        for key, row in self.rows:
+            writer.write(key, row)
+        writer.close()
+
+
+class ConsoleOutput(Tree):
+    # Console table of the file report, one row per file
+    name = 'console_output'
+
+    def setup(self, entries):
+        Tree.setup(self, entries)
+        self.display = ConsoleTable()
+        self.display.field_names = [
+            'Name                ', 'Type  ', '      Size', 'Path                ', 'Path Level', 'Members', 'Groups',
+            'Created Date', 'Last Modified', 'Duplicate', 'Embedded', 'Linked'
+        ]
+        self.rows = list()
+        self.walk(self.tree)
+
+    def walk(self, node):
+        folder, files, children = node
+        for file in files:
+            self.rows.append([file.name, 'txt', file.size, file.path_lower[:20], folder.level + 1, 0, 0,
+                              f'{file.created_at:%m/%d/%Y}', f'{file.last_modified:%m/%d/%Y}', '', 0, 0])
+        for child in children:
+            self.walk(child)
+
+    def run(self):
+        sink = TableSink(self.display)
+        for index in range(0, len(self.rows), 10000):
+            sink.write_many([(row,) for row in self.rows[index:index + 10000]])
+
+
+class Tenant(Case):
+    # Private space of a single member served by the fake API, traversed from the member's root
+    documents = dict()
+    schema = FOLDER_SCHEMA
+
+    def tenant(self, entries):
+        return FakeTenant(members=1, groups=0, team_folders=0, other_namespaces=0, width=tree_width(entries),
+                          depth=DEPTH, files=FILES, shared_ratio=0, documents=self.documents)
+
+    def setup(self, entries):
+        from module.app import Folder
+        tenant = self.tenant(entries)
+        self.entries = len(tenant.nodes) - 1
+        self.fake = FakeDropbox(tenant)
+        self.app = fake_app(self.fake)
+        self.app.quiet = True
+        self.member = tenant.admin
+        self.app.output_name = 'benchmark'
+        self.app.root.update('')
+        self.app.prepare_output_file(schema=self.schema)
+        self.folder = Folder(namespace=self.member.display_name)
+        self.folder.update(path='', id_=f'tm:{self.member.team_member_id}', parent=self.app.root,
+                           type_='Private Folder')
+        self.client = self.app.dropbox_team.as_user(self.member.team_member_id)
+        self.fake.calls.clear()
+
+
+class GetPath(Tenant):
+    name = 'get_path'
+
+    def run(self):
+        self.app.get_path(folder=self.folder, client=self.client, verify_id=self.member.account_id, current_level=2)
+        self.app.writer.close()
+
+
+class FileReport(Tenant):
+    # run_file_pipeline without document parsing: listing, revisions, ACL and the duplicate check of every file
+    name = 'get_file_report'
+    schema = FILE_SCHEMA
+
+    def run(self):
+        self.app.run_file_pipeline(client=self.client, folder=self.folder, check_content=0)
+        self.app.writer.close()
+
+
+class Parser(FileReport):
+    # One document holding `entries` paragraphs/cells/lines, downloaded and parsed by the file report stages
+    type_ = None
+
+    def tenant(self, entries):
+        tenant = FakeTenant(members=1, groups=0, team_folders=0, other_namespaces=0, width=0, depth=0, files=1,
+                            shared_ratio=0, documents={self.type_: 1.0}, document_entries=entries)
+        node = next(node for node in tenant.nodes.values() if not node.is_folder)
+        tenant.contents[node.id] = tenant.document(node)
+        return tenant
+
+    def setup(self, entries):
+        FileReport.setup(self, entries)
+        self.entries = entries
+
+    def run(self):
+        self.app.run_file_pipeline(client=self.client, folder=self.folder, check_content=1)
+        self.app.writer.close()
+
+
+class ParseDocx(Parser):
+    name = 'parse_docx'
+    type_ = 'docx'
+
+
+class ParseXlsx(Parser):
+    name = 'parse_xlsx'
+    type_ = 'xlsx'
+
+
+class ParsePdf(Parser):
+    name = 'parse_pdf'
+    type_ = 'pdf'
+
+
+CASES = {case.name: case for case in [
+    ImportApp, Startup, GetPath, Rollup, UpdateBackup, CheckBackup, OrderedOutput, ConsoleOutput, FileReport,
+    ParseDocx, ParseXlsx, ParsePdf
+]}
+
+
+def measure(name, entries, memory=False):
+    # Runs one case in the current process (see benchmark.py), console output of the reports is discarded. With
+    # `memory` the run is traced by tracemalloc instead of timed: its peak is the Python memory allocated by the run
+    # over what the setup left, whatever the setup peaked at. Tracing slows the run down, both are measured in
+    # their own process.
+    case = CASES[name]()
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        case.setup(entries)
+        gc.collect()
+        if memory:
+            tracemalloc.start()
+        tic = time.perf_counter()
+        case.run()
+        seconds = time.perf_counter() - tic
+    if memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return {'peak_bytes': peak}
+    return {'entries': case.entries, 'seconds': seconds, 'calls': case.calls()}
@@ -0,0 +1,205 @@
+import io
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import Counter
+from hashlib import sha256
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+from module.adapters import WrappingAdapter, install
+
+# Cassette of every Dropbox request of a run (-record), replayed later without network nor tokens (-replay): the
+# reports can be profiled against a copy of a real tenant. The cassette is mounted on the session of the clients
+# below the token, rate limit and metrics adapters, in place of the transport when replaying.
+#
+# A request is identified by its method, URL, body and the headers selecting the member, the root and the range
+# of a download. Its responses are stored in the order they came (a 429 then the retried 200), each record being
+# <key length><key><elapsed seconds><payload length><payload>, the payload the zlib compressed status and headers
+# as JSON, a new line and the body. The index (key -> offsets of its records) is written at the end with the magic
+# bytes: a cassette without them (interrupted run) is indexed again by reading the records. Authorization headers
+# and request bodies are not stored, the tokens returned by oauth2/token are replaced.
+
+MAGIC = b'DBXCAS01'
+KEY_HEADERS = ['Dropbox-API-Arg', 'Dropbox-API-Select-User', 'Dropbox-API-Select-Admin', 'Dropbox-API-Path-Root',
+               'Range']
+RESPONSE_HEADERS = ['Content-Type', 'Content-Length', 'Content-Range', 'Dropbox-API-Result', 'Retry-After']
+TOKEN_PATH = '/oauth2/token'
+
+
+def request_key(request):
+    url = urlsplit(request.url)
+    if url.path == TOKEN_PATH:
+        # Refresh token and app key are in the body, every refresh is the same request
+        return f'{request.method} {url.netloc}{url.path}'
+    digest = sha256()
+    for header in KEY_HEADERS:
+        digest.update(f'{header}:{request.headers.get(header, "")}\n'.encode('utf-8'))
+    body = request.body or b''
+    digest.update(body.encode('utf-8') if isinstance(body, str) else body)
+    return f'{request.method} {url.netloc}{url.path} {digest.hexdigest()}'
+
+
+def build_response(request, status, headers, body):
+    response = requests.Response()
+    response.status_code = status
+    response.reason = 'OK' if status < 400 else 'Error'
+    response.headers = CaseInsensitiveDict(headers)
+    response.raw = io.BytesIO(body)
+    response.url = request.url
+    response.request = request
+    response.encoding = 'utf-8'
+    return response
+
+
+class Cassette:
+    def __init__(self, path, mode='replay', speed=1.0):
+        # mode: record (a new cassette) or replay, `speed` divides the recorded latency of every request when
+        # replaying (0: no latency)
+        self.path = path
+        self.mode = mode
+        self.speed = speed
+        self.lock = threading.Lock()
+        self.index = dict()
+        # Responses of every key already replayed
+        self.played = Counter()
+        self.misses = Counter()
+        self.closed = False
+        if mode == 'record':
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self.file = open(path, 'wb')
+        else:
+            self.file = open(path, 'rb')
+            self.load_index()
+
+    def install(self, session):
+        if self.mode == 'record':
+            return install(session, lambda adapter: RecordAdapter(adapter, self))
+        return install(session, lambda adapter: ReplayAdapter(self))
+
+    # Recording
+
+    def add(self, key, elapsed, status, headers, body):
+        meta = {'status': status, 'headers': {name: headers[name] for name in RESPONSE_HEADERS if name in headers}}
+        payload = zlib.compress(json.dumps(meta).encode('utf-8') + b'\n' + body)
+        key_bytes = key.encode('utf-8')
+        record = struct.pack('>I', len(key_bytes)) + key_bytes + struct.pack('>dQ', elapsed, len(payload)) + payload
+        with self.lock:
+            if self.closed:
+                return
+            offset = self.file.tell()
+            self.file.write(record)
+            self.index.setdefault(key, list()).append(offset)
+
+    def close(self):
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            if self.mode == 'record':
+                offset = self.file.tell()
+                self.file.write(zlib.compress(json.dumps(self.index).encode('utf-8')))
+                self.file.write(struct.pack('>Q', offset) + MAGIC)
+            self.file.close()
+
+    # Replaying
+
+    def load_index(self):
+        self.file.seek(0, os.SEEK_END)
+        size = self.file.tell()
+        if size >= 16:
+            self.file.seek(size - 16)
+            trailer = self.file.read(16)
+            if trailer[8:] == MAGIC:
+                offset = struct.unpack('>Q', trailer[:8])[0]
+                self.file.seek(offset)
+                self.index = json.loads(zlib.decompress(self.file.read(size - 16 - offset)))
+                return
+        # Interrupted recording, the records are read up to the last complete one
+        offset = 0
+        while True:
+            record = self.read_header(offset)
+            if record is None:
+                break
+            key, _, payload_offset, length = record
+            if payload_offset + length > size:
+                break
+            self.index.setdefault(key, list()).append(offset)
+            offset = payload_offset + length
+
+    def read_header(self, offset):
+        self.file.seek(offset)
+        head = self.file.read(4)
+        if len(head) < 4:
+            return None
+        key_length = struct.unpack('>I', head)[0]
+        key = self.file.read(key_length)
+        rest = self.file.read(16)
+        if len(key) < key_length or len(rest) < 16:
+            return None
+        elapsed, length = struct.unpack('>dQ', rest)
+        return key.decode('utf-8'), elapsed, offset + 4 + key_length + 16, length
+
+    def response(self, key):
+        # Next recorded response of the key, the last one again once they are all played
+        with self.lock:
+            offsets = self.index.get(key)
+            if not offsets:
+                self.misses[key.split(' ')[1]] += 1
+                return None
+            offset = offsets[min(self.played[key], len(offsets) - 1)]
+            self.played[key] += 1
+            _, elapsed, payload_offset, length = self.read_header(offset)
+            self.file.seek(payload_offset)
+            payload = zlib.decompress(self.file.read(length))
+        meta, body = payload.split(b'\n', 1)
+        meta = json.loads(meta)
+        return elapsed, meta['status'], meta['headers'], body
+
+
+class RecordAdapter(WrappingAdapter):
+    def __init__(self, adapter, cassette: Cassette):
+        WrappingAdapter.__init__(self, adapter)
+        self.cassette = cassette
+
+    def send(self, request, **kwargs):
+        tic = time.perf_counter()
+        response = self.adapter.send(request, **kwargs)
+        # Downloads are read here to be stored, the caller gets them from memory
+        body = response.content
+        elapsed = time.perf_counter() - tic
+        stored = body
+        if urlsplit(request.url).path == TOKEN_PATH and response.status_code == 200:
+            token = json.loads(body)
+            token['access_token'] = 'replay'
+            token.pop('refresh_token', None)
+            stored = json.dumps(token).encode('utf-8')
+        self.cassette.add(request_key(request), elapsed, response.status_code, response.headers, stored)
+        return build_response(request, response.status_code, response.headers, body)
+
+
+class ReplayAdapter(BaseAdapter):
+    def __init__(self, cassette: Cassette):
+        BaseAdapter.__init__(self)
+        self.cassette = cassette
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        recorded = self.cassette.response(request_key(request))
+        if recorded is None:
+            return build_response(request, 400, {'Content-Type': 'text/plain'},
+                                  f'Not in the cassette {self.cassette.path}: {request.url}'.encode('utf-8'))
+        elapsed, status, headers, body = recorded
+        if self.cassette.speed > 0:
+            time.sleep(elapsed / self.cassette.speed)
+        return build_response(request, status, headers, body)
+
+    def close(self):
+        pass
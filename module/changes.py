@@ -0,0 +1,129 @@
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+from dropbox.exceptions import ApiError, AuthError
+from dropbox.team_common import TimeRange
+from dropbox.team_log import EventCategory, TeamEvent
+
+from module.files import atomic_write
+
+# Spaces of main.py and owner.py (team folders, namespaces, member spaces) untouched since the last run reuse the
+# rows of that run (-changes). Before the traversal the team audit log is read from the start of the last successful
+# run: the file and sharing events are mapped to the namespaces (and paths) of their assets, and a space is only
+# traversed again when one of the namespaces it traversed last time (its own and the shared folders it claimed) has
+# an event. The written folders and the claims of every space are kept in session/changes_<scope>.json once the
+# report is done, a run with another max_level, admin or scope traverses everything.
+
+CHANGES_PATH = 'session/changes_{scope}.json'
+CHANGE_CATEGORIES = [EventCategory.file_operations, EventCategory.sharing]
+
+
+class ChangeTracker:
+    def __init__(self, scope, max_level, path=None):
+        self.path = path or CHANGES_PATH.format(scope=scope)
+        self.max_level = max_level
+        self.owner = None
+        self.started = None
+        # Start of the run whose rollups are reused, None when everything is traversed
+        self.since = None
+        # Space root id -> {'namespaces': [...], 'claims': [...], 'folders': [[folder id, backup], ...]}
+        self.previous = dict()
+        self.spaces = dict()
+        self.current = None
+        # Namespace id -> relative paths with an event since the last run
+        self.changed = dict()
+        self.events = 0
+        self.reused = 0
+
+    def open(self, client, owner):
+        self.owner = owner
+        self.started = time.time()
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('owner') != owner or data.get('max_level') != self.max_level:
+            return
+        try:
+            self.read_events(client, data['started'])
+        except (ApiError, AuthError) as e:
+            # No access to the audit log (team_info.read scope, plan), every space is traversed
+            print(f"Can't read the audit log ({e}), every space is traversed.")
+            self.changed = dict()
+            self.events = 0
+            return
+        self.since = data['started']
+        self.previous = data.get('spaces', dict())
+
+    def read_events(self, client, since):
+        start_time = datetime.fromtimestamp(since, timezone.utc).replace(tzinfo=None)
+        for category in CHANGE_CATEGORIES:
+            result = client.team_log_get_events(time=TimeRange(start_time=start_time), category=category)
+            self.add_events(result.events)
+            while result.has_more:
+                result = client.team_log_get_events_continue(cursor=result.cursor)
+                self.add_events(result.events)
+
+    def add_events(self, events: list[TeamEvent]):
+        for event in events:
+            self.events += 1
+            for asset in event.assets or []:
+                if asset.is_file():
+                    path = asset.get_file().path
+                elif asset.is_folder():
+                    path = asset.get_folder().path
+                else:
+                    continue
+                relative = path.namespace_relative
+                if relative.ns_id:
+                    self.changed.setdefault(relative.ns_id, set()).add(relative.relative_path or '')
+
+    def unchanged(self, space_id):
+        # Stored space of the last run, None when it has to be traversed
+        if self.since is None:
+            return None
+        space = self.previous.get(space_id)
+        if space is None or any(namespace_id in self.changed for namespace_id in space['namespaces']):
+            return None
+        self.spaces[space_id] = space
+        self.reused += 1
+        return space
+
+    def start_space(self, root, namespace_id, claims):
+        self.current = {'root': root, 'namespace': namespace_id, 'claims': set(claims), 'folders': list()}
+
+    def add_folder(self, folder_id, backup):
+        if self.current is None or backup['level'] > self.max_level:
+            return
+        # Orders are kept relative to the space root, it may have another position in the next run
+        backup['order'] = backup['order'][len(self.current['root'].order):]
+        self.current['folders'].append([folder_id, backup])
+
+    def end_space(self, claims):
+        space = self.current
+        self.current = None
+        claimed = sorted(set(claims) - space['claims'])
+        self.spaces[space['root'].id] = {
+            'namespaces': [space['namespace']] + claimed,
+            'claims': claimed,
+            'folders': space['folders'],
+        }
+
+    def save(self):
+        data = {
+            'owner': self.owner,
+            'max_level': self.max_level,
+            'started': self.started,
+            'spaces': self.spaces,
+        }
+        atomic_write(self.path, lambda f: json.dump(data, f))
+
+    def summary(self):
+        since = f'{datetime.fromtimestamp(self.since):%Y-%m-%d %H:%M:%S}' if self.since else None
+        return (f"{self.events:,} audit log events since {since} in {len(self.changed):,} namespaces, "
+                f"{self.reused:,} spaces reused")
@@ -0,0 +1,215 @@
+from dropbox.files import FolderMetadata, FileMetadata, ListFolderResult
+
+from module.app import Folder, File, DOCUMENT_TYPES
+from module.database import folder_records, file_records
+from module.output import OrderedRowWriter, OUTPUT_FORMATS, FOLDER_SCHEMA, OWNER_SCHEMA, ALL_MEMBER_SCHEMA, \
+    FILE_SCHEMA
+
+# One crawl of the team feeding every report at once (crawl.py). The crawler lists each space once, in the order
+# and with the roots of main.py, and hands the same stream of folders and files to the sinks of the requested
+# outputs, each writing output/<output_name>_<output>.<format>:
+# - folders: folder rollup of main.py
+# - owners: folder rollup with owner attribution of owner.py
+# - members: private/shared folder counts per member of member.py
+# - files: a row per file (members, groups, duplicates) of file.py
+# - documents: the file rows with the embedded files and Dropbox links of the documents (file.py -c 1)
+# A sink asks for what it needs (revisions for the dates, folder and file members for the ACL columns), the crawler
+# fetches it once for all of them. There is no resume of an interrupted crawl.
+
+class CrawlSink:
+    name = ''
+    schema = None
+    # File revisions (created and modified dates), members of the shared folders and of the files needed by the sink
+    revisions = False
+    acl = False
+    file_acl = False
+
+    def __init__(self, app, max_level=9999):
+        self.app = app
+        self.max_level = max_level
+        self.output = None
+        # Only one sink writes the folders of the database
+        self.database = True
+
+    def open(self, writer, output_name, output_format):
+        sink = OUTPUT_FORMATS[output_format](path=f'output/{output_name}_{self.name}.{output_format}',
+                                             schema=self.schema)
+        self.output = writer.add_sink(OrderedRowWriter(sink=sink))
+
+    def space(self, root, team_member=None):
+        pass
+
+    def entry(self, parent, folder, shared, owned):
+        # Every folder listed, whether or not it is traversed
+        pass
+
+    def file(self, folder, file, client, level):
+        pass
+
+    def folder(self, folder):
+        # Once the folder and everything under it is done (post-order)
+        pass
+
+    def space_done(self, root, team_member=None):
+        pass
+
+
+class FolderSink(CrawlSink):
+    name = 'folders'
+    schema = FOLDER_SCHEMA
+    revisions = True
+    acl = True
+    owner = False
+
+    def folder(self, folder):
+        if folder.level <= self.max_level:
+            self.output.write(folder.order, self.app.folder_row(folder, owner=self.owner))
+            if self.database:
+                self.app.update_database(folder_records(folder, owned_by_team=self.app.owned_by_team(folder)))
+
+
+class OwnerSink(FolderSink):
+    name = 'owners'
+    schema = OWNER_SCHEMA
+    owner = True
+
+
+class MemberSink(CrawlSink):
+    name = 'members'
+    schema = ALL_MEMBER_SCHEMA
+
+    def __init__(self, app, max_level=9999):
+        CrawlSink.__init__(self, app, max_level)
+        # Root folder id of the space of a member -> [private count, shared count]
+        self.counts = dict()
+
+    def space(self, root, team_member=None):
+        if team_member:
+            self.counts[root.id] = [0, 0]
+
+    def entry(self, parent, folder, shared, owned):
+        # Folders in the root of the member's space
+        counts = self.counts.get(parent.id)
+        if counts is not None:
+            if not shared:
+                counts[0] += 1
+            elif owned:
+                counts[1] += 1
+
+    def space_done(self, root, team_member=None):
+        if not team_member:
+            return
+        private_count, shared_count = self.counts.pop(root.id)
+        row = [team_member.name.display_name, team_member.email, private_count, shared_count]
+        self.output.write(root.order, row)
+        self.app.update_database([('members', row)])
+
+
+class FileSink(CrawlSink):
+    name = 'files'
+    schema = FILE_SCHEMA
+    revisions = True
+    file_acl = True
+    check_content = False
+
+    def __init__(self, app, max_level=9999):
+        CrawlSink.__init__(self, app, max_level)
+        self.content_hashes = set()
+
+    def space(self, root, team_member=None):
+        # Duplicates are flagged within a space, as file.py does within its report root
+        self.content_hashes = set()
+
+    def file(self, folder, file, client, level):
+        file.is_duplicate_in_root = file.content_hash in self.content_hashes
+        self.content_hashes.add(file.content_hash)
+        if self.check_content and file.type in DOCUMENT_TYPES:
+            with self.app.tracer.span('file', path=file.path_display, size=file.size):
+                self.app.analyse_document(file, client)
+        for key, row in self.app.file_rows(file, level):
+            self.output.write(key, row)
+        self.app.update_database(file_records(file, folder, level))
+
+
+class DocumentSink(FileSink):
+    name = 'documents'
+    check_content = True
+
+
+CRAWL_OUTPUTS = {sink.name: sink for sink in [FolderSink, OwnerSink, MemberSink, FileSink, DocumentSink]}
+
+
+class Crawler:
+    def __init__(self, app, sinks):
+        self.app = app
+        self.sinks = sinks
+        self.revisions = any(sink.revisions for sink in sinks)
+        self.acl = any(sink.acl for sink in sinks)
+        self.file_acl = any(sink.file_acl for sink in sinks)
+
+    def space(self, root, client, level, verify_id=None, team_member=None):
+        for sink in self.sinks:
+            sink.space(root, team_member)
+        self.walk(root, client, level, verify_id)
+        for sink in self.sinks:
+            sink.space_done(root, team_member)
+
+    def walk(self, folder, client, level, verify_id=None):
+        with self.app.tracer.span('folder', path=folder.path_display, level=folder.level):
+            contents: ListFolderResult = client.files_list_folder(path=folder.path_lower)
+            while True:
+                for content in contents.entries:
+                    if isinstance(content, FolderMetadata):
+                        self.visit_folder(folder, content, client, level, verify_id)
+                    elif isinstance(content, FileMetadata):
+                        self.visit_file(folder, content, client, level)
+                if not contents.has_more:
+                    break
+                contents = client.files_list_folder_continue(cursor=contents.cursor)
+        self.done(folder)
+
+    def visit_folder(self, parent, content: FolderMetadata, client, level, verify_id):
+        namespaces = self.app.namespaces
+        folder = Folder(obj=content, namespace=parent.namespace, level=level, type_=parent.type)
+        folder.set_parent(parent)
+        shared = bool(content.shared_folder_id)
+        if shared and level == 1 and parent.type == 'Private Folder':
+            folder.type = "Shared Folder"
+        owned = not shared or not verify_id or namespaces.is_owner(client, content.shared_folder_id, verify_id)
+        for sink in self.sinks:
+            sink.entry(parent, folder, shared, owned)
+        # Shared folders are traversed once, by the team folder or the space of their owner
+        if not owned or (shared and not namespaces.claim(content.shared_folder_id, by=verify_id)):
+            return
+        if shared and self.acl:
+            acl = namespaces.members(client, content.shared_folder_id)
+            for member in acl.users:
+                folder.members.append(f'({member.access_type._tag[0].upper()}) {member.user.email}')
+                if member.access_type.is_owner():
+                    folder.owner = member.user.email
+            for group in acl.groups:
+                group_members = self.app.get_group_members(group_id=group.group.group_id)
+                folder.groups.append(f'({group.access_type._tag[0].upper()}) '
+                                     f'{group.group.group_name}({", ".join(group_members)})')
+        self.walk(folder, client, level + 1, verify_id)
+        parent.add_folder(folder)
+
+    def visit_file(self, folder, content: FileMetadata, client, level):
+        file = File(content)
+        if self.revisions:
+            revisions = client.files_list_revisions(path=content.path_lower).entries
+            file.last_modified = revisions[0].server_modified
+            file.created_at = revisions[-1].server_modified
+        file.order = folder.next_order()
+        file.type = file.name.split('/')[-1].split('.')[-1]
+        if self.file_acl:
+            self.app.get_file_members(client, file)
+        for sink in self.sinks:
+            sink.file(folder, file, client, level)
+        folder.add_file(file)
+
+    def done(self, folder):
+        folder.done()
+        for sink in self.sinks:
+            sink.folder(folder)
+        self.app.update_live_result(folder)
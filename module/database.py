@@ -0,0 +1,113 @@
+import re
+import sqlite3
+
+TABLES = {
+    'folders': ['id', 'parent_id', 'type', 'namespace', 'level', 'path', 'size', 'files',
+                'sub_folder_non_recursive', 'sub_folder_recursive', 'created_at', 'last_modified',
+                'owner', 'owned_by_team', 'private_count', 'shared_count'],
+    'files': ['id', 'folder_id', 'name', 'type', 'path', 'level', 'size', 'content_hash',
+              'created_at', 'last_modified', 'duplicate', 'embedded'],
+    # object_type is 'folder' or 'file', access is the one letter code used in the reports ((O)wner, (E)ditor...)
+    'acl': ['object_id', 'object_type', 'principal_type', 'access', 'principal', 'group_members'],
+    'links': ['file_id', 'url', 'type', 'name', 'size'],
+    'members': ['name', 'email', 'private_count', 'shared_count'],
+}
+
+COLUMN_TYPES = {
+    'level': 'INTEGER', 'size': 'INTEGER', 'files': 'INTEGER', 'sub_folder_non_recursive': 'INTEGER',
+    'sub_folder_recursive': 'INTEGER', 'owned_by_team': 'INTEGER', 'private_count': 'INTEGER',
+    'shared_count': 'INTEGER', 'duplicate': 'INTEGER',
+}
+
+INDEXES = {
+    'folders_run_path': ('folders', ['run', 'path']),
+    'folders_namespace': ('folders', ['namespace']),
+    'folders_owner': ('folders', ['owner']),
+    'folders_size': ('folders', ['run', 'size']),
+    'files_run_path': ('files', ['run', 'path']),
+    'files_folder': ('files', ['folder_id']),
+    'files_content_hash': ('files', ['content_hash']),
+    'acl_object': ('acl', ['object_id']),
+    'acl_principal': ('acl', ['principal']),
+    'links_url': ('links', ['url']),
+    'links_file': ('links', ['file_id']),
+    'members_email': ('members', ['email']),
+}
+
+ACL_PATTERN = re.compile(r'^\((\w)\) (.*)$')
+GROUP_PATTERN = re.compile(r'^\((\w)\) (.*?)\((.*)\)$')
+
+
+def timestamp(value):
+    return value.isoformat(sep=' ') if value else None
+
+
+def acl_records(object_id, object_type, members, groups):
+    for member in members:
+        match = ACL_PATTERN.match(member)
+        if match:
+            yield 'acl', (object_id, object_type, 'user', match.group(1), match.group(2), None)
+    for group in groups:
+        match = GROUP_PATTERN.match(group)
+        if match:
+            yield 'acl', (object_id, object_type, 'group', match.group(1), match.group(2), match.group(3))
+
+
+def folder_records(folder, owned_by_team=None):
+    yield 'folders', (
+        folder.id, folder.parent.id if folder.parent else folder.parent_id, folder.type, folder.namespace,
+        folder.level, folder.path_display, folder.size, folder.total_file, folder.sub_folder_non_recursive,
+        folder.sub_folder_recursive, timestamp(folder.created_at), timestamp(folder.last_modified),
+        folder.owner or None, owned_by_team, folder.private_count, folder.shared_count
+    )
+    yield from acl_records(folder.id, 'folder', folder.members, folder.groups)
+
+
+def file_records(file, folder, level):
+    yield 'files', (
+        file.id, folder.id, file.name, file.type, file.path_lower, level, file.size, file.content_hash,
+        timestamp(file.created_at), timestamp(file.last_modified), int(file.is_duplicate_in_root),
+        ', '.join(file.embedded)
+    )
+    yield from acl_records(file.id, 'file', file.members, file.groups)
+    for link in file.linked:
+        if link:
+            size = link['size'] if isinstance(link['size'], int) else None
+            yield 'links', (file.id, link['url'], link['type'], link['name'], size)
+
+
+class ReportDatabase:
+    # Sink of the report writer thread: records are buffered per table and inserted in one transaction on every
+    # flush. Several runs can share a database, rows are tagged with the run (output name) and a run that is
+    # started again (e.g. resumed) replaces its previous rows. Indexes are built once the run is loaded.
+    def __init__(self, path, run):
+        self.run = run
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.buffer = {table: list() for table in TABLES}
+        with self.connection:
+            for table, columns in TABLES.items():
+                definition = ', '.join(['run TEXT'] + [f'{column} {COLUMN_TYPES.get(column, "TEXT")}'
+                                                       for column in columns])
+                self.connection.execute(f'CREATE TABLE IF NOT EXISTS {table} ({definition})')
+                self.connection.execute(f'DELETE FROM {table} WHERE run = ?', (run,))
+
+    def write_many(self, records):
+        for table, values in records:
+            self.buffer[table].append((self.run,) + tuple(values))
+
+    def flush(self):
+        with self.connection:
+            for table, rows in self.buffer.items():
+                if rows:
+                    placeholders = ', '.join('?' * (len(TABLES[table]) + 1))
+                    self.connection.executemany(f'INSERT INTO {table} VALUES ({placeholders})', rows)
+                    self.buffer[table] = list()
+
+    def close(self):
+        self.flush()
+        with self.connection:
+            for name, (table, columns) in INDEXES.items():
+                self.connection.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table} ({", ".join(columns)})')
+        self.connection.close()
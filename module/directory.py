@@ -0,0 +1,197 @@
+import json
+import os
+import time
+from threading import Lock
+
+from dropbox import stone_serializers
+from dropbox.team import TeamMemberProfile_validator, TeamFolderMetadata_validator, UserSelectorArg, GroupSelector
+
+from module.files import atomic_write
+
+# Team members and team folders of the tenant, kept in session/directory.json between runs: the reports resolving a
+# single member or team folder (member.py -m, file.py -m/-t) don't page through the whole directory. The reports
+# enumerating the tenant list it again on every run (members(fresh=True)), a member or team folder created since
+# the cached listing would be missing from them. Members are indexed by email, display name, account id and team
+# member id, team folders by name and id. A listing is reused for `ttl` seconds (0: no cache), a member missing from
+# it (joined since the listing) is fetched alone with members/get_info and added to it, anything else missing lists
+# the directory again.
+
+DIRECTORY_PATH = 'session/directory.json'
+DIRECTORY_TTL = 24 * 3600
+
+
+class TeamDirectory:
+    def __init__(self, path=DIRECTORY_PATH, ttl=DIRECTORY_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.client = None
+        # Team member id of the admin, a directory saved with other tokens (another team) is not reused
+        self.owner = None
+        self.members_listed = 0
+        self.team_folders_listed = 0
+        # Whether the listings come from this run, a lookup missing in a listing of a previous run lists again
+        self.members_fresh = False
+        self.team_folders_fresh = False
+        self.member_list = list()
+        self.by_email = dict()
+        self.by_display_name = dict()
+        self.by_account_id = dict()
+        self.by_team_member_id = dict()
+        self.team_folder_list = list()
+        self.team_folders_by_name = dict()
+        self.team_folders_by_id = dict()
+        # Group id -> member emails, for the run only (asked for every shared folder and file of a group)
+        self.groups = dict()
+        # The enrich threads of the file report ask for the same groups at once, a group is listed by one of them
+        self.groups_lock = Lock()
+
+    def open(self, client, owner):
+        self.client = client
+        self.owner = owner
+        if self.ttl <= 0 or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('owner') != owner:
+            return
+        now = time.time()
+        if now - data.get('members_listed', 0) < self.ttl:
+            self.members_listed = data['members_listed']
+            self.index_members([stone_serializers.json_compat_obj_decode(TeamMemberProfile_validator, member)
+                                for member in data.get('members', [])])
+        if now - data.get('team_folders_listed', 0) < self.ttl:
+            self.team_folders_listed = data['team_folders_listed']
+            self.index_team_folders([stone_serializers.json_compat_obj_decode(TeamFolderMetadata_validator, folder)
+                                     for folder in data.get('team_folders', [])])
+
+    def save(self):
+        if self.ttl <= 0:
+            return
+        data = {
+            'owner': self.owner,
+            'members_listed': self.members_listed,
+            'members': [stone_serializers.json_compat_obj_encode(TeamMemberProfile_validator, member)
+                        for member in self.member_list],
+            'team_folders_listed': self.team_folders_listed,
+            'team_folders': [stone_serializers.json_compat_obj_encode(TeamFolderMetadata_validator, folder)
+                             for folder in self.team_folder_list],
+        }
+        atomic_write(self.path, lambda f: json.dump(data, f))
+
+    def index_members(self, members):
+        self.member_list = list()
+        self.by_email = dict()
+        self.by_display_name = dict()
+        self.by_account_id = dict()
+        self.by_team_member_id = dict()
+        for member in members:
+            self.add_member(member)
+
+    def add_member(self, member):
+        self.member_list.append(member)
+        self.by_email[member.email] = member
+        # Display names are not unique, the first member keeps it as the linear scan did
+        self.by_display_name.setdefault(member.name.display_name, member)
+        self.by_account_id[member.account_id] = member
+        self.by_team_member_id[member.team_member_id] = member
+
+    def index_team_folders(self, team_folders):
+        self.team_folder_list = list(team_folders)
+        self.team_folders_by_name = dict()
+        self.team_folders_by_id = dict()
+        for team_folder in self.team_folder_list:
+            self.team_folders_by_name.setdefault(team_folder.name, team_folder)
+            self.team_folders_by_name.setdefault(team_folder.name.lower(), team_folder)
+            self.team_folders_by_id[team_folder.team_folder_id] = team_folder
+
+    def list_members(self):
+        result = list()
+        contents = self.client.team_members_list()
+        result.extend(member.profile for member in contents.members)
+        while contents.has_more:
+            contents = self.client.team_members_list_continue(cursor=contents.cursor)
+            result.extend(member.profile for member in contents.members)
+        self.index_members(result)
+        self.members_listed = time.time()
+        self.members_fresh = True
+        self.save()
+
+    def list_team_folders(self):
+        result = list()
+        contents = self.client.team_team_folder_list()
+        result.extend(contents.team_folders)
+        while contents.has_more:
+            contents = self.client.team_team_folder_list_continue(cursor=contents.cursor)
+            result.extend(contents.team_folders)
+        self.index_team_folders(result)
+        self.team_folders_listed = time.time()
+        self.team_folders_fresh = True
+        self.save()
+
+    def members(self, fresh=False):
+        # fresh: listed by this run, not reused from the cache
+        if not self.members_listed or (fresh and not self.members_fresh):
+            self.list_members()
+        return self.member_list
+
+    def team_folders(self, fresh=False):
+        if not self.team_folders_listed or (fresh and not self.team_folders_fresh):
+            self.list_team_folders()
+        return self.team_folder_list
+
+    def find_member(self, identity):
+        self.members()
+        return (self.by_email.get(identity) or self.by_display_name.get(identity)
+                or self.by_team_member_id.get(identity) or self.by_account_id.get(identity))
+
+    def member(self, identity):
+        # Email, display name, team member id or account id
+        member = self.find_member(identity)
+        if member:
+            return member
+        if '@' in identity or identity.startswith('dbmid:'):
+            member = self.fetch_member(identity)
+            if member:
+                return member
+        if not self.members_fresh:
+            self.list_members()
+            return self.find_member(identity)
+        return None
+
+    def fetch_member(self, identity):
+        selector = UserSelectorArg.email(identity) if '@' in identity else UserSelectorArg.team_member_id(identity)
+        result = self.client.team_members_get_info_v2([selector])
+        item = result.members_info[0]
+        if not item.is_member_info():
+            return None
+        member = item.get_member_info().profile
+        self.add_member(member)
+        self.save()
+        return member
+
+    def team_folder(self, identity):
+        # Name (or lower case name) or team folder id
+        self.team_folders()
+        team_folder = self.team_folders_by_name.get(identity) or self.team_folders_by_id.get(identity)
+        if team_folder or self.team_folders_fresh:
+            return team_folder
+        self.list_team_folders()
+        return self.team_folders_by_name.get(identity) or self.team_folders_by_id.get(identity)
+
+    def group_members(self, group_id):
+        if group_id in self.groups:
+            return self.groups[group_id]
+        with self.groups_lock:
+            if group_id in self.groups:
+                return self.groups[group_id]
+            result = list()
+            contents = self.client.team_groups_members_list(group=GroupSelector.group_id(group_id))
+            result.extend(member.profile.email for member in contents.members)
+            while contents.has_more:
+                contents = self.client.team_groups_members_list_continue(cursor=contents.cursor)
+                result.extend(member.profile.email for member in contents.members)
+            self.groups[group_id] = result
+            return result
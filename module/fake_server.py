@@ -0,0 +1,769 @@
+import io
+import json
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+from hashlib import sha256
+from urllib.parse import urlparse
+from zipfile import ZipFile, ZIP_STORED
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from dropbox import files, sharing, team, team_common, team_log, users, users_common, common, stone_serializers
+
+# Stand-in for the parts of the Dropbox team, files and sharing API used by DropBoxApp. The SDK always talks
+# https to api/content.dropboxapi.com, so instead of a listening socket the fake is a requests transport adapter
+# mounted on the session given to the clients (DropBoxApp(session=...)): every request is answered in-process
+# from a synthetic tenant, with optional latency, page size limits and injected 429s.
+
+ACCESS_LEVELS = {
+    'owner': sharing.AccessLevel.owner,
+    'editor': sharing.AccessLevel.editor,
+    'viewer': sharing.AccessLevel.viewer,
+}
+DOCUMENT_TYPES = ('docx', 'xlsx', 'pdf')
+OTHER_TYPES = ('txt', 'png', 'jpg', 'mp4', 'csv', 'zip')
+
+
+class FakeApiError(Exception):
+    def __init__(self, error, summary):
+        Exception.__init__(self, summary)
+        self.error = error
+        self.summary = summary
+
+
+class FakeNode:
+    __slots__ = ('id', 'name', 'parent', 'namespace', 'is_folder', 'children', 'target', 'size', 'content_hash',
+                 'server_modified', 'revisions', 'type', 'links', 'embedded', 'url')
+
+    def __init__(self, name, parent=None, namespace=None, is_folder=True):
+        self.id = None
+        self.name = name
+        self.parent = parent
+        self.namespace = namespace
+        self.is_folder = is_folder
+        self.children = list() if is_folder else None
+        # Mount point of a shared/team folder namespace inside another namespace
+        self.target = None
+        self.size = 0
+        self.content_hash = None
+        self.server_modified = None
+        self.revisions = 1
+        self.type = None
+        self.links = list()
+        self.embedded = 0
+        self.url = None
+        if parent is not None:
+            parent.children.append(self)
+
+    def path(self):
+        parts = list()
+        node = self
+        while node.parent is not None:
+            parts.append(node.name)
+            node = node.parent
+        return '/' + '/'.join(reversed(parts)) if parts else ''
+
+
+class FakeNamespace:
+    def __init__(self, namespace_id, name, type_, owner=None):
+        self.id = namespace_id
+        self.name = name
+        self.type = type_
+        self.owner = owner
+        self.root = FakeNode('', namespace=self)
+        self.root.id = f'id:ns{namespace_id}'
+        # (member, access) and (group, access) of shared and team folders
+        self.members = list()
+        self.groups = list()
+        # Namespace id of the viewing namespace -> mount node
+        self.mounts = dict()
+
+
+class FakeMember:
+    def __init__(self, index):
+        self.index = index
+        self.team_member_id = f'dbmid:{index:06d}' + 'a' * 34
+        self.account_id = f'dbid:{index:035d}'
+        self.email = f'user{index}@example.com'
+        self.given_name = 'User'
+        self.surname = str(index)
+        self.display_name = f'User {index}'
+        self.groups = list()
+        self.namespace = None
+
+
+class FakeGroup:
+    def __init__(self, index):
+        self.group_id = f'g:{index:024x}'
+        self.name = f'Group {index}'
+        self.members = list()
+
+
+class FakeTenant:
+    # Synthetic team: every member has a private space of `depth` levels with `width` sub-folders and `files`
+    # files per folder. A folder of a private space becomes a shared folder (owned by that member and mounted in
+    # the root of `mounts` other members) with probability `shared_ratio`. `documents` gives the ratio of docx,
+    # xlsx and pdf files, each document links to `links` shared links of the tenant and holds `document_entries`
+    # filler paragraphs (docx), cells (xlsx) or text lines (pdf).
+    def __init__(self, members=10, groups=3, team_folders=2, other_namespaces=1, width=3, depth=3, files=4,
+                 shared_ratio=0.1, mounts=2, documents=None, links=2, link_targets=50, revisions=3,
+                 document_padding=0, document_entries=0, seed=0):
+        self.random = random.Random(seed)
+        uuid_random = random.Random(seed)
+        self.uuid = lambda: uuid.UUID(int=uuid_random.getrandbits(128))
+        self.width = width
+        self.depth = depth
+        self.files = files
+        self.shared_ratio = shared_ratio
+        self.mounts = mounts
+        self.documents = documents if documents is not None else {'docx': 0.02, 'xlsx': 0.02, 'pdf': 0.02}
+        self.links = links
+        self.link_targets = link_targets
+        self.revisions = revisions
+        self.document_padding = document_padding
+        self.document_entries = document_entries
+        # Fixed content of files (node id -> bytes), e.g. documents built once before a benchmark
+        self.contents: dict[str, bytes] = dict()
+        self.members: list[FakeMember] = list()
+        self.groups: list[FakeGroup] = list()
+        self.namespaces: dict[str, FakeNamespace] = dict()
+        self.team_folders: list[FakeNamespace] = list()
+        self.nodes: dict[str, FakeNode] = dict()
+        self.shared_links: dict[str, FakeNode] = dict()
+        # Audit log of the team (see touch)
+        self.events: list[team_log.TeamEvent] = list()
+        self.next_namespace_id = 1000
+        self.generate(members, groups, team_folders, other_namespaces)
+
+    @property
+    def admin(self) -> FakeMember:
+        return self.members[0]
+
+    def add_namespace(self, name, type_, owner=None) -> FakeNamespace:
+        self.next_namespace_id += 1
+        namespace = FakeNamespace(str(self.next_namespace_id), name, type_, owner=owner)
+        self.namespaces[namespace.id] = namespace
+        self.nodes[namespace.root.id] = namespace.root
+        return namespace
+
+    def add_node(self, name, parent, is_folder=True) -> FakeNode:
+        node = FakeNode(name, parent=parent, namespace=parent.namespace, is_folder=is_folder)
+        node.id = f'id:{self.uuid().hex[:22]}'
+        self.nodes[node.id] = node
+        return node
+
+    def mount(self, namespace: FakeNamespace, parent: FakeNode, name=None):
+        node = FakeNode(name or namespace.name, parent=parent, namespace=parent.namespace)
+        node.id = namespace.root.id
+        node.target = namespace
+        namespace.mounts[parent.namespace.id] = node
+
+    def generate(self, members, groups, team_folders, other_namespaces):
+        for index in range(members):
+            member = FakeMember(index)
+            member.namespace = self.add_namespace(member.display_name, 'team_member_folder', owner=member)
+            self.members.append(member)
+        for index in range(groups):
+            group = FakeGroup(index)
+            group.members = self.random.sample(self.members, k=max(1, len(self.members) // 3))
+            for member in group.members:
+                member.groups.append(group.group_id)
+            self.groups.append(group)
+
+        for index in range(team_folders):
+            namespace = self.add_namespace(f'Team Folder {index}', 'team_folder')
+            for group in self.groups:
+                namespace.groups.append((group, 'editor'))
+            self.build_tree(namespace.root, level=1)
+            # Team folders are reached by the admin from its root
+            self.mount(namespace, self.admin.namespace.root)
+            self.team_folders.append(namespace)
+
+        for member in self.members:
+            self.build_tree(member.namespace.root, level=1)
+
+        for index in range(other_namespaces):
+            owner = self.random.choice(self.members)
+            namespace = self.add_namespace(f'App {index}', 'app_folder', owner=owner)
+            self.build_tree(namespace.root, level=self.depth)
+
+        targets = [node for node in self.nodes.values() if node.parent is not None and not node.target]
+        for node in self.random.sample(targets, k=min(self.link_targets, len(targets))):
+            kind = 'fo' if node.is_folder else 'fi'
+            node.url = (f'https://www.dropbox.com/scl/{kind}/{self.uuid().hex[:20]}/{self.uuid().hex[:10]}'
+                        f'?rlkey={self.uuid().hex[:16]}&dl=0')
+            self.shared_links[self.link_token(node.url)] = node
+        urls = [node.url for node in self.shared_links.values()]
+        for node in self.nodes.values():
+            if node.type in DOCUMENT_TYPES and urls:
+                node.links = self.random.sample(urls, k=min(self.links, len(urls)))
+
+    def build_tree(self, folder: FakeNode, level):
+        for index in range(self.files):
+            self.add_file(folder, index)
+        if level > self.depth:
+            return
+        for index in range(self.width):
+            namespace = folder.namespace
+            if namespace.type == 'team_member_folder' and self.random.random() < self.shared_ratio:
+                owner = namespace.owner
+                shared = self.add_namespace(f'Shared {owner.index}-{self.next_namespace_id}', 'shared_folder',
+                                            owner=owner)
+                shared.members.append((owner, 'owner'))
+                others = [member for member in self.members if member is not owner]
+                for member in self.random.sample(others, k=min(self.mounts, len(others))):
+                    shared.members.append((member, self.random.choice(['editor', 'viewer'])))
+                    self.mount(shared, member.namespace.root)
+                if self.groups and self.random.random() < 0.5:
+                    shared.groups.append((self.random.choice(self.groups), 'viewer'))
+                self.mount(shared, folder)
+                self.build_tree(shared.root, level + 1)
+            else:
+                sub_folder = self.add_node(f'Folder {level}-{index}', folder)
+                self.build_tree(sub_folder, level + 1)
+
+    def add_file(self, folder, index):
+        type_ = self.random.choice(OTHER_TYPES)
+        pick = self.random.random()
+        for document_type, ratio in self.documents.items():
+            if pick < ratio:
+                type_ = document_type
+                break
+            pick -= ratio
+        node = self.add_node(f'File {index}.{type_}', folder, is_folder=False)
+        node.type = type_
+        node.size = self.random.randint(1, 50 * 1024 * 1024)
+        node.content_hash = sha256(node.id.encode()).hexdigest()
+        node.server_modified = datetime(2020, 1, 1) + timedelta(seconds=self.random.randint(0, 100000000))
+        node.revisions = self.random.randint(1, self.revisions)
+        if type_ in ('docx', 'xlsx'):
+            node.embedded = self.random.randint(0, 2)
+
+    def touch(self, namespaces, when=None):
+        # A file edited in `namespaces` random namespaces, logged in the audit log at `when` (UTC, default now)
+        when = when or datetime.utcnow().replace(microsecond=0)
+        for namespace in self.random.sample(list(self.namespaces.values()), k=min(namespaces, len(self.namespaces))):
+            node = self.random.choice([node for node in self.nodes.values()
+                                       if node.namespace is namespace and not node.is_folder] or [namespace.root])
+            relative = team_log.NamespaceRelativePathLogInfo(
+                ns_id=namespace.id, relative_path=node.path(),
+                is_shared_namespace=namespace.type != 'team_member_folder'
+            )
+            path = team_log.PathLogInfo(namespace_relative=relative)
+            self.events.append(team_log.TeamEvent(
+                timestamp=when, event_category=team_log.EventCategory.file_operations,
+                event_type=team_log.EventType.file_edit(team_log.FileEditType(description='Edited files')),
+                details=team_log.EventDetails.file_edit_details(team_log.FileEditDetails()),
+                involve_non_team_member=False,
+                assets=[team_log.AssetLogInfo.file(team_log.FileLogInfo(path=path, display_name=node.name,
+                                                                        file_id=node.id))]
+            ))
+
+    @staticmethod
+    def link_token(url):
+        parts = urlparse(url).path.split('/')
+        return parts[3] if len(parts) > 3 else ''
+
+    @staticmethod
+    def filler(index):
+        return f'Entry {index}: quarterly figures, see the shared drive for the source data'
+
+    def count(self):
+        folders = sum(1 for node in self.nodes.values() if node.is_folder)
+        return {'folders': folders, 'files': len(self.nodes) - folders, 'namespaces': len(self.namespaces)}
+
+    def document(self, node: FakeNode) -> bytes:
+        rand = random.Random(node.id)
+        buffer = io.BytesIO()
+        if node.type == 'docx':
+            from docx import Document
+            document = Document()
+            for url in node.links:
+                document.add_paragraph(f'See {url} for details')
+            for index in range(self.document_entries):
+                document.add_paragraph(self.filler(index))
+            document.save(buffer)
+        elif node.type == 'xlsx':
+            from openpyxl import Workbook
+            wb = Workbook()
+            for row, url in enumerate(node.links, start=1):
+                wb.active.cell(row=row, column=1, value=url)
+            for index in range(self.document_entries):
+                wb.active.cell(row=len(node.links) + 1 + index // 10, column=1 + index % 10, value=self.filler(index))
+            wb.save(buffer)
+        elif node.type == 'pdf':
+            import fitz
+            doc = fitz.open()
+            page = doc.new_page()
+            for row, url in enumerate(node.links):
+                page.insert_text((72, 72 + row * 20), url)
+            lines = [self.filler(index) for index in range(self.document_entries)]
+            for start in range(0, len(lines), 50):
+                doc.new_page().insert_text((72, 72), '\n'.join(lines[start:start + 50]), fontsize=8)
+            return doc.tobytes()
+        else:
+            return rand.randbytes(min(node.size, 1024))
+        if node.embedded or self.document_padding:
+            prefix = 'word' if node.type == 'docx' else 'xl'
+            with ZipFile(buffer, 'a') as zip_file:
+                for index in range(node.embedded):
+                    zip_file.writestr(f'{prefix}/embeddings/oleObject{index + 1}.bin', rand.randbytes(2048))
+                if self.document_padding:
+                    zip_file.writestr(f'{prefix}/media/image1.png', rand.randbytes(self.document_padding),
+                                      compress_type=ZIP_STORED)
+        return buffer.getvalue()
+
+
+class Caller:
+    def __init__(self, member: FakeMember = None, view: FakeNamespace = None):
+        self.member = member
+        self.view = view
+
+
+class FakeDropbox(BaseAdapter):
+    def __init__(self, tenant: FakeTenant, latency=0.0, jitter=0.0, page_size=2000, rate_limit_ratio=0.0,
+                 retry_after=0, token_ttl=14400, seed=0):
+        BaseAdapter.__init__(self)
+        self.tenant = tenant
+        self.latency = latency
+        self.jitter = jitter
+        self.page_size = page_size
+        self.rate_limit_ratio = rate_limit_ratio
+        self.retry_after = retry_after
+        self.token_ttl = token_ttl
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.cursors = dict()
+        self.tokens = dict()
+        self.calls = Counter()
+        self.rate_limited = Counter()
+        self.routes = {
+            'users/get_current_account': (users.ROUTES['get_current_account'], self.get_current_account),
+            'team/token/get_authenticated_admin': (team.ROUTES['token/get_authenticated_admin'],
+                                                   self.get_authenticated_admin),
+            'team/members/list': (team.ROUTES['members/list'], self.members_list),
+            'team/members/list/continue': (team.ROUTES['members/list/continue'], self.list_continue),
+            'team/members/get_info_v2': (team.ROUTES['members/get_info:2'], self.members_get_info),
+            'team/team_folder/list': (team.ROUTES['team_folder/list'], self.team_folder_list),
+            'team/team_folder/list/continue': (team.ROUTES['team_folder/list/continue'], self.list_continue),
+            'team/namespaces/list': (team.ROUTES['namespaces/list'], self.namespaces_list),
+            'team/namespaces/list/continue': (team.ROUTES['namespaces/list/continue'], self.list_continue),
+            'team/groups/members/list': (team.ROUTES['groups/members/list'], self.groups_members_list),
+            'team/groups/members/list/continue': (team.ROUTES['groups/members/list/continue'], self.list_continue),
+            'files/list_folder': (files.ROUTES['list_folder'], self.list_folder),
+            'files/list_folder/continue': (files.ROUTES['list_folder/continue'], self.list_continue),
+            'files/list_revisions': (files.ROUTES['list_revisions'], self.list_revisions),
+            'files/download': (files.ROUTES['download'], self.download),
+            'sharing/list_folders': (sharing.ROUTES['list_folders'], self.list_folders),
+            'sharing/list_folders/continue': (sharing.ROUTES['list_folders/continue'], self.list_continue),
+            'sharing/list_folder_members': (sharing.ROUTES['list_folder_members'], self.list_folder_members),
+            'sharing/list_file_members': (sharing.ROUTES['list_file_members'], self.list_file_members),
+            'sharing/get_shared_link_metadata': (sharing.ROUTES['get_shared_link_metadata'],
+                                                 self.get_shared_link_metadata),
+            'team_log/get_events': (team_log.ROUTES['get_events'], self.get_events),
+            'team_log/get_events/continue': (team_log.ROUTES['get_events/continue'], self.list_continue),
+        }
+
+    def session(self) -> requests.Session:
+        session = requests.Session()
+        session.mount('https://', self)
+        return session
+
+    # Transport
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        route = urlparse(request.url).path.lstrip('/')
+        route = route[2:] if route.startswith('2/') else route
+        with self.lock:
+            self.calls[route] += 1
+            delay = self.latency + self.random.uniform(0, self.jitter) if self.latency or self.jitter else 0
+            limited = self.rate_limit_ratio and self.random.random() < self.rate_limit_ratio
+        if delay:
+            time.sleep(delay)
+        if limited:
+            with self.lock:
+                self.rate_limited[route] += 1
+            status, headers, body = 429, {'Content-Type': 'text/plain', 'Retry-After': str(self.retry_after)}, b''
+        else:
+            status, headers, body = self.handle(route, request)
+        response = requests.Response()
+        response.status_code = status
+        response.reason = 'OK' if status < 400 else 'Error'
+        response.headers = CaseInsensitiveDict(headers)
+        response.headers['X-Dropbox-Request-Id'] = uuid.uuid4().hex
+        response.raw = io.BytesIO(body)
+        response.url = request.url
+        response.request = request
+        response.encoding = 'utf-8'
+        return response
+
+    def close(self):
+        pass
+
+    @staticmethod
+    def json_response(status, data):
+        return status, {'Content-Type': 'application/json'}, json.dumps(data).encode('utf-8')
+
+    def handle(self, route, request):
+        if route == 'oauth2/token':
+            return self.json_response(200, {'access_token': self.issue_token(), 'token_type': 'bearer',
+                                            'expires_in': self.token_ttl})
+        token = request.headers.get('Authorization', '').replace('Bearer ', '')
+        expires = self.tokens.get(token)
+        if expires and expires < time.time():
+            return self.json_response(401, {'error_summary': 'expired_access_token/',
+                                            'error': {'.tag': 'expired_access_token'}})
+        if route not in self.routes:
+            return 400, {'Content-Type': 'text/plain'}, f'Unknown API function: "{route}"'.encode()
+        stone_route, handler = self.routes[route]
+        if stone_route.attrs['style'] == 'download':
+            raw_arg = request.headers.get('Dropbox-API-Arg', 'null')
+        else:
+            raw_arg = request.body or 'null'
+        raw_arg = raw_arg.decode('utf-8') if isinstance(raw_arg, bytes) else raw_arg
+        arg = None
+        if stone_route.arg_type is not None and raw_arg != 'null':
+            arg = stone_serializers.json_compat_obj_decode(stone_route.arg_type, json.loads(raw_arg))
+        caller = self.caller(request.headers)
+        try:
+            result = handler(caller, arg, request)
+        except FakeApiError as e:
+            error = stone_serializers.json_compat_obj_encode(stone_route.error_type, e.error)
+            return self.json_response(409, {'error_summary': e.summary, 'error': error})
+        if stone_route.attrs['style'] == 'download':
+            metadata, content = result
+            headers = {
+                'Content-Type': 'application/octet-stream',
+                'Dropbox-API-Result': stone_serializers.json_encode(stone_route.result_type, metadata),
+            }
+            status = 200
+            ranges = request.headers.get('Range')
+            if ranges:
+                start, end = self.parse_range(ranges, len(content))
+                headers['Content-Range'] = f'bytes {start}-{end}/{len(content)}'
+                content = content[start:end + 1]
+                status = 206
+            headers['Content-Length'] = str(len(content))
+            return status, headers, content
+        return 200, {'Content-Type': 'application/json'}, \
+            stone_serializers.json_encode(stone_route.result_type, result).encode('utf-8')
+
+    @staticmethod
+    def parse_range(header, length):
+        start, end = header.replace('bytes=', '').split('-')
+        if not start:
+            return max(0, length - int(end)), length - 1
+        return int(start), min(int(end), length - 1) if end else length - 1
+
+    def issue_token(self):
+        token = f'fake.{uuid.uuid4().hex}'
+        with self.lock:
+            self.tokens[token] = time.time() + self.token_ttl
+        return token
+
+    def caller(self, headers) -> Caller:
+        member_id = headers.get('Dropbox-API-Select-User') or headers.get('Dropbox-API-Select-Admin')
+        member = None
+        if member_id:
+            member = next((m for m in self.tenant.members if m.team_member_id == member_id), None)
+        caller = Caller(member=member, view=member.namespace if member else None)
+        path_root = headers.get('Dropbox-API-Path-Root')
+        if path_root:
+            path_root = json.loads(path_root)
+            if path_root['.tag'] == 'namespace_id':
+                caller.view = self.tenant.namespaces.get(path_root['namespace_id'], caller.view)
+        return caller
+
+    def paginate(self, items, limit, build):
+        limit = min(limit or self.page_size, self.page_size)
+        page, rest = items[:limit], items[limit:]
+        cursor = None
+        if rest:
+            cursor = f'cursor-{uuid.uuid4().hex}'
+            with self.lock:
+                self.cursors[cursor] = (rest, limit, build)
+        return build(page, cursor or 'end', bool(rest))
+
+    def list_continue(self, caller, arg, request):
+        with self.lock:
+            rest, limit, build = self.cursors.pop(arg.cursor)
+        return self.paginate(rest, limit, build)
+
+    # Metadata builders
+
+    def name(self, member: FakeMember):
+        return users.Name(given_name=member.given_name, surname=member.surname, familiar_name=member.given_name,
+                          display_name=member.display_name, abbreviated_name=f'U{member.index}')
+
+    def profile(self, member: FakeMember, class_=team.TeamMemberProfile):
+        data = dict(
+            team_member_id=member.team_member_id, email=member.email, email_verified=True,
+            status=team.TeamMemberStatus.active, name=self.name(member),
+            membership_type=team.TeamMembershipType.full, account_id=member.account_id
+        )
+        if class_ is team.TeamMemberProfile:
+            data.update(groups=list(member.groups), member_folder_id=member.namespace.id)
+        return class_(**data)
+
+    def path_in(self, node: FakeNode, view: FakeNamespace):
+        namespace = node.namespace
+        if namespace is view:
+            return node.path()
+        mount = namespace.mounts.get(view.id) if view else None
+        if mount is None:
+            return None
+        return mount.path() + node.path()
+
+    def metadata(self, node: FakeNode, view: FakeNamespace, path=None):
+        path = path if path is not None else self.path_in(node, view)
+        if node.is_folder:
+            target = node.target
+            parent_shared = node.namespace.id if node.namespace.type != 'team_member_folder' else None
+            return files.FolderMetadata(
+                name=node.name, id=node.id, path_lower=path.lower() if path else None, path_display=path,
+                shared_folder_id=target.id if target else None, parent_shared_folder_id=parent_shared,
+                sharing_info=files.FolderSharingInfo(
+                    read_only=False, shared_folder_id=target.id if target else None,
+                    parent_shared_folder_id=parent_shared, traverse_only=False, no_access=False
+                ) if target or parent_shared else None
+            )
+        return self.file_metadata(node, path)
+
+    def file_metadata(self, node: FakeNode, path, revision=0):
+        modified = node.server_modified - timedelta(days=30 * revision)
+        return files.FileMetadata(
+            name=node.name, id=node.id, client_modified=modified, server_modified=modified,
+            rev=f'{revision:03x}{node.content_hash[:9]}', size=node.size,
+            path_lower=path.lower() if path else None, path_display=path, is_downloadable=True,
+            content_hash=node.content_hash
+        )
+
+    def resolve(self, caller: Caller, path, error):
+        if path.startswith('id:'):
+            node = self.tenant.nodes.get(path.split('/')[0])
+            rest = path.split('/')[1:]
+        elif path.startswith('ns:'):
+            namespace = self.tenant.namespaces.get(path.split('/')[0][3:])
+            node = namespace.root if namespace else None
+            rest = path.split('/')[1:]
+        else:
+            node = caller.view.root if caller.view else None
+            rest = path.split('/')[1:] if path else []
+        for name in rest:
+            if node is None or not node.is_folder:
+                node = None
+                break
+            if node.target:
+                node = node.target.root
+            node = next((child for child in node.children if child.name.lower() == name.lower()), None)
+        if node is None:
+            raise FakeApiError(error, 'path/not_found/')
+        return node
+
+    def user_info(self, member: FakeMember, access, class_=sharing.UserMembershipInfo):
+        return class_(
+            access_type=ACCESS_LEVELS[access],
+            user=sharing.UserInfo(account_id=member.account_id, email=member.email, display_name=member.display_name,
+                                  same_team=True, team_member_id=member.team_member_id),
+            is_inherited=False
+        )
+
+    @staticmethod
+    def group_info(group: FakeGroup, access):
+        return sharing.GroupMembershipInfo(
+            access_type=ACCESS_LEVELS[access],
+            group=sharing.GroupInfo(group_name=group.name, group_id=group.group_id,
+                                    group_management_type=team_common.GroupManagementType.company_managed,
+                                    group_type=team_common.GroupType.team, is_member=False, is_owner=False,
+                                    same_team=True, member_count=len(group.members)),
+            is_inherited=False
+        )
+
+    # Routes
+
+    def get_current_account(self, caller, arg, request):
+        member = caller.member
+        return users.FullAccount(
+            account_id=member.account_id, name=self.name(member), email=member.email, email_verified=True,
+            disabled=False, locale='en', referral_link='https://db.tt/fake', is_paired=False,
+            account_type=users_common.AccountType.business, team_member_id=member.team_member_id,
+            root_info=common.TeamRootInfo(root_namespace_id=member.namespace.id,
+                                          home_namespace_id=member.namespace.id, home_path=f'/{member.display_name}')
+        )
+
+    def get_authenticated_admin(self, caller, arg, request):
+        return team.TokenGetAuthenticatedAdminResult(admin_profile=self.profile(self.tenant.admin))
+
+    def members_list(self, caller, arg, request):
+        def build(page, cursor, has_more):
+            return team.MembersListResult(members=page, cursor=cursor, has_more=has_more)
+        members = [team.TeamMemberInfo(profile=self.profile(member), role=team.AdminTier.member_only)
+                   for member in self.tenant.members]
+        return self.paginate(members, arg.limit, build)
+
+    def members_get_info(self, caller, arg, request):
+        result = list()
+        for selector in arg.members:
+            if selector.is_email():
+                member = next((m for m in self.tenant.members if m.email == selector.get_email()), None)
+                value = selector.get_email()
+            elif selector.is_team_member_id():
+                member = next((m for m in self.tenant.members if m.team_member_id == selector.get_team_member_id()),
+                              None)
+                value = selector.get_team_member_id()
+            else:
+                member, value = None, selector.get_external_id()
+            if member is None:
+                result.append(team.MembersGetInfoItemV2.id_not_found(value))
+            else:
+                result.append(team.MembersGetInfoItemV2.member_info(team.TeamMemberInfoV2(
+                    profile=self.profile(member), roles=[])))
+        return team.MembersGetInfoV2Result(members_info=result)
+
+    def team_folder_list(self, caller, arg, request):
+        def build(page, cursor, has_more):
+            return team.TeamFolderListResult(team_folders=page, cursor=cursor, has_more=has_more)
+        team_folders = [
+            team.TeamFolderMetadata(team_folder_id=namespace.id, name=namespace.name,
+                                    status=team.TeamFolderStatus.active, is_team_shared_dropbox=False,
+                                    sync_setting=files.SyncSetting.default, content_sync_settings=[])
+            for namespace in self.tenant.team_folders
+        ]
+        return self.paginate(team_folders, arg.limit, build)
+
+    def namespaces_list(self, caller, arg, request):
+        def build(page, cursor, has_more):
+            return team.TeamNamespacesListResult(namespaces=page, cursor=cursor, has_more=has_more)
+        namespaces = [
+            team.NamespaceMetadata(name=namespace.name, namespace_id=namespace.id,
+                                   namespace_type=getattr(team.NamespaceType, namespace.type),
+                                   team_member_id=namespace.owner.team_member_id
+                                   if namespace.owner and namespace.type != 'shared_folder' else None)
+            for namespace in self.tenant.namespaces.values()
+        ]
+        return self.paginate(namespaces, arg.limit, build)
+
+    def groups_members_list(self, caller, arg, request):
+        def build(page, cursor, has_more):
+            return team.GroupsMembersListResult(members=page, cursor=cursor, has_more=has_more)
+        group = next((g for g in self.tenant.groups if g.group_id == arg.group.get_group_id()), None)
+        if group is None:
+            raise FakeApiError(team.GroupSelectorError.group_not_found, 'group_not_found/')
+        members = [team.GroupMemberInfo(profile=self.profile(member, class_=team.MemberProfile),
+                                        access_type=team.GroupAccessType.member) for member in group.members]
+        return self.paginate(members, arg.limit, build)
+
+    def list_folder(self, caller, arg, request):
+        def build(page, cursor, has_more):
+            return files.ListFolderResult(entries=page, cursor=cursor, has_more=has_more)
+        node = self.resolve(caller, arg.path, files.ListFolderError.path(files.LookupError.not_found))
+        if not node.is_folder:
+            raise FakeApiError(files.ListFolderError.path(files.LookupError.not_folder), 'path/not_folder/')
+        base = self.path_in(node, caller.view)
+        # Listed by id from a namespace the caller doesn't mount, paths are relative to the namespace
+        base = base if base is not None else node.path()
+        entries = list()
+        self.collect(node, base, caller.view, entries, recursive=arg.recursive)
+        return self.paginate(entries, arg.limit, build)
+
+    def collect(self, node: FakeNode, base, view, entries, recursive=False):
+        children = node.target.root.children if node.target else node.children
+        for child in children:
+            path = f'{base}/{child.name}'
+            entries.append(self.metadata(child, view, path=path))
+            if recursive and child.is_folder:
+                self.collect(child, path, view, entries, recursive=True)
+
+    def list_revisions(self, caller, arg, request):
+        node = self.resolve(caller, arg.path, files.ListRevisionsError.path(files.LookupError.not_found))
+        path = self.path_in(node, caller.view)
+        revisions = [self.file_metadata(node, path, revision) for revision in range(min(node.revisions, arg.limit))]
+        return files.ListRevisionsResult(is_deleted=False, entries=revisions)
+
+    def download(self, caller, arg, request):
+        node = self.resolve(caller, arg.path, files.DownloadError.path(files.LookupError.not_found))
+        content = self.tenant.contents.get(node.id)
+        if content is None:
+            content = self.tenant.document(node)
+        return self.file_metadata(node, self.path_in(node, caller.view)), content
+
+    def list_folders(self, caller, arg, request):
+        def build(page, cursor, has_more):
+            return sharing.ListFoldersResult(entries=page, cursor=cursor if has_more else None)
+        policy = sharing.FolderPolicy(acl_update_policy=sharing.AclUpdatePolicy.editors,
+                                      shared_link_policy=sharing.SharedLinkPolicy.anyone)
+        entries = list()
+        for namespace in self.tenant.namespaces.values():
+            if namespace.type not in ('shared_folder', 'team_folder'):
+                continue
+            access = next((access for member, access in namespace.members if member is caller.member), None)
+            if access is None:
+                access = next((access for group, access in namespace.groups if caller.member in group.members),
+                              None)
+            if access is None:
+                continue
+            entries.append(sharing.SharedFolderMetadata(
+                access_type=ACCESS_LEVELS[access], is_inside_team_folder=False,
+                is_team_folder=namespace.type == 'team_folder', name=namespace.name, policy=policy,
+                preview_url=f'https://www.dropbox.com/scl/fo/{namespace.id}', shared_folder_id=namespace.id,
+                time_invited=datetime(2020, 1, 1)
+            ))
+        return self.paginate(entries, arg.limit, build)
+
+    def list_folder_members(self, caller, arg, request):
+        namespace = self.tenant.namespaces.get(arg.shared_folder_id)
+        if namespace is None:
+            raise FakeApiError(sharing.SharedFolderAccessError.invalid_id, 'invalid_id/')
+        return sharing.SharedFolderMembers(
+            users=[self.user_info(member, access) for member, access in namespace.members],
+            groups=[self.group_info(group, access) for group, access in namespace.groups],
+            invitees=[]
+        )
+
+    def list_file_members(self, caller, arg, request):
+        node = self.resolve(caller, arg.file,
+                            sharing.ListFileMembersError.access_error(sharing.SharingFileAccessError.invalid_file))
+        namespace = node.namespace
+        members = namespace.members if namespace.type != 'team_member_folder' else [(namespace.owner, 'owner')]
+        return sharing.SharedFileMembers(
+            users=[self.user_info(member, access, class_=sharing.UserFileMembershipInfo)
+                   for member, access in members],
+            groups=[self.group_info(group, access) for group, access in namespace.groups],
+            invitees=[]
+        )
+
+    def get_shared_link_metadata(self, caller, arg, request):
+        node = self.tenant.shared_links.get(self.tenant.link_token(arg.url))
+        if node is None:
+            raise FakeApiError(sharing.SharedLinkError.shared_link_not_found, 'shared_link_not_found/')
+        permissions = sharing.LinkPermissions(
+            can_revoke=False, visibility_policies=[], can_set_expiry=False, can_remove_expiry=False,
+            allow_download=True, can_allow_download=False, can_disallow_download=False, allow_comments=False,
+            team_restricts_comments=False
+        )
+        if node.is_folder:
+            return sharing.FolderLinkMetadata(url=node.url, name=node.name, link_permissions=permissions, id=node.id)
+        return sharing.FileLinkMetadata(
+            url=node.url, name=node.name, link_permissions=permissions, id=node.id, size=node.size,
+            client_modified=node.server_modified, server_modified=node.server_modified,
+            rev=f'000{node.content_hash[:9]}'
+        )
+
+    def get_events(self, caller, arg, request):
+        def build(page, cursor, has_more):
+            return team_log.GetTeamEventsResult(events=page, cursor=cursor, has_more=has_more)
+        events = list()
+        for event in self.tenant.events:
+            if arg.time and arg.time.start_time and event.timestamp < arg.time.start_time:
+                continue
+            if arg.time and arg.time.end_time and event.timestamp >= arg.time.end_time:
+                continue
+            if arg.category and arg.category._tag != event.event_category._tag:
+                continue
+            events.append(event)
+        return self.paginate(events, arg.limit, build)
@@ -0,0 +1,21 @@
+import os
+import tempfile
+
+# State files written between runs (session.ini, session/directory.json, session/changes_<scope>.json): they are
+# written to a temporary file of the same directory and renamed over the old one, a crash or a full disk never
+# leaves a truncated file behind and a reader sees either the old or the new content.
+
+
+def atomic_write(path, write, mode='w'):
+    # write(f) writes the content to the open temporary file
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    name = os.path.basename(path)
+    handle, temp_path = tempfile.mkstemp(dir=directory, prefix=f'{os.path.splitext(name)[0]}.', suffix='.tmp')
+    try:
+        with os.fdopen(handle, mode) as f:
+            write(f)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
@@ -0,0 +1,190 @@
+import json
+import threading
+import time
+from urllib.parse import urlparse
+
+from module.adapters import WrappingAdapter, install
+from module.tracing import NullTracer
+
+# Upper bounds (seconds) of the latency histogram buckets, the last one catches everything slower
+BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, float('inf'))
+# Responses the SDK retries: rate limits (honouring Retry-After) and server errors
+RETRIED_STATUS = {429, 500, 502, 503, 504}
+
+
+def endpoint_name(url):
+    # https://api.dropboxapi.com/2/files/list_folder/continue -> files_list_folder_continue (the SDK method)
+    path = urlparse(url).path.lstrip('/')
+    path = path[2:] if path.startswith('2/') else path
+    return path.replace('/', '_')
+
+
+class EndpointMetrics:
+    def __init__(self):
+        self.calls = 0
+        self.errors = dict()
+        self.retries = 0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.buckets = [0] * len(BUCKETS)
+
+    def record(self, status, seconds, sent, received):
+        self.calls += 1
+        if not status or status >= 400:
+            key = str(status) if status else 'connection'
+            self.errors[key] = self.errors.get(key, 0) + 1
+        if status in RETRIED_STATUS:
+            self.retries += 1
+        self.request_bytes += sent
+        self.response_bytes += received
+        self.seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        for index, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[index] += 1
+                break
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-quantile (never more than the slowest request)
+        if not self.calls:
+            return 0.0
+        rank = q * self.calls
+        count = 0
+        for bound, bucket in zip(BUCKETS, self.buckets):
+            count += bucket
+            if count >= rank:
+                return min(bound, self.max_seconds)
+        return self.max_seconds
+
+    def to_dict(self):
+        return {
+            'calls': self.calls,
+            'errors': dict(self.errors),
+            'retries': self.retries,
+            'request_bytes': self.request_bytes,
+            'response_bytes': self.response_bytes,
+            'seconds': round(self.seconds, 6),
+            'max_seconds': round(self.max_seconds, 6),
+            'p50_seconds': self.quantile(0.5),
+            'p95_seconds': self.quantile(0.95),
+            'buckets': {('+Inf' if bound == float('inf') else str(bound)): count
+                        for bound, count in zip(BUCKETS, self.buckets)},
+        }
+
+
+class ApiMetrics:
+    # Per endpoint counters of every request sent through an instrumented requests session. The session is shared
+    # by the Dropbox/DropboxTeam clients and the as_user/as_admin clients derived from them, so all of them are
+    # measured without touching the call sites.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.endpoints: dict[str, EndpointMetrics] = dict()
+        self.tic = time.time()
+        # Every request is also a span of the trace when the report is traced
+        self.tracer = NullTracer()
+        # Counters of the stages of a pipelined report (see module/pipeline.py), by stage
+        self.stages = dict()
+
+    def instrument(self, session):
+        return install(session, lambda adapter: adapter if isinstance(adapter, InstrumentedAdapter)
+                       else InstrumentedAdapter(adapter, self))
+
+    def record(self, endpoint, status, seconds, sent, received):
+        with self.lock:
+            if endpoint not in self.endpoints:
+                self.endpoints[endpoint] = EndpointMetrics()
+            self.endpoints[endpoint].record(status, seconds, sent, received)
+
+    def snapshot(self):
+        with self.lock:
+            return {endpoint: metrics.to_dict() for endpoint, metrics in self.endpoints.items()}
+
+    @property
+    def total_calls(self):
+        with self.lock:
+            return sum(metrics.calls for metrics in self.endpoints.values())
+
+    def to_json(self):
+        data = {
+            'started_at': self.tic,
+            'elapsed_seconds': round(time.time() - self.tic, 3),
+            'endpoints': self.snapshot(),
+        }
+        if self.stages:
+            data['stages'] = self.stages
+        return json.dumps(data, indent=2)
+
+    def to_prometheus(self):
+        endpoints = self.snapshot()
+        lines = list()
+
+        def metric(name, type_, help_, values):
+            lines.append(f'# HELP {name} {help_}')
+            lines.append(f'# TYPE {name} {type_}')
+            lines.extend(values)
+
+        metric('dropbox_api_requests_total', 'counter', 'Requests sent to the Dropbox API.',
+               [f'dropbox_api_requests_total{{endpoint="{e}"}} {m["calls"]}' for e, m in endpoints.items()])
+        metric('dropbox_api_errors_total', 'counter', 'Error responses (HTTP status) and connection errors.',
+               [f'dropbox_api_errors_total{{endpoint="{e}",status="{status}"}} {count}'
+                for e, m in endpoints.items() for status, count in m['errors'].items()])
+        metric('dropbox_api_retries_total', 'counter', 'Responses retried by the SDK (429 and 5xx).',
+               [f'dropbox_api_retries_total{{endpoint="{e}"}} {m["retries"]}' for e, m in endpoints.items()])
+        metric('dropbox_api_request_bytes_total', 'counter', 'Bytes sent (body and Dropbox-API-Arg).',
+               [f'dropbox_api_request_bytes_total{{endpoint="{e}"}} {m["request_bytes"]}'
+                for e, m in endpoints.items()])
+        metric('dropbox_api_response_bytes_total', 'counter', 'Bytes received.',
+               [f'dropbox_api_response_bytes_total{{endpoint="{e}"}} {m["response_bytes"]}'
+                for e, m in endpoints.items()])
+        values = list()
+        for e, m in endpoints.items():
+            count = 0
+            for bound, bucket in m['buckets'].items():
+                count += bucket
+                values.append(f'dropbox_api_request_duration_seconds_bucket{{endpoint="{e}",le="{bound}"}} {count}')
+            values.append(f'dropbox_api_request_duration_seconds_sum{{endpoint="{e}"}} {m["seconds"]}')
+            values.append(f'dropbox_api_request_duration_seconds_count{{endpoint="{e}"}} {m["calls"]}')
+        metric('dropbox_api_request_duration_seconds', 'histogram', 'Latency of the requests.', values)
+        if self.stages:
+            for key, type_, help_ in [
+                ('items', 'counter', 'Items done by the stage.'),
+                ('busy_seconds', 'counter', 'Seconds the workers of the stage spent working.'),
+                ('idle_seconds', 'counter', 'Seconds the workers of the stage waited for an item.'),
+                ('blocked_seconds', 'counter', 'Seconds the workers of the stage waited for room in the next one.'),
+                ('utilisation', 'gauge', 'Share of the time the workers of the stage were working.'),
+            ]:
+                name = f'report_stage_{key}' + ('_total' if type_ == 'counter' else '')
+                metric(name, type_, help_, [f'{name}{{stage="{stage}"}} {m[key]}' for stage, m in self.stages.items()])
+        return '\n'.join(lines) + '\n'
+
+    def dump(self, path, format_='json'):
+        with open(path, 'w') as f:
+            f.write(self.to_prometheus() if format_ == 'prometheus' else self.to_json())
+
+
+class InstrumentedAdapter(WrappingAdapter):
+    # Transport adapter timing every request of the adapter it wraps
+    def __init__(self, adapter, metrics: ApiMetrics):
+        WrappingAdapter.__init__(self, adapter)
+        self.metrics = metrics
+
+    def send(self, request, **kwargs):
+        endpoint = endpoint_name(request.url)
+        sent = len(request.body or b'') + len(request.headers.get('Dropbox-API-Arg', ''))
+        with self.metrics.tracer.span(endpoint) as span:
+            tic = time.perf_counter()
+            try:
+                response = self.adapter.send(request, **kwargs)
+            except Exception:
+                self.metrics.record(endpoint, 0, time.perf_counter() - tic, sent, 0)
+                raise
+            if kwargs.get('stream'):
+                # Downloads are streamed by the caller, count the announced size
+                received = int(response.headers.get('Content-Length') or 0)
+            else:
+                received = len(response.content)
+            self.metrics.record(endpoint, response.status_code, time.perf_counter() - tic, sent, received)
+            span.set(status=response.status_code)
+        return response
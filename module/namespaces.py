@@ -0,0 +1,54 @@
+from threading import Lock
+
+from dropbox.sharing import SharedFolderMembers
+
+# Shared namespaces (shared folders, team folders) of a report. A shared folder is mounted in the space of every
+# member it is shared with: its members are asked once for the whole team and the folder is traversed once, by the
+# first space that claims it (the team folder traversal or the space of its owner). Every other mount is skipped
+# without asking for its members nor listing it. Whether a member owns a shared folder comes from the shared folders
+# of the member, listed once, rather than from the members of every folder.
+
+
+class NamespaceRegistry:
+    def __init__(self):
+        self.lock = Lock()
+        # Shared folder id -> SharedFolderMembers
+        self.acls = dict()
+        # Namespace id -> what claimed it (team folder name, owner account id)
+        self.claims = dict()
+        # Account id -> ids of the shared folders it owns
+        self.owned_folders = dict()
+
+    def members(self, client, shared_folder_id) -> SharedFolderMembers:
+        acl = self.acls.get(shared_folder_id)
+        if acl is None:
+            acl = client.sharing_list_folder_members(shared_folder_id=shared_folder_id)
+            self.acls[shared_folder_id] = acl
+        return acl
+
+    def owned(self, client, account_id):
+        # Listed once per member, with its access type to each of its shared folders
+        owned = self.owned_folders.get(account_id)
+        if owned is None:
+            owned = set()
+            result = client.sharing_list_folders()
+            owned.update(entry.shared_folder_id for entry in result.entries if entry.access_type.is_owner())
+            while result.cursor:
+                result = client.sharing_list_folders_continue(cursor=result.cursor)
+                owned.update(entry.shared_folder_id for entry in result.entries if entry.access_type.is_owner())
+            self.owned_folders[account_id] = owned
+        return owned
+
+    def is_owner(self, client, shared_folder_id, account_id):
+        return shared_folder_id in self.owned(client, account_id)
+
+    def claim(self, namespace_id, by=None):
+        # False when the namespace is already traversed by another space
+        with self.lock:
+            if namespace_id in self.claims:
+                return False
+            self.claims[namespace_id] = by
+            return True
+
+    def claimed(self, namespace_id):
+        return namespace_id in self.claims
@@ -0,0 +1,409 @@
+import csv
+import heapq
+import os
+import pickle
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime
+from operator import itemgetter
+from queue import Queue, Empty
+from threading import Thread
+
+
+class Schema:
+    # Column types: 'string', 'int64', 'timestamp' and 'list' (list of strings)
+    def __init__(self, columns, date_format='%Y-%m-%d'):
+        self.columns = columns
+        self.date_format = date_format
+
+    @property
+    def header(self):
+        return [name for name, _ in self.columns]
+
+    @property
+    def types(self):
+        return [type_ for _, type_ in self.columns]
+
+
+FOLDER_SCHEMA = Schema([
+    ('Type', 'string'), ('Name Space', 'string'), ('Level', 'int64'), ('Path', 'string'), ('Size (byte)', 'int64'),
+    ('subFolder (Non-Recursive)', 'int64'), ('subFolder (Recursive)', 'int64'),
+    ('Created Date', 'timestamp'), ('Last Modified', 'timestamp'), ('Files', 'int64'),
+    ('Members', 'list'), ('Groups', 'list')
+])
+OWNER_SCHEMA = Schema(FOLDER_SCHEMA.columns + [('Owned by', 'string'), ('Owner', 'string')])
+ALL_MEMBER_SCHEMA = Schema([
+    ('Member', 'string'), ('Email', 'string'), ('Private Folder', 'int64'), ('Shared Folder', 'int64')
+])
+MEMBER_SCHEMA = Schema([('Type', 'string'), ('Path', 'string'), ('Size', 'int64'), ('Level', 'int64')])
+FILE_SCHEMA = Schema([
+    ('Name', 'string'), ('Type', 'string'), ('Size', 'int64'), ('Path', 'string'), ('Path Level', 'int64'),
+    ('Members', 'list'), ('Groups', 'list'), ('Created Date', 'timestamp'), ('Last Modified', 'timestamp'),
+    ('Duplicate', 'string'), ('Embedded Files', 'list'), ('Linked URL', 'string'), ('Linked Type', 'string'),
+    ('Linked Name', 'string'), ('Linked Size', 'int64')
+], date_format='%m/%d/%Y')
+DIFF_SCHEMA = Schema([
+    ('Change', 'string'), ('Type', 'string'), ('Name Space', 'string'), ('Level', 'int64'), ('Path', 'string'),
+    ('Size (old)', 'int64'), ('Size (new)', 'int64'), ('Size delta', 'int64'), ('Files (old)', 'int64'),
+    ('Files (new)', 'int64'), ('Files delta', 'int64'), ('Changed columns', 'list')
+])
+
+
+class CsvSink:
+    def __init__(self, path, schema: Schema):
+        self.schema = schema
+        self.file = open(path, mode='w', encoding='utf-8', newline='')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(schema.header)
+
+    def format(self, row):
+        output = list()
+        for value, type_ in zip(row, self.schema.types):
+            if value is None:
+                value = ''
+            elif type_ == 'list':
+                value = ', '.join(value)
+            elif type_ == 'timestamp' and isinstance(value, datetime):
+                value = f'{value:{self.schema.date_format}}'
+            output.append(value)
+        return output
+
+    def write(self, row):
+        self.writer.writerow(self.format(row))
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class ArrowBatchSink(ABC):
+    # Rows are collected column by column and written as one record batch (Parquet row group) every
+    # `row_group_size` rows, so memory stays bounded whatever the size of the report.
+    def __init__(self, path, schema: Schema, row_group_size=100000):
+        try:
+            import pyarrow
+        except ImportError as e:
+            raise ImportError(f"pyarrow is required to write '{path}' (pip install pyarrow)") from e
+        self.pa = pyarrow
+        self.schema = schema
+        self.row_group_size = row_group_size
+        self.arrow_schema = pyarrow.schema([(name, self.arrow_type(type_)) for name, type_ in schema.columns])
+        self.columns = [list() for _ in schema.columns]
+        self.writer = self.open_writer(path)
+
+    def arrow_type(self, type_):
+        return {
+            'string': self.pa.string(),
+            'int64': self.pa.int64(),
+            'timestamp': self.pa.timestamp('s'),
+            'list': self.pa.list_(self.pa.string()),
+        }[type_]
+
+    @abstractmethod
+    def open_writer(self, path):
+        pass
+
+    @staticmethod
+    def convert(value, type_):
+        if value is None:
+            return None
+        if type_ == 'int64':
+            # e.g. 'no access' in the linked size of a file
+            return value if isinstance(value, int) else None
+        if type_ == 'timestamp':
+            return value if isinstance(value, datetime) else None
+        if type_ == 'list':
+            return list(value)
+        return str(value)
+
+    def write(self, row):
+        for index, type_ in enumerate(self.schema.types):
+            # Short rows (e.g. files without links) leave the trailing columns empty
+            value = row[index] if index < len(row) else None
+            self.columns[index].append(self.convert(value, type_))
+        if len(self.columns[0]) >= self.row_group_size:
+            self.write_batch()
+
+    def write_batch(self):
+        if not self.columns[0]:
+            return
+        batch = self.pa.RecordBatch.from_arrays(
+            [self.pa.array(column, type=field.type) for column, field in zip(self.columns, self.arrow_schema)],
+            schema=self.arrow_schema
+        )
+        self.writer.write_batch(batch)
+        self.columns = [list() for _ in self.schema.columns]
+
+    def close(self):
+        self.write_batch()
+        self.writer.close()
+
+
+class ParquetSink(ArrowBatchSink):
+    def open_writer(self, path):
+        import pyarrow.parquet
+        return pyarrow.parquet.ParquetWriter(path, self.arrow_schema, compression='zstd')
+
+
+class ArrowSink(ArrowBatchSink):
+    def open_writer(self, path):
+        import pyarrow.ipc
+        return pyarrow.ipc.new_file(path, self.arrow_schema)
+
+
+class XlsxSink:
+    # openpyxl write-only workbook: rows are streamed to disk as they are appended, a new sheet is started when
+    # the current one reaches the row limit of Excel.
+    MAX_ROWS = 1048576
+
+    def __init__(self, path, schema: Schema, max_rows=MAX_ROWS):
+        from openpyxl import Workbook
+        self.path = path
+        self.schema = schema
+        self.max_rows = max_rows
+        self.wb = Workbook(write_only=True)
+        self.ws = None
+        self.rows = 0
+        self.add_sheet()
+
+    def add_sheet(self):
+        self.ws = self.wb.create_sheet(title=f'Report {len(self.wb.worksheets) + 1}')
+        self.ws.append(self.schema.header)
+        self.rows = 1
+
+    def format(self, row):
+        output = list()
+        for value, type_ in zip(row, self.schema.types):
+            if type_ == 'list' and value is not None:
+                value = ', '.join(value)
+            output.append(value)
+        return output
+
+    def write(self, row):
+        if self.rows >= self.max_rows:
+            self.add_sheet()
+        self.ws.append(self.format(row))
+        self.rows += 1
+
+    def close(self):
+        self.wb.save(self.path)
+
+
+OUTPUT_FORMATS = {
+    'csv': CsvSink,
+    'parquet': ParquetSink,
+    'arrow': ArrowSink,
+    'xlsx': XlsxSink,
+}
+
+
+class OrderedRowWriter:
+    # Folder rows are produced when a folder is finished (post-order) but the report has to read top-down
+    # (pre-order). Every row carries the pre-order key of its folder/file, rows are kept in memory and spilled
+    # to sorted runs in `tmp_dir` once the buffer is full, then the runs are merged straight into the output sink.
+    def __init__(self, sink, buffer_rows=100000, tmp_dir='tmp'):
+        self.sink = sink
+        self.buffer_rows = buffer_rows
+        self.tmp_dir = tmp_dir
+        self.buffer = list()
+        self.runs = list()
+        self.closed = False
+
+    def write(self, key, row):
+        self.buffer.append((tuple(key), row))
+        if len(self.buffer) >= self.buffer_rows:
+            self.spill()
+
+    def write_many(self, records):
+        for key, row in records:
+            self.write(key, row)
+
+    def flush(self):
+        pass
+
+    def spill(self):
+        self.buffer.sort(key=itemgetter(0))
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        with tempfile.NamedTemporaryFile(mode='wb', dir=self.tmp_dir, suffix='.run', delete=False) as run:
+            for item in self.buffer:
+                pickle.dump(item, run, protocol=pickle.HIGHEST_PROTOCOL)
+        self.runs.append(run.name)
+        self.buffer = list()
+
+    @staticmethod
+    def read_run(path):
+        with open(path, mode='rb') as run:
+            while True:
+                try:
+                    yield pickle.load(run)
+                except EOFError:
+                    return
+
+    def rows(self):
+        self.buffer.sort(key=itemgetter(0))
+        sources = [self.read_run(run) for run in self.runs]
+        sources.append(iter(self.buffer))
+        for _, row in heapq.merge(*sources, key=itemgetter(0)):
+            yield row
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        for row in self.rows():
+            self.sink.write(row)
+        self.sink.close()
+        self.discard()
+
+    def discard(self):
+        for run in self.runs:
+            os.remove(run)
+        self.runs = list()
+        self.buffer = list()
+
+
+class StreamRowWriter:
+    # Rows written in the order they come (the keys are ignored), for the reports whose rows don't depend on each
+    # other (all_member_report)
+    def __init__(self, sink):
+        self.sink = sink
+
+    def write_many(self, records):
+        for _, row in records:
+            self.sink.write(row)
+
+    def flush(self):
+        if hasattr(self.sink, 'flush'):
+            self.sink.flush()
+
+    def close(self):
+        self.sink.close()
+
+
+class ConsoleTable:
+    # Same look as the PrettyTable of the member and file reports (hrules on), but every column keeps the width of
+    # its field name (the names are padded to the wanted width) so that a row is rendered on its own, without
+    # re-rendering the whole table. Longer values are cut.
+    def __init__(self):
+        self.field_names = list()
+        self.align = dict()
+        self.hrules = 1
+
+    def rule(self):
+        return '+' + '+'.join('-' * (len(name) + 2) for name in self.field_names) + '+'
+
+    def line(self, values):
+        cells = list()
+        for name, value in zip(self.field_names, values):
+            value = str(value)[:len(name)]
+            align = self.align.get(name, 'c')
+            if align == 'l':
+                value = value.ljust(len(name))
+            elif align == 'r':
+                value = value.rjust(len(name))
+            else:
+                value = value.center(len(name))
+            cells.append(f' {value} ')
+        return '|' + '|'.join(cells) + '|'
+
+    def row(self, values):
+        return f'{self.line(values)}\n{self.rule()}' if self.hrules else self.line(values)
+
+    def __str__(self):
+        return f'{self.rule()}\n{self.line(self.field_names)}\n{self.rule()}'
+
+
+class TableSink:
+    # Console output of the member and file reports, every row is printed with its rule as it comes
+    def __init__(self, display: ConsoleTable):
+        self.display = display
+
+    def write_many(self, records):
+        print('\r', end='')
+        print("\n".join(self.display.row(row) for row, in records))
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class QueuedSink:
+    def __init__(self, writer, sink):
+        self.writer = writer
+        self.sink = sink
+
+    def write(self, *record):
+        self.writer.put(self.sink, record)
+
+
+class QueuedWriter(Thread):
+    # Every row of a report goes through this thread: producers (traversal and download threads) only enqueue,
+    # the writer drains the queue in batches, hands each sink its records in one call and flushes the sinks every
+    # `flush_interval` seconds, so rows are never interleaved and the sinks need no locking.
+    STOP = object()
+
+    def __init__(self, flush_interval=1.0, batch_size=10000):
+        Thread.__init__(self, daemon=True)
+        self.queue = Queue()
+        self.sinks = list()
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.error = None
+        self.closed = False
+
+    def add_sink(self, sink) -> QueuedSink:
+        self.sinks.append(sink)
+        return QueuedSink(writer=self, sink=sink)
+
+    def put(self, sink, record):
+        self.queue.put((sink, record))
+
+    def take_batch(self):
+        batch = list()
+        try:
+            batch.append(self.queue.get(timeout=self.flush_interval))
+            while len(batch) < self.batch_size:
+                batch.append(self.queue.get_nowait())
+        except Empty:
+            pass
+        return batch
+
+    def run(self):
+        last_flush = time.time()
+        running = True
+        while running:
+            batch = self.take_batch()
+            records = dict()
+            for item in batch:
+                if item is self.STOP:
+                    running = False
+                    continue
+                sink, record = item
+                records.setdefault(sink, list()).append(record)
+            try:
+                for sink in records:
+                    sink.write_many(records[sink])
+                if not running or time.time() - last_flush >= self.flush_interval:
+                    for sink in self.sinks:
+                        sink.flush()
+                    last_flush = time.time()
+            except Exception as e:
+                self.error = e
+                return
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        if self.is_alive():
+            self.queue.put(self.STOP)
+            self.join()
+        for sink in self.sinks:
+            sink.close()
+        if self.error:
+            raise self.error
@@ -0,0 +1,148 @@
+import threading
+import time
+from queue import Queue
+
+from module.tracing import NullTracer
+
+# Stages of the file report joined by bounded queues: every stage has its own pool of worker threads taking items
+# from its queue, a worker handing an item to the next stage waits while that queue is full (backpressure), so the
+# slowest stage sets the pace and at most `queue_size` items wait in front of each stage. The first stage is fed by
+# the caller thread. A stage counts its items and the seconds its workers spent working, waiting for an item (idle)
+# and waiting for room in the next queue (blocked): the stage with the highest utilisation is the bottleneck.
+
+STOP = object()
+
+
+class Stage:
+    def __init__(self, name, handler=None, workers=1, queue_size=100):
+        # handler(item) returns the name of the next stage of the item, None when it is done. A stage without
+        # handler is fed by the caller thread
+        self.name = name
+        self.handler = handler
+        self.workers = workers if handler else 0
+        self.queue = Queue(maxsize=max(queue_size, 1))
+        self.threads = list()
+        self.lock = threading.Lock()
+        self.items = 0
+        self.errors = 0
+        self.busy = 0.0
+        self.idle = 0.0
+        self.blocked = 0.0
+        self.max_queue = 0
+        self.tic = None
+        self.toc = None
+
+    def add(self, items=0, busy=0.0, idle=0.0, blocked=0.0, errors=0):
+        with self.lock:
+            self.items += items
+            self.busy += busy
+            self.idle += idle
+            self.blocked += blocked
+            self.errors += errors
+
+    def to_dict(self):
+        elapsed = (self.toc or time.perf_counter()) - self.tic if self.tic else 0
+        workers = max(self.workers, 1)
+        return {
+            'workers': workers,
+            'items': self.items,
+            'errors': self.errors,
+            'busy_seconds': round(self.busy, 3),
+            'idle_seconds': round(self.idle, 3),
+            'blocked_seconds': round(self.blocked, 3),
+            'max_queue': self.max_queue,
+            'items_per_second': round(self.items / elapsed, 2) if elapsed else 0,
+            # Items per second of the workers when never idle nor blocked
+            'capacity_per_second': round(self.items * workers / self.busy, 2) if self.busy else 0,
+            'utilisation': round(self.busy / (elapsed * workers), 3) if elapsed else 0,
+        }
+
+
+class Pipeline:
+    def __init__(self, tracer=None):
+        self.tracer = tracer or NullTracer()
+        self.stages: dict[str, Stage] = dict()
+        self.error = None
+        self.closed = False
+
+    def add_stage(self, name, handler=None, workers=1, queue_size=100):
+        self.stages[name] = Stage(name, handler, workers=workers, queue_size=queue_size)
+        return self.stages[name]
+
+    def start(self):
+        for stage in self.stages.values():
+            stage.tic = time.perf_counter()
+            for index in range(stage.workers):
+                thread = threading.Thread(target=self.run, args=(stage,), name=f'{stage.name}-{index + 1}',
+                                          daemon=True)
+                stage.threads.append(thread)
+                thread.start()
+
+    def put(self, name, item, source=None):
+        # `source` is the stage handing the item over, the time waiting for room is counted as blocked in it
+        stage = self.stages[name]
+        tic = time.perf_counter()
+        stage.queue.put(item)
+        if source:
+            self.stages[source].add(blocked=time.perf_counter() - tic)
+        depth = stage.queue.qsize()
+        if depth > stage.max_queue:
+            stage.max_queue = depth
+
+    def feed(self, name, item, source):
+        # An item of the stage fed by the caller thread, which stops once a stage failed
+        if self.error:
+            raise self.error
+        self.stages[source].add(items=1)
+        self.put(name, item, source=source)
+
+    def run(self, stage: Stage):
+        while True:
+            tic = time.perf_counter()
+            item = stage.queue.get()
+            toc = time.perf_counter()
+            if item is STOP:
+                return
+            if self.error:
+                # A stage failed, the items left are drained so that no stage waits for room
+                stage.add(idle=toc - tic)
+                continue
+            try:
+                with self.tracer.span(stage.name, parent=getattr(item, 'span', None),
+                                      path=getattr(item, 'path', None)):
+                    target = stage.handler(item)
+            except Exception as e:
+                self.error = self.error or e
+                stage.add(idle=toc - tic, busy=time.perf_counter() - toc, errors=1)
+                continue
+            stage.add(items=1, idle=toc - tic, busy=time.perf_counter() - toc)
+            if target and not self.error:
+                self.put(target, item, source=stage.name)
+
+    def close(self):
+        # Stages are stopped in their order, every item of a stage is handed over before the next one stops
+        if self.closed:
+            return
+        self.closed = True
+        for stage in self.stages.values():
+            for _ in stage.threads:
+                stage.queue.put(STOP)
+            for thread in stage.threads:
+                thread.join()
+            stage.toc = time.perf_counter()
+            if not stage.workers:
+                # The caller thread was busy for the whole stage but the time it waited for room
+                stage.busy = stage.toc - stage.tic - stage.blocked
+        if self.error:
+            raise self.error
+
+    def snapshot(self):
+        return {name: stage.to_dict() for name, stage in self.stages.items()}
+
+    def summary(self):
+        lines = list()
+        for name, stage in self.snapshot().items():
+            lines.append(f"{name:<9} {stage['workers']:>3} workers {stage['items']:>8,} items "
+                         f"{stage['items_per_second']:>8,.1f}/s utilisation {stage['utilisation']:>6.1%} "
+                         f"blocked {stage['blocked_seconds']:>7,.1f}s max queue {stage['max_queue']:,}")
+        return lines
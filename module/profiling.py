@@ -0,0 +1,159 @@
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+# Profiling of a whole report from the command line (see the -profile and -memory options of the entry scripts),
+# the reports are written in output/ next to the report itself:
+# - cprofile: deterministic profile of the main thread (the traversal), <name>.profile.txt with the top functions
+#   by cumulative and own time, and <name>.prof for pstats/snakeviz
+# - sample: every thread (traversal, writer, download threads) sampled every `interval` seconds,
+#   <name>.samples.txt with the top functions and <name>.stacks.txt with the collapsed stacks for flamegraph.pl
+# - memory: tracemalloc snapshot every `memory_interval` seconds, <name>.memory.txt with the top allocations and
+#   what grew since the previous snapshot
+
+PROFILE_MODES = ['cprofile', 'sample']
+
+
+def frame_name(frame):
+    code = frame.f_code
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+
+class Sampler(threading.Thread):
+    def __init__(self, interval):
+        threading.Thread.__init__(self, daemon=True)
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.samples = 0
+        self.own = Counter()
+        self.total = Counter()
+        self.stacks = Counter()
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == self.ident:
+                continue
+            stack = list()
+            while frame is not None:
+                stack.append(frame_name(frame))
+                frame = frame.f_back
+            self.samples += 1
+            self.own[stack[0]] += 1
+            # A recursive function (get_path...) counts once per sample in its total
+            self.total.update(set(stack))
+            self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self.stop_event.set()
+        self.join()
+
+    def write(self, path, stacks_path, top, elapsed):
+        with open(path, 'w') as f:
+            f.write(f'{self.samples:,} samples (all threads) every {self.interval * 1000:g} ms '
+                    f'over {elapsed:,.1f}s\n')
+            for title, counter in [('Own time', self.own), ('Total time', self.total)]:
+                f.write(f'\n{title}\n{"Samples":>10} {"%":>6}  Function\n')
+                for name, count in counter.most_common(top):
+                    f.write(f'{count:>10,} {100 * count / max(self.samples, 1):>6.1f}  {name}\n')
+        with open(stacks_path, 'w') as f:
+            for stack, count in self.stacks.items():
+                f.write(f'{stack} {count}\n')
+
+
+class MemoryTracker(threading.Thread):
+    def __init__(self, path, interval, top):
+        threading.Thread.__init__(self, daemon=True)
+        self.path = path
+        self.interval = interval
+        self.top = top
+        self.stop_event = threading.Event()
+        self.tic = time.time()
+        self.previous = None
+        self.count = 0
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            self.snapshot()
+
+    def snapshot(self):
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ])
+        current, peak = tracemalloc.get_traced_memory()
+        self.count += 1
+        with open(self.path, 'a') as f:
+            f.write(f'Snapshot {self.count} at {time.time() - self.tic:,.1f}s: current {current / 1024 / 1024:,.1f} '
+                    f'MiB, peak {peak / 1024 / 1024:,.1f} MiB\n')
+            f.write(f'Top {self.top} allocations\n')
+            for stat in snapshot.statistics('lineno')[:self.top]:
+                f.write(f'  {stat}\n')
+            if self.previous:
+                f.write(f'Top {self.top} growths since snapshot {self.count - 1}\n')
+                for stat in snapshot.compare_to(self.previous, 'lineno')[:self.top]:
+                    f.write(f'  {stat}\n')
+            f.write('\n')
+        self.previous = snapshot
+
+    def stop(self):
+        self.stop_event.set()
+        self.join()
+        self.snapshot()
+
+
+class Profiler:
+    # Context manager around a report, does nothing unless a profile mode or a memory interval is given. Reports
+    # are also written when the report is interrupted (Ctrl+C).
+    def __init__(self, output_name, mode=None, interval=0.01, memory_interval=0, top=30, frames=10):
+        self.output_name = output_name
+        self.mode = mode
+        self.interval = interval
+        self.memory_interval = memory_interval
+        self.top = top
+        self.frames = frames
+        self.profile = None
+        self.sampler = None
+        self.memory = None
+        self.tic = None
+
+    def __enter__(self):
+        self.tic = time.time()
+        if self.memory_interval:
+            tracemalloc.start(self.frames)
+            open(f'output/{self.output_name}.memory.txt', 'w').close()
+            self.memory = MemoryTracker(f'output/{self.output_name}.memory.txt', self.memory_interval, self.top)
+            self.memory.start()
+        if self.mode == 'cprofile':
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        elif self.mode == 'sample':
+            self.sampler = Sampler(self.interval)
+            self.sampler.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        elapsed = time.time() - self.tic
+        if self.profile:
+            self.profile.disable()
+            self.profile.dump_stats(f'output/{self.output_name}.prof')
+            with open(f'output/{self.output_name}.profile.txt', 'w') as f:
+                stats = pstats.Stats(self.profile, stream=f)
+                stats.sort_stats('cumulative').print_stats(self.top)
+                stats.sort_stats('tottime').print_stats(self.top)
+        if self.sampler:
+            self.sampler.stop()
+            self.sampler.write(f'output/{self.output_name}.samples.txt', f'output/{self.output_name}.stacks.txt',
+                               self.top, elapsed)
+        if self.memory:
+            self.memory.stop()
+            tracemalloc.stop()
+        return False
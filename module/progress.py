@@ -0,0 +1,59 @@
+import json
+import sys
+import time
+from datetime import datetime
+
+# Progress of a report, shown by LiveProcess either as the rich live table (live) or, under cron and in containers,
+# as a single-line JSON record every few seconds on stderr (json). Both read the same counters: the totals kept up
+# to date by Folder.add_file/add_folder on the root, the API calls of ApiMetrics and the spaces (team folders,
+# namespaces, members) of the report, which give the ETA.
+
+PROGRESS_MODES = ['live', 'json']
+
+
+class Progress:
+    def __init__(self):
+        self.spaces = 0
+        self.spaces_done = 0
+        self.last = None
+
+    def add_spaces(self, count):
+        self.spaces += count
+
+    def space_done(self):
+        self.spaces_done += 1
+
+    def eta(self, elapsed):
+        if not self.spaces:
+            return None
+        if self.spaces_done >= self.spaces:
+            return 0
+        if not self.spaces_done:
+            return None
+        return round(elapsed / self.spaces_done * (self.spaces - self.spaces_done))
+
+    def record(self, status, tic, files, folders, size, calls):
+        # Rates are over the time since the previous record
+        now = time.time()
+        last_time, last_files, last_size, last_calls = self.last or (tic, 0, 0, 0)
+        interval = max(now - last_time, 1e-3)
+        self.last = (now, files, size, calls)
+        return {
+            'time': f'{datetime.now():%Y-%m-%dT%H:%M:%S}',
+            'status': status,
+            'elapsed': round(now - tic, 1),
+            'files': files,
+            'folders': folders,
+            'bytes': size,
+            'files_per_second': round((files - last_files) / interval, 1),
+            'bytes_per_second': round((size - last_size) / interval),
+            'api_calls': calls,
+            'api_calls_per_second': round((calls - last_calls) / interval, 1),
+            'spaces': self.spaces,
+            'spaces_done': self.spaces_done,
+            'eta': self.eta(now - tic),
+        }
+
+    @staticmethod
+    def emit(record):
+        print(json.dumps(record), file=sys.stderr, flush=True)
@@ -0,0 +1,50 @@
+import threading
+import time
+
+from module.adapters import WrappingAdapter, install
+
+
+class RateLimiter:
+    # Shared by every thread of a report through the session: a 429 answered to one request pauses every request
+    # for its Retry-After, instead of each thread running into the limit on its own. The SDK still retries the
+    # limited request itself.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.resume_at = 0.0
+        self.pauses = 0
+
+    def wait(self):
+        delay = self.resume_at - time.time()
+        if delay > 0:
+            time.sleep(delay)
+
+    def limited(self, retry_after):
+        with self.lock:
+            self.resume_at = max(self.resume_at, time.time() + retry_after)
+            self.pauses += 1
+
+    def install(self, session):
+        return install(session, self.wrap)
+
+    def wrap(self, adapter):
+        if isinstance(adapter, RateLimitAdapter):
+            adapter.limiter = self
+            return adapter
+        return RateLimitAdapter(adapter, self)
+
+
+class RateLimitAdapter(WrappingAdapter):
+    def __init__(self, adapter, limiter: RateLimiter):
+        WrappingAdapter.__init__(self, adapter)
+        self.limiter = limiter
+
+    def send(self, request, **kwargs):
+        self.limiter.wait()
+        response = self.adapter.send(request, **kwargs)
+        if response.status_code == 429:
+            try:
+                retry_after = float(response.headers.get('Retry-After', 1))
+            except ValueError:
+                retry_after = 1
+            self.limiter.limited(retry_after)
+        return response
@@ -0,0 +1,310 @@
+import io
+import re
+import struct
+import zlib
+from xml.etree import ElementTree
+
+# Embedded files and Dropbox links of a docx or xlsx read through ranged downloads (Range header of files/download)
+# instead of the whole document. The end of the file holds the end of central directory record and, for an Office
+# document, the central directory: the names of the parts (the embedded files are listed from them) and where each
+# one starts. Only the parts holding the text and the hyperlinks are then read, neighbouring ones in one request, so
+# the media and embedded objects, most of the bytes of a large document, are never transferred. Every range is read
+# at the revision listed by the report. ZIP64, encrypted or not deflated archives and documents whose text parts are
+# most of the file raise RemoteZipError, the caller downloads the whole document instead.
+
+EOCD = b'PK\x05\x06'
+CENTRAL = b'PK\x01\x02'
+LOCAL = b'PK\x03\x04'
+# End of the file read first, the central directory of a document is usually in it. The end of central directory
+# record (22 bytes) with the longest comment is read when it is not
+TAIL_BYTES = 8192
+MAX_TAIL_BYTES = 22 + 65535
+# Parts closer than that are read in a single request
+MERGE_GAP = 65536
+# Above that share of the file read in ranges, the whole document is downloaded
+MAX_RANGE_RATIO = 0.5
+# Smaller documents are downloaded whole, the requests of a range read cost more than their bytes
+RANGE_MIN_SIZE = 1024 * 1024
+
+W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+S = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+R = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+PR = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+HYPERLINK = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/hyperlink'
+EMBEDDINGS = ('word/embeddings/', 'xl/embeddings/')
+SHEET_PART = re.compile(r'^xl/worksheets/[^/]+\.xml$')
+SHEET_RELS_PART = re.compile(r'^xl/worksheets/_rels/[^/]+\.xml\.rels$')
+
+
+class RemoteZipError(Exception):
+    pass
+
+
+class ZipEntry:
+    def __init__(self, name, offset, compressed, size, method, flags):
+        self.name = name
+        self.offset = offset
+        self.compressed = compressed
+        self.size = size
+        self.method = method
+        self.flags = flags
+        # Offset of the next entry (or of the central directory), the local record ends before it
+        self.end = None
+
+
+class RemoteZip:
+    def __init__(self, client, path, size, rev=None):
+        self.client = client
+        self.path = path
+        self.size = size
+        self.rev = rev
+        self.entries: dict[str, ZipEntry] = dict()
+        self.data = None
+        self.requests = 0
+        self.bytes = 0
+
+    def request(self, range_):
+        # The Range header is added to a clone of the client, which keeps its member and root headers. Returns the
+        # bytes, the size of the file and whether the whole file came
+        headers = dict(self.client._headers or {}, Range=f'bytes={range_}')
+        _, response = self.client.clone(headers=headers).files_download(path=self.path, rev=self.rev)
+        try:
+            content = response.content
+        finally:
+            response.close()
+        self.requests += 1
+        self.bytes += len(content)
+        if response.status_code == 200:
+            # The range was ignored, the whole file came
+            return content, len(content), True
+        total = response.headers.get('Content-Range', '').rpartition('/')[2]
+        return content, int(total) if total.isdigit() else self.size, False
+
+    def read(self, start, end):
+        # Bytes start to end (included)
+        content, _, whole = self.request(f'{start}-{end}')
+        if whole:
+            content = content[start:end + 1]
+        if len(content) != end - start + 1:
+            raise RemoteZipError(f'{len(content)} bytes read instead of {end - start + 1}')
+        return content
+
+    def open(self):
+        # The end of the file, its size is the one of the revision read rather than the listed one
+        tail, self.size, whole = self.request(f'-{TAIL_BYTES}')
+        if EOCD not in tail and len(tail) < self.size:
+            tail, self.size, whole = self.request(f'-{MAX_TAIL_BYTES}')
+        if whole:
+            tail = tail[-MAX_TAIL_BYTES:]
+        tail_start = self.size - len(tail)
+        if tail_start == 0:
+            # The whole archive is in the tail, its parts are read from it
+            self.data = tail
+        position = tail.rfind(EOCD)
+        if position < 0 or len(tail) - position < 22:
+            raise RemoteZipError('no end of central directory record')
+        _, disk, central_disk, _, count, central_size, central_offset, _ = struct.unpack(
+            '<4s4H2IH', tail[position:position + 22])
+        if disk or central_disk or count == 0xFFFF or central_offset == 0xFFFFFFFF:
+            raise RemoteZipError('ZIP64 or multi-disk archive')
+        if central_offset + central_size != tail_start + position:
+            raise RemoteZipError('data before the archive')
+        if central_offset >= tail_start:
+            central = tail[central_offset - tail_start:position]
+        else:
+            central = self.read(central_offset, central_offset + central_size - 1)
+        self.read_central(central, count, central_offset)
+
+    def read_central(self, central, count, central_offset):
+        offset = 0
+        for _ in range(count):
+            if central[offset:offset + 4] != CENTRAL:
+                raise RemoteZipError('corrupted central directory')
+            fields = struct.unpack('<4s6H3I5H2I', central[offset:offset + 46])
+            flags, method, compressed, size = fields[3], fields[4], fields[8], fields[9]
+            name_length, extra_length, comment_length = fields[10:13]
+            name = central[offset + 46:offset + 46 + name_length].decode('utf-8' if flags & 0x800 else 'cp437')
+            self.entries[name] = ZipEntry(name, fields[16], compressed, size, method, flags)
+            offset += 46 + name_length + extra_length + comment_length
+        entries = sorted(self.entries.values(), key=lambda entry: entry.offset)
+        for entry, following in zip(entries, entries[1:] + [None]):
+            entry.end = following.offset if following else central_offset
+
+    @property
+    def names(self):
+        return list(self.entries)
+
+    def read_parts(self, names):
+        # Compressed payload of every part, the ranges of neighbouring parts merged
+        entries = sorted((self.entries[name] for name in names), key=lambda entry: entry.offset)
+        for entry in entries:
+            if entry.flags & 0x1 or entry.method not in (0, 8):
+                raise RemoteZipError(f'{entry.name} is encrypted or not deflated')
+        ranges = list()
+        for entry in entries:
+            if ranges and entry.offset - ranges[-1][1] <= MERGE_GAP:
+                ranges[-1][1] = entry.end
+                ranges[-1][2].append(entry)
+            else:
+                ranges.append([entry.offset, entry.end, [entry]])
+        total = self.bytes + sum(end - start for start, end, _ in ranges)
+        if self.data is None and total > self.size * MAX_RANGE_RATIO:
+            raise RemoteZipError(f'{total:,} of {self.size:,} bytes to read in ranges')
+        parts = dict()
+        for start, end, group in ranges:
+            data = self.data[start:end] if self.data is not None else self.read(start, end - 1)
+            for entry in group:
+                record = data[entry.offset - start:entry.end - start]
+                if record[:4] != LOCAL:
+                    raise RemoteZipError(f'no local header for {entry.name}')
+                name_length, extra_length = struct.unpack('<2H', record[26:30])
+                payload = record[30 + name_length + extra_length:30 + name_length + extra_length + entry.compressed]
+                if len(payload) != entry.compressed:
+                    raise RemoteZipError(f'{entry.name} is truncated')
+                parts[entry.name] = (entry.method, payload)
+        return parts
+
+
+def office_part(type_, name):
+    # Parts read by the link scan: the text and hyperlinks of the document (docx), the strings, cells and
+    # hyperlinks of the worksheets (xlsx)
+    if type_ == 'docx':
+        return name in ('word/document.xml', 'word/_rels/document.xml.rels')
+    return name == 'xl/sharedStrings.xml' or bool(SHEET_PART.match(name) or SHEET_RELS_PART.match(name))
+
+
+def read_office_document(client, path, size, type_, rev=None):
+    archive = RemoteZip(client, path, size, rev=rev)
+    archive.open()
+    if type_ == 'docx' and 'word/document.xml' not in archive.entries:
+        raise RemoteZipError('no word/document.xml')
+    embedded = [name.split('/')[-1] for name in archive.names if name.startswith(EMBEDDINGS)]
+    parts = archive.read_parts([name for name in archive.names if office_part(type_, name)])
+    return OfficeDocument(type_, embedded, parts, size=archive.size, bytes_=archive.bytes)
+
+
+class OfficeDocument:
+    # Parts of a document read by RemoteZip, parsed like the whole document is by DropBoxApp.document_contents
+    # (python-docx paragraphs and tables, openpyxl cell values and hyperlinks)
+    def __init__(self, type_, embedded, parts, size=0, bytes_=0):
+        self.type = type_
+        self.embedded = embedded
+        self.parts = parts
+        # Size of the document and bytes read from it
+        self.size = size
+        self.bytes = bytes_
+
+    def part(self, name):
+        method, payload = self.parts[name]
+        return zlib.decompress(payload, -15) if method == 8 else payload
+
+    def relationships(self, name):
+        # Relationship id -> (type, target)
+        if name not in self.parts:
+            return dict()
+        root = ElementTree.fromstring(self.part(name))
+        return {rel.get('Id'): (rel.get('Type'), rel.get('Target')) for rel in root.iter(f'{PR}Relationship')}
+
+    def contents(self):
+        return self.docx_contents() if self.type == 'docx' else self.xlsx_contents()
+
+    def docx_contents(self):
+        body = ElementTree.fromstring(self.part('word/document.xml')).find(f'{W}body')
+        contents = list()
+        if body is not None:
+            contents.extend(paragraph_text(p) for p in body.findall(f'{W}p'))
+            for cell in body.iterfind(f'{W}tbl/{W}tr/{W}tc'):
+                contents.extend(paragraph_text(p) for p in cell.findall(f'{W}p'))
+        for type_, target in self.relationships('word/_rels/document.xml.rels').values():
+            if type_ == HYPERLINK:
+                contents.append(target)
+        return contents
+
+    def xlsx_contents(self):
+        shared = list()
+        if 'xl/sharedStrings.xml' in self.parts:
+            for _, element in ElementTree.iterparse(io.BytesIO(self.part('xl/sharedStrings.xml'))):
+                if element.tag == f'{S}si':
+                    shared.append(string_text(element))
+                    element.clear()
+        contents = list()
+        for name in self.parts:
+            if SHEET_PART.match(name):
+                rels = self.relationships(name.replace('xl/worksheets/', 'xl/worksheets/_rels/') + '.rels')
+                contents.extend(sheet_contents(self.part(name), shared, rels))
+        return contents
+
+
+def paragraph_text(p):
+    # Paragraph.text of python-docx: the runs of the paragraph and of its hyperlinks
+    text = list()
+    for element in p:
+        if element.tag == f'{W}r':
+            text.append(run_text(element))
+        elif element.tag == f'{W}hyperlink':
+            text.extend(run_text(run) for run in element.iterfind(f'{W}r'))
+    return ''.join(text)
+
+
+def run_text(run):
+    text = list()
+    for element in run:
+        if element.tag == f'{W}t':
+            text.append(element.text or '')
+        elif element.tag in (f'{W}tab', f'{W}ptab'):
+            text.append('\t')
+        elif element.tag == f'{W}cr':
+            text.append('\n')
+        elif element.tag == f'{W}br' and element.get(f'{W}type', 'textWrapping') == 'textWrapping':
+            # Page and column breaks are no text
+            text.append('\n')
+        elif element.tag == f'{W}noBreakHyphen':
+            text.append('-')
+    return ''.join(text)
+
+
+def string_text(element):
+    # Shared or inline string, the text of its runs without the phonetic ones
+    t = element.find(f'{S}t')
+    if t is not None:
+        return t.text or ''
+    return ''.join(r.findtext(f'{S}t') or '' for r in element.iterfind(f'{S}r'))
+
+
+def sheet_contents(data, shared, rels):
+    # Cell values (data_only) of a worksheet, a cell with a Dropbox hyperlink followed by its target
+    values = dict()
+    links = list()
+    for _, element in ElementTree.iterparse(io.BytesIO(data)):
+        if element.tag == f'{S}c':
+            type_ = element.get('t', 'n')
+            if type_ == 'inlineStr':
+                inline = element.find(f'{S}is')
+                value = string_text(inline) if inline is not None else None
+            else:
+                value = element.findtext(f'{S}v')
+                if value is not None and type_ == 's':
+                    value = shared[int(value)]
+            if value:
+                values[element.get('r')] = value
+            element.clear()
+        elif element.tag == f'{S}row':
+            element.clear()
+        elif element.tag == f'{S}hyperlink':
+            target = rels.get(element.get(f'{R}id'), (None, None))[1]
+            if target and 'dropbox.com/scl' in target:
+                links.append((element.get('ref'), target))
+    for ref, target in links:
+        for cell in cell_refs(ref):
+            if cell in values:
+                values[cell] = f'{values[cell]}\n{target}'
+    return list(values.values())
+
+
+def cell_refs(ref):
+    if ':' not in ref:
+        return [ref]
+    from openpyxl.utils.cell import range_boundaries, get_column_letter
+    min_col, min_row, max_col, max_row = range_boundaries(ref)
+    return [f'{get_column_letter(col)}{row}' for row in range(min_row, max_row + 1)
+            for col in range(min_col, max_col + 1)]
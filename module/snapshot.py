@@ -0,0 +1,180 @@
+import csv
+import os
+from datetime import datetime
+from itertools import groupby
+from operator import itemgetter
+
+from module.output import OrderedRowWriter, FOLDER_SCHEMA, OWNER_SCHEMA, FILE_SCHEMA
+
+# Diff of two snapshots of a report (diff.py), e.g. this week's output/report_*.csv against last week's. Each
+# snapshot is streamed once into the sorted runs of OrderedRowWriter keyed by (Name Space, Path), so at most
+# `buffer_rows` rows of it are in memory, then both sorted streams are merged in a single pass: a folder only in the
+# new snapshot is added, only in the old one removed, in both with any other value changed, with its size and file
+# count deltas. Rows are read from csv, xlsx, parquet or arrow files and compared as their csv text, so snapshots of
+# two formats can be compared.
+
+KEY_COLUMNS = ['Name Space', 'Path']
+SIZE_COLUMNS = ['Size (byte)', 'Size']
+FILES_COLUMNS = ['Files']
+LEVEL_COLUMNS = ['Level', 'Path Level']
+SNAPSHOT_SCHEMAS = [FOLDER_SCHEMA, OWNER_SCHEMA, FILE_SCHEMA]
+
+
+def read_rows(path):
+    # Header then every row of the snapshot, as they are stored
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        with open(path, encoding='utf-8', newline='') as f:
+            yield from csv.reader(f)
+    elif extension in ('.parquet', '.arrow'):
+        try:
+            import pyarrow
+        except ImportError as e:
+            raise ImportError(f"pyarrow is required to read '{path}' (pip install pyarrow)") from e
+        if extension == '.parquet':
+            import pyarrow.parquet
+            source = pyarrow.parquet.ParquetFile(path)
+            names, batches = source.schema_arrow.names, source.iter_batches()
+        else:
+            import pyarrow.ipc
+            source = pyarrow.ipc.open_file(path)
+            names, batches = source.schema.names, (source.get_batch(i) for i in range(source.num_record_batches))
+        yield names
+        for batch in batches:
+            columns = [batch.column(name).to_pylist() for name in names]
+            yield from zip(*columns)
+    elif extension == '.xlsx':
+        from openpyxl import load_workbook
+        wb = load_workbook(path, read_only=True)
+        for index, ws in enumerate(wb.worksheets):
+            rows = ws.iter_rows(values_only=True)
+            # Every sheet starts with the header
+            header = next(rows, None)
+            if index == 0:
+                yield header
+            yield from rows
+        wb.close()
+    else:
+        raise ValueError(f"Unknown snapshot format '{path}' (csv, xlsx, parquet or arrow)")
+
+
+class Snapshot:
+    def __init__(self, path, buffer_rows=100000, tmp_dir='tmp'):
+        self.path = path
+        self.rows = read_rows(path)
+        self.header = [str(name) for name in next(self.rows)]
+        schema = next((schema for schema in SNAPSHOT_SCHEMAS if schema.header == self.header), None)
+        self.date_format = schema.date_format if schema else FOLDER_SCHEMA.date_format
+        self.keys = [self.header.index(name) for name in KEY_COLUMNS if name in self.header]
+        if not self.keys:
+            raise ValueError(f"'{path}' has no {' nor '.join(KEY_COLUMNS)} column")
+        self.size = self.index(SIZE_COLUMNS)
+        self.files = self.index(FILES_COLUMNS)
+        self.level = self.index(LEVEL_COLUMNS)
+        self.type = self.index(['Type'])
+        self.namespace = self.index(['Name Space'])
+        self.path_column = self.index(['Path'])
+        self.sorter = OrderedRowWriter(sink=None, buffer_rows=buffer_rows, tmp_dir=tmp_dir)
+        self.count = 0
+
+    def index(self, names):
+        return next((self.header.index(name) for name in names if name in self.header), None)
+
+    def get(self, row, index):
+        return row[index] if index is not None and index < len(row) else ''
+
+    def text(self, value):
+        if value is None:
+            return ''
+        if isinstance(value, (list, tuple)):
+            return ', '.join(value)
+        if isinstance(value, datetime):
+            return f'{value:{self.date_format}}'
+        return str(value)
+
+    def sorted(self):
+        # (key, row as csv text) by key, the sorted runs are removed once read
+        for row in self.rows:
+            values = [self.text(value) for value in row]
+            key = tuple(self.get(values, index) for index in self.keys)
+            self.sorter.write(key, (key, values))
+            self.count += 1
+        try:
+            yield from self.sorter.rows()
+        finally:
+            self.sorter.discard()
+
+
+def number(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+class SnapshotDiff:
+    def __init__(self, old: Snapshot, new: Snapshot):
+        self.old = old
+        self.new = new
+        # Columns of both snapshots, by index in the old and in the new one
+        self.columns = [(name, old.header.index(name), new.header.index(name))
+                        for name in new.header if name in old.header]
+        self.counts = {'added': 0, 'removed': 0, 'changed': 0, 'unchanged': 0}
+
+    def changes(self, unchanged=False):
+        # Rows of DIFF_SCHEMA in (Name Space, Path) order, a key found several times in a snapshot (same path in
+        # two spaces with the same name) is paired in the order of the rows
+        old_groups = groupby(self.old.sorted(), key=itemgetter(0))
+        new_groups = groupby(self.new.sorted(), key=itemgetter(0))
+        old_key, old_rows = next(old_groups, (None, None))
+        new_key, new_rows = next(new_groups, (None, None))
+        while old_key is not None or new_key is not None:
+            if new_key is None or (old_key is not None and old_key < new_key):
+                for _, old_row in old_rows:
+                    yield self.row('removed', old_row, None)
+                old_key, old_rows = next(old_groups, (None, None))
+            elif old_key is None or new_key < old_key:
+                for _, new_row in new_rows:
+                    yield self.row('added', None, new_row)
+                new_key, new_rows = next(new_groups, (None, None))
+            else:
+                old_list = [row for _, row in old_rows]
+                new_list = [row for _, row in new_rows]
+                for index in range(max(len(old_list), len(new_list))):
+                    old_row = old_list[index] if index < len(old_list) else None
+                    new_row = new_list[index] if index < len(new_list) else None
+                    change = 'changed' if old_row and new_row else 'removed' if old_row else 'added'
+                    changed = self.changed_columns(old_row, new_row) if change == 'changed' else []
+                    if change == 'changed' and not changed:
+                        self.counts['unchanged'] += 1
+                        if not unchanged:
+                            continue
+                        change = 'unchanged'
+                    yield self.row(change, old_row, new_row, changed)
+                old_key, old_rows = next(old_groups, (None, None))
+                new_key, new_rows = next(new_groups, (None, None))
+
+    def changed_columns(self, old_row, new_row):
+        return [name for name, old_index, new_index in self.columns
+                if self.old.get(old_row, old_index) != self.new.get(new_row, new_index)]
+
+    def row(self, change, old_row, new_row, changed=None):
+        if change != 'unchanged':
+            self.counts[change] += 1
+        snapshot, values = (self.new, new_row) if new_row else (self.old, old_row)
+        old_size = number(self.old.get(old_row, self.old.size)) if old_row else 0
+        new_size = number(self.new.get(new_row, self.new.size)) if new_row else 0
+        old_files = number(self.old.get(old_row, self.old.files)) if old_row else 0
+        new_files = number(self.new.get(new_row, self.new.files)) if new_row else 0
+        return [
+            change, snapshot.get(values, snapshot.type), snapshot.get(values, snapshot.namespace),
+            number(snapshot.get(values, snapshot.level)), snapshot.get(values, snapshot.path_column),
+            old_size if old_row else None, new_size if new_row else None,
+            new_size - old_size, old_files if old_row else None, new_files if new_row else None,
+            new_files - old_files, changed or []
+        ]
+
+    def summary(self):
+        return (f"{self.old.count:,} -> {self.new.count:,} rows: {self.counts['added']:,} added, "
+                f"{self.counts['removed']:,} removed, {self.counts['changed']:,} changed, "
+                f"{self.counts['unchanged']:,} unchanged")
@@ -0,0 +1,109 @@
+import threading
+from datetime import datetime, timedelta
+
+from dropbox import Dropbox
+
+from module.adapters import WrappingAdapter, install
+
+# How long before its expiration the access token is refreshed by the timer
+REFRESH_MARGIN = timedelta(minutes=5)
+# Wait before the timer tries again after a failed refresh (network error...)
+RETRY_SECONDS = 30
+
+
+class TokenManager:
+    # Single owner of the access token of every client. The Dropbox/DropboxTeam clients and the as_user/as_admin
+    # clients derived from them are built without refresh token (the SDK would refresh each of them on its own),
+    # TokenAdapter puts the current token on each of their requests instead. A timer refreshes the token before it
+    # expires; a request that finds it expired anyway refreshes it on the spot, once for all the threads waiting.
+    def __init__(self, access_token, refresh_token, expiration=None, app_key=None, session=None, on_refresh=None,
+                 margin=REFRESH_MARGIN):
+        self.access_token = access_token
+        self.expiration = expiration
+        self.on_refresh = on_refresh
+        self.margin = margin
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.timer = None
+        self.refreshes = 0
+        # Only used to call oauth2/token
+        self.refresher = Dropbox(oauth2_access_token=access_token, oauth2_refresh_token=refresh_token,
+                                 oauth2_access_token_expiration=expiration, app_key=app_key, session=session)
+
+    def expiring(self, margin=timedelta(0)):
+        # Times are UTC, as the SDK keeps them
+        return not self.access_token or (self.expiration is not None
+                                         and datetime.utcnow() + margin >= self.expiration)
+
+    def token(self):
+        token = self.access_token
+        if self.expiring():
+            return self.refresh(stale=token)
+        return token
+
+    def refresh(self, stale=None):
+        # `stale` is the token the caller found expired: when another thread already replaced it, its token is used
+        with self.lock:
+            if stale is not None and self.access_token != stale:
+                return self.access_token
+            self.refresher.refresh_access_token()
+            self.access_token = self.refresher._oauth2_access_token
+            self.expiration = self.refresher._oauth2_access_token_expiration
+            self.refreshes += 1
+            if self.on_refresh:
+                self.on_refresh(self.access_token, self.expiration)
+            return self.access_token
+
+    def start(self):
+        # A token without known expiration (or about to expire) is refreshed now, an invalid refresh token raises
+        # AuthError here rather than in the middle of a report
+        if not self.expiration or self.expiring(self.margin):
+            self.refresh()
+        self.timer = threading.Thread(target=self.run, daemon=True)
+        self.timer.start()
+
+    def run(self):
+        while self.expiration:
+            # Tokens living less than the margin are refreshed half-way
+            remaining = (self.expiration - datetime.utcnow()).total_seconds()
+            wait = max(remaining - self.margin.total_seconds(), remaining / 2)
+            if self.stop_event.wait(max(wait, 0)):
+                return
+            try:
+                self.refresh(stale=self.access_token)
+            except Exception:
+                if self.stop_event.wait(RETRY_SECONDS):
+                    return
+
+    def stop(self):
+        self.stop_event.set()
+
+    def install(self, session):
+        return install(session, self.wrap)
+
+    def wrap(self, adapter):
+        if isinstance(adapter, TokenAdapter):
+            adapter.manager = self
+            return adapter
+        return TokenAdapter(adapter, self)
+
+
+class TokenAdapter(WrappingAdapter):
+    # Transport adapter replacing the bearer token of the SDK clients with the one of the token manager
+    def __init__(self, adapter, manager: TokenManager):
+        WrappingAdapter.__init__(self, adapter)
+        self.manager = manager
+
+    def send(self, request, **kwargs):
+        if not request.headers.get('Authorization', '').startswith('Bearer '):
+            # oauth2/token and the app authenticated routes
+            return self.adapter.send(request, **kwargs)
+        token = self.manager.token()
+        request.headers['Authorization'] = f'Bearer {token}'
+        response = self.adapter.send(request, **kwargs)
+        if response.status_code == 401 and 'expired_access_token' in response.text:
+            # Expired earlier than announced (clock skew, laptop asleep...)
+            response.close()
+            request.headers['Authorization'] = f'Bearer {self.manager.refresh(stale=token)}'
+            response = self.adapter.send(request, **kwargs)
+        return response
@@ -0,0 +1,157 @@
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+
+# Opt-in tracing of a report: a span per folder, per API request (pages of a listing, ACL lookups, downloads)
+# and per document parse. Spans of a thread nest like the traversal does (a folder holds its pages, ACL
+# lookups and sub-folders), download threads are linked to the folder that started them through the `parent`
+# of their first span. Written as Chrome trace events (chrome://tracing, Perfetto) or as JSON lines.
+
+TRACE_FORMATS = ['chrome', 'jsonl']
+
+
+class Span:
+    __slots__ = ('tracer', 'id', 'parent', 'name', 'args', 'tic')
+
+    def __init__(self, tracer, id_, parent, name, args):
+        self.tracer = tracer
+        self.id = id_
+        self.parent = parent
+        self.name = name
+        self.args = args
+        self.tic = 0.0
+
+    def __enter__(self):
+        self.tracer.enter(self)
+        return self
+
+    def set(self, **args):
+        self.args.update(args)
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type:
+            self.args['error'] = exc_type.__name__
+        self.tracer.exit(self)
+        return False
+
+
+class NullSpan:
+    # Shared by every span of a disabled tracer, nothing is measured
+    id = None
+
+    def __enter__(self):
+        return self
+
+    def set(self, **args):
+        pass
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+class NullTracer:
+    enabled = False
+
+    def span(self, name, parent=None, **args):
+        return NULL_SPAN
+
+    def current(self):
+        return None
+
+    def close(self):
+        pass
+
+
+class Tracer:
+    enabled = True
+
+    def __init__(self, path, format_='chrome'):
+        self.path = path
+        self.format = format_
+        self.ids = itertools.count(1)
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.origin = time.perf_counter()
+        self.pid = os.getpid()
+        self.file = open(path, 'w', encoding='utf-8')
+        self.first = True
+        if format_ == 'chrome':
+            self.file.write('{"traceEvents": [\n')
+
+    def stack(self):
+        if not hasattr(self.local, 'stack'):
+            self.local.stack = list()
+        return self.local.stack
+
+    def current(self):
+        stack = self.stack()
+        return stack[-1].id if stack else None
+
+    def span(self, name, parent=None, **args):
+        # `parent` links the first span of a new thread to the span that started it
+        return Span(self, next(self.ids), parent, name, args)
+
+    def enter(self, span):
+        stack = self.stack()
+        if span.parent is None and stack:
+            span.parent = stack[-1].id
+        stack.append(span)
+        span.tic = time.perf_counter()
+
+    def exit(self, span):
+        toc = time.perf_counter()
+        stack = self.stack()
+        if stack and stack[-1] is span:
+            stack.pop()
+        self.write(span, toc)
+
+    def write(self, span, toc):
+        if self.format == 'chrome':
+            event = {
+                'name': span.name, 'ph': 'X', 'pid': self.pid, 'tid': threading.get_ident(),
+                'ts': round((span.tic - self.origin) * 1e6, 1), 'dur': round((toc - span.tic) * 1e6, 1),
+                'args': dict(span.args, id=span.id, parent=span.parent),
+            }
+        else:
+            event = {
+                'id': span.id, 'parent': span.parent, 'name': span.name, 'thread': threading.get_ident(),
+                'start': round(span.tic - self.origin, 6), 'seconds': round(toc - span.tic, 6), **span.args,
+            }
+        line = json.dumps(event, default=str)
+        with self.lock:
+            if self.file.closed:
+                return
+            if self.format == 'chrome' and not self.first:
+                self.file.write(',\n')
+            self.file.write(line if self.format == 'chrome' else line + '\n')
+            self.first = False
+
+    def close(self):
+        with self.lock:
+            if self.file.closed:
+                return
+            if self.format == 'chrome':
+                self.file.write('\n]}\n')
+            self.file.close()
+
+
+def traced_folder(name):
+    # Span of a traversal method (get_path, get_private_shared...) around a whole folder: the method calls itself
+    # for the next pages with a `cursor`, those calls stay inside the span of the first one
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if not self.tracer.enabled or kwargs.get('cursor'):
+                return method(self, *args, **kwargs)
+            folder = kwargs.get('folder')
+            with self.tracer.span(name, path=folder.path_display if folder else None,
+                                  level=folder.level if folder else None):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,140 @@
+from module.app import DropBoxApp
+from module.crawl import CRAWL_OUTPUTS
+from module.fake_server import FakeTenant, FakeDropbox
+from module.profiling import Profiler
+from module.arguments import add_common_arguments, check_common_arguments
+import os
+import time
+import argparse
+from datetime import datetime
+
+parser = argparse.ArgumentParser(
+    description="Run a report against a synthetic tenant served by the local fake Dropbox API (no network, no tokens)"
+)
+parser.add_argument("report", type=str, choices=['report', 'owner', 'member', 'all_member', 'file', 'crawl'],
+                    help=f"The report to run: report (main.py), owner (owner.py -m -t -o), member (member.py -m), "
+                         f"all_member (member.py), file (file.py) or crawl (crawl.py -o)")
+parser.add_argument("-n", "--output_name", type=str, default=f'offline_{datetime.now():%Y-%m-%d %H-%M-%S}',
+                    help=f"The output will be generated with this config name in the '/output' folder.")
+parser.add_argument("-l", "--max_level", type=int, default=1,
+                    help=f"The sub-folder levels to be export to output file (Default 1)")
+parser.add_argument("-o", "--outputs", type=str, default='folders,owners,members,files',
+                    help=f"Comma separated outputs of the crawl report (Default folders,owners,members,files)")
+parser.add_argument("-aggregate", "--aggregate", action='store_true',
+                    help=f"Only count the folders below max_level in the deepest folder written above them, without "
+                         f"keeping them in memory nor in the session backup (same totals, faster shallow reports)")
+parser.add_argument("-changes", "--changes", action='store_true',
+                    help=f"Only traverse the spaces with audit log events since the last run with -changes, the "
+                         f"others reuse its rows (report and owner)")
+parser.add_argument("-m", "--member", type=str, default='user1@example.com',
+                    help=f"Member of the member and file reports (Default user1@example.com)")
+parser.add_argument("-thread", "--thread", type=int, default=1,
+                    help=f"Maximum number of threads running in parallel for the file and all_member reports "
+                         f"(Default 1)")
+parser.add_argument("-enrich_thread", "--enrich_thread", type=int, default=4,
+                    help=f"Threads of the file report reading the revisions and the members of the files (Default 4)")
+parser.add_argument("-parse_thread", "--parse_thread", type=int, default=1,
+                    help=f"Threads of the file report parsing the downloaded documents (Default 1)")
+parser.add_argument("-queue", "--queue_size", type=int, default=100,
+                    help=f"Files waiting in front of each stage of the file report, a full queue holds the stage "
+                         f"before it back (Default 100)")
+parser.add_argument("-full_download", "--full_download", action='store_true',
+                    help=f"Download every document whole (Default a docx or xlsx of 1 MiB or more is read in ranges: "
+                         f"its zip directory, then only the parts holding its text and links)")
+parser.add_argument("-sort", "--sort", action='store_true',
+                    help=f"Sort the all_member output by member name (Default rows in completion order)")
+add_common_arguments(parser, database=False, replay=False, directory_ttl=0)
+# Synthetic tenant
+parser.add_argument("--members", type=int, default=10, help=f"Team members (Default 10)")
+parser.add_argument("--groups", type=int, default=3, help=f"Groups (Default 3)")
+parser.add_argument("--team_folders", type=int, default=2, help=f"Team folders (Default 2)")
+parser.add_argument("--other_namespaces", type=int, default=1, help=f"App and other namespaces (Default 1)")
+parser.add_argument("--width", type=int, default=3, help=f"Sub-folders per folder (Default 3)")
+parser.add_argument("--depth", type=int, default=3, help=f"Folder levels of every space (Default 3)")
+parser.add_argument("--files", type=int, default=4, help=f"Files per folder (Default 4)")
+parser.add_argument("--shared_ratio", type=float, default=0.1,
+                    help=f"Probability for a private folder to be a shared folder (Default 0.1)")
+parser.add_argument("--mounts", type=int, default=2, help=f"Other members mounting each shared folder (Default 2)")
+parser.add_argument("--documents", type=str, default='docx=0.02,xlsx=0.02,pdf=0.02',
+                    help=f"Ratio of documents among files (Default docx=0.02,xlsx=0.02,pdf=0.02)")
+parser.add_argument("--links", type=int, default=2, help=f"Shared links in every document (Default 2)")
+parser.add_argument("--document_padding", type=int, default=0,
+                    help=f"Bytes of media stored in every docx and xlsx, to try the range reads (Default 0)")
+parser.add_argument("--touch", type=int, default=0,
+                    help=f"Namespaces with a file edited in the audit log, for -changes (Default 0)")
+parser.add_argument("--seed", type=int, default=0, help=f"Seed of the generator (Default 0)")
+# Fake API behaviour
+parser.add_argument("--latency", type=float, default=0.0, help=f"Latency of every call in seconds (Default 0)")
+parser.add_argument("--jitter", type=float, default=0.0, help=f"Random extra latency in seconds (Default 0)")
+parser.add_argument("--page_size", type=int, default=2000, help=f"Maximum entries per page (Default 2000)")
+parser.add_argument("--rate_limit_ratio", type=float, default=0.0,
+                    help=f"Ratio of calls answered with 429 Too Many Requests (Default 0)")
+parser.add_argument("--retry_after", type=int, default=0, help=f"Retry-After of the 429 responses (Default 0)")
+
+args = parser.parse_args()
+check_common_arguments(parser, args)
+outputs = [output.strip() for output in args.outputs.split(',') if output.strip()]
+for output in outputs:
+    if output not in CRAWL_OUTPUTS:
+        parser.error(f"unknown output '{output}', choose from {', '.join(CRAWL_OUTPUTS)}")
+
+if __name__ == "__main__":
+    for directory in ['output', 'session', 'tmp']:
+        os.makedirs(directory, exist_ok=True)
+
+    documents = dict()
+    for item in args.documents.split(','):
+        if item:
+            type_, ratio = item.split('=')
+            documents[type_] = float(ratio)
+
+    tic = time.time()
+    tenant = FakeTenant(
+        members=args.members, groups=args.groups, team_folders=args.team_folders,
+        other_namespaces=args.other_namespaces, width=args.width, depth=args.depth, files=args.files,
+        shared_ratio=args.shared_ratio, mounts=args.mounts, documents=documents, links=args.links,
+        document_padding=args.document_padding, seed=args.seed
+    )
+    fake = FakeDropbox(tenant, latency=args.latency, jitter=args.jitter, page_size=args.page_size,
+                       rate_limit_ratio=args.rate_limit_ratio, retry_after=args.retry_after, seed=args.seed)
+    tenant.touch(args.touch)
+    print(f"Tenant generated in {time.time() - tic:.1f}s: {tenant.count()}")
+
+    app = DropBoxApp(
+        team_access=True, app_key='fake', remember_access_token=False, output_format=args.output_format,
+        session=fake.session(), access_token='fake', refresh_token='fake', metrics_format=args.metrics_format,
+        trace_format=args.trace, progress_mode=args.progress, progress_interval=args.progress_interval,
+        quiet=args.quiet, directory_ttl=args.directory_ttl, record=args.record
+    )
+
+    tic = time.time()
+    try:
+        with Profiler(args.output_name, mode=args.profile, interval=args.profile_interval,
+                      memory_interval=args.memory_interval, top=args.top):
+            if args.report == 'report':
+                app.report(output_name=args.output_name, max_level=args.max_level, aggregate=args.aggregate,
+                           changes=args.changes)
+            elif args.report == 'owner':
+                app.report_owner(output_name=args.output_name, max_level=args.max_level,
+                                 running_space=['member', 'team', 'other'], aggregate=args.aggregate,
+                                 changes=args.changes)
+            elif args.report == 'member':
+                app.member_report(output_name=args.output_name, member_indentify=args.member, max_level=args.max_level)
+            elif args.report == 'all_member':
+                app.all_member_report(output_name=args.output_name, max_thread=args.thread, sort=args.sort)
+            elif args.report == 'crawl':
+                app.crawl(output_name=args.output_name, outputs=outputs, max_level=args.max_level,
+                          full_download=args.full_download)
+            else:
+                app.file_report(output_name=args.output_name, member_indentify=args.member, max_thread=args.thread,
+                                enrich_thread=args.enrich_thread, parse_thread=args.parse_thread,
+                                queue_size=args.queue_size, full_download=args.full_download)
+    except KeyboardInterrupt:
+        app.writer.close()
+        app.dump_metrics()
+        os._exit(0)
+
+    print(f"Report done in {time.time() - tic:.1f}s, {sum(fake.calls.values()):,} API calls "
+          f"({sum(fake.rate_limited.values()):,} rate limited)")
+    for route, count in fake.calls.most_common():
+        print(f"  {route}: {count:,}")